@@ -0,0 +1,56 @@
+from django.contrib.auth import get_user_model
+from django.db import DEFAULT_DB_ALIAS
+from rest_framework_simplejwt.authentication import JWTAuthentication
+from rest_framework_simplejwt.exceptions import InvalidToken
+from rest_framework_simplejwt.settings import api_settings
+from rest_framework_simplejwt.tokens import RefreshToken
+
+User = get_user_model()
+
+# User fields an access token carries as claims: what permission checks (role) and
+# queryset filters (id) need, so authenticating a request reads no user row.
+USER_CLAIMS = ('username', 'role')
+
+
+def tokens_for(user):
+    """Refresh and access token for `user`; only the short-lived access token gets the claims."""
+    refresh = RefreshToken.for_user(user)
+    access = refresh.access_token
+    for claim in USER_CLAIMS:
+        access[claim] = getattr(user, claim)
+    return refresh, access
+
+
+def user_from_claims(validated_token):
+    """
+    A User instance built from the token, as if loaded with .only(id, username, role,
+    is_active): other fields are deferred, so reading one (email) fetches it and save()
+    writes only the loaded fields.
+    """
+    id_field = User._meta.get_field(api_settings.USER_ID_FIELD)
+    try:
+        values = {
+            # the claim is a string; permission checks compare it with foreign key ids
+            id_field.attname: id_field.to_python(validated_token[api_settings.USER_ID_CLAIM]),
+            # tokens are only issued to active users (see LoginView)
+            'is_active': True,
+            **{claim: validated_token[claim] for claim in USER_CLAIMS},
+        }
+    except KeyError:
+        raise InvalidToken("Token contained no recognizable user identification")
+    fields = [f.attname for f in User._meta.concrete_fields if f.attname in values]
+    return User.from_db(DEFAULT_DB_ALIAS, fields, [values[name] for name in fields])
+
+
+class ClaimsJWTAuthentication(JWTAuthentication):
+    """
+    JWTAuthentication without the per-request user query: request.user comes from the
+    access token's claims (see tokens_for). A role change or deactivation therefore
+    applies once the user's current access token expires (ACCESS_TOKEN_LIFETIME).
+    Tokens issued without the claims still authenticate through the database.
+    """
+
+    def get_user(self, validated_token):
+        if not all(claim in validated_token for claim in USER_CLAIMS):
+            return super().get_user(validated_token)
+        return user_from_claims(validated_token)
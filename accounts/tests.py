@@ -1,3 +1,63 @@
+from django.core.cache import cache
 from django.test import TestCase
+from django.contrib.auth import get_user_model
+from rest_framework.test import APIClient
+from rest_framework_simplejwt.tokens import AccessToken
+from accounts.authentication import ClaimsJWTAuthentication, user_from_claims
+from appointments.models import Appointment
 
-# Create your tests here.
+User = get_user_model()
+
+
+class ClaimsAuthenticationTests(TestCase):
+    """request.user from access token claims: no user query per request."""
+
+    @classmethod
+    def setUpTestData(cls):
+        cls.provider = User.objects.create_user(username='claims_provider', password='x', email='p@example.com',
+                                                role='provider')
+
+    def setUp(self):
+        cache.clear()
+        self.client = APIClient()
+
+    def login(self):
+        response = self.client.post('/auth/login/', {'username': 'claims_provider', 'password': 'x'})
+        self.assertEqual(response.status_code, 200)
+        return response.data['access']
+
+    def test_access_token_carries_role(self):
+        token = AccessToken(self.login())
+        self.assertEqual((token['role'], token['username']), ('provider', 'claims_provider'))
+
+    def test_not_modified_read_runs_no_query(self):
+        self.client.credentials(HTTP_AUTHORIZATION=f'Bearer {self.login()}')
+        etag = self.client.get('/api/appointments/')['ETag']
+        with self.assertNumQueries(0):
+            response = self.client.get('/api/appointments/', HTTP_IF_NONE_MATCH=etag)
+        self.assertEqual(response.status_code, 304)
+
+    def test_token_without_claims_reads_user(self):
+        self.client.credentials(HTTP_AUTHORIZATION=f'Bearer {AccessToken.for_user(self.provider)}')
+        etag = self.client.get('/api/appointments/')['ETag']
+        with self.assertNumQueries(1):
+            response = self.client.get('/api/appointments/', HTTP_IF_NONE_MATCH=etag)
+        self.assertEqual(response.status_code, 304)
+
+    def test_claims_user_behaves_like_a_loaded_user(self):
+        user = ClaimsJWTAuthentication().get_user(AccessToken(self.login()))
+        self.assertEqual(user, self.provider)
+        self.assertEqual((user.role, user.is_authenticated), ('provider', True))
+        self.assertFalse(Appointment.objects.filter(provider=user).exists())
+        # fields outside the claims are deferred, not blank
+        with self.assertNumQueries(1):
+            self.assertEqual(user.email, 'p@example.com')
+
+    def test_save_writes_only_loaded_fields(self):
+        token = AccessToken(self.login())
+        user = user_from_claims(token)
+        user.role = 'admin'
+        user.save()
+        self.provider.refresh_from_db()
+        self.assertEqual((self.provider.role, self.provider.email), ('admin', 'p@example.com'))
+        self.assertTrue(self.provider.check_password('x'))
@@ -3,7 +3,7 @@ from rest_framework.response import Response
 from rest_framework.permissions import AllowAny
 from django.contrib.auth import authenticate
 from .serializers import RegisterSerializer, LoginResponseSerializer
-from rest_framework_simplejwt.tokens import RefreshToken
+from .authentication import tokens_for
 from django.contrib.auth import get_user_model
 
 User = get_user_model()
@@ -24,13 +24,13 @@ class LoginView(generics.GenericAPIView):
         if user is None:
             return Response({'error': 'Invalid credentials'}, status=status.HTTP_400_BAD_REQUEST)
 
-        refresh = RefreshToken.for_user(user)
+        refresh, access = tokens_for(user)
         data = {
             'id': user.id,
             'username': user.username,
             'email': user.email,
             'role': user.role,
-            'access': str(refresh.access_token),
+            'access': str(access),
             'refresh': str(refresh),
         }
         return Response(data, status=status.HTTP_200_OK)
@@ -0,0 +1,43 @@
+from channels.db import database_sync_to_async
+from channels.generic.websocket import AsyncJsonWebsocketConsumer
+from services.models import Service
+from .realtime import calendar_group
+
+
+@database_sync_to_async
+def service_provider(service_id):
+    return Service.objects.filter(pk=service_id).values_list('provider_id', flat=True).first()
+
+
+class CalendarConsumer(AsyncJsonWebsocketConsumer):
+    """
+    Pushes the slot deltas of one provider's calendar (see appointments.realtime) in place
+    of polling the slots endpoints. Subscribe by provider, or by service: a service's slots
+    depend on everything its provider has booked or blocked, so it gets the provider's feed.
+
+    Like the slots endpoints, no login is needed; deltas carry times only, no customer data.
+    """
+
+    async def connect(self):
+        self.group = None
+        kwargs = self.scope['url_route']['kwargs']
+        provider_id = kwargs.get('provider_id')
+        if 'service_id' in kwargs:
+            provider_id = await service_provider(kwargs['service_id'])
+            if provider_id is None:
+                await self.close()
+                return
+        self.group = calendar_group(provider_id)
+        await self.channel_layer.group_add(self.group, self.channel_name)
+        await self.accept()
+
+    async def disconnect(self, code):
+        if self.group:
+            await self.channel_layer.group_discard(self.group, self.channel_name)
+
+    async def receive_json(self, content, **kwargs):
+        # push only
+        pass
+
+    async def calendar_delta(self, event):
+        await self.send_json({'provider': event['provider'], 'deltas': event['deltas']})
@@ -0,0 +1,30 @@
+import django_filters
+from .models import Appointment, Availability
+
+
+class CharInFilter(django_filters.BaseInFilter, django_filters.CharFilter):
+    """Comma-separated values, e.g. ?status=pending,confirmed (one IN lookup)."""
+
+
+class AppointmentFilter(django_filters.FilterSet):
+    """
+    ?start_after= / ?start_before= (ISO datetimes), ?status=a,b, ?provider=, ?service=.
+    Each maps to a column of an appointment index, so filters narrow the index seek.
+    """
+    start = django_filters.IsoDateTimeFromToRangeFilter(field_name='start_datetime')
+    status = CharInFilter(field_name='status')
+
+    class Meta:
+        model = Appointment
+        fields = ['start', 'status', 'provider', 'service']
+
+
+class AvailabilityFilter(django_filters.FilterSet):
+    """
+    ?date_after= / ?date_before= (YYYY-MM-DD), ?provider=, ?is_available=.
+    """
+    date = django_filters.DateFromToRangeFilter(field_name='date')
+
+    class Meta:
+        model = Availability
+        fields = ['date', 'provider', 'is_available']
@@ -0,0 +1,101 @@
+import random
+import threading
+import time
+from datetime import timedelta, time as dtime
+from django.core.management.base import BaseCommand
+from django.db import connection, connections, transaction
+from django.utils import timezone
+from django.contrib.auth import get_user_model
+from rest_framework.test import APIRequestFactory, force_authenticate
+from appointments.models import Appointment, Availability, NotificationOutbox
+from appointments.views import AppointmentViewSet
+from services.models import Service
+
+User = get_user_model()
+
+PREFIX = 'bench_concurrency_'
+
+
+class Command(BaseCommand):
+    help = ("Fire concurrent bookings at one provider and report throughput and double bookings. "
+            "Needs a file-backed or server database; data is removed afterwards.")
+
+    def add_arguments(self, parser):
+        parser.add_argument('--threads', type=int, default=16)
+        parser.add_argument('--bookings', type=int, default=400, help='Total booking attempts')
+        parser.add_argument('--slots', type=int, default=20, help='Distinct start times competed for')
+
+    def handle(self, *args, **options):
+        # notifications only reach the outbox table (part of the booking path); nothing hits the broker
+        try:
+            self.cleanup()
+            self.run(options['threads'], options['bookings'], options['slots'])
+        finally:
+            self.cleanup()
+
+    def run(self, threads, total, slot_count):
+        provider, service, customers, starts = self.setup(threads, slot_count)
+        results = {'created': 0, 'rejected': 0, 'errors': 0}
+        lock = threading.Lock()
+        view = AppointmentViewSet.as_view({'post': 'create'})
+        factory = APIRequestFactory()
+
+        def worker(customer, attempts):
+            try:
+                for _ in range(attempts):
+                    start = random.choice(starts)
+                    request = factory.post('/api/appointments/', {
+                        'service': service.id,
+                        'start_datetime': start.isoformat(),
+                        'end_datetime': start.isoformat(),
+                    }, format='json')
+                    force_authenticate(request, user=customer)
+                    try:
+                        response = view(request)
+                        key = 'created' if response.status_code == 201 else 'rejected'
+                    except Exception:
+                        key = 'errors'
+                    with lock:
+                        results[key] += 1
+            finally:
+                connections.close_all()
+
+        per_thread = [total // threads + (1 if i < total % threads else 0) for i in range(threads)]
+        pool = [threading.Thread(target=worker, args=(customers[i], per_thread[i])) for i in range(threads)]
+        t0 = time.perf_counter()
+        for t in pool:
+            t.start()
+        for t in pool:
+            t.join()
+        elapsed = time.perf_counter() - t0
+
+        booked = list(Appointment.objects.filter(provider=provider).exclude(status='cancelled')
+                      .order_by('start_datetime').values_list('start_datetime', 'end_datetime'))
+        double_bookings = sum(1 for a, b in zip(booked, booked[1:]) if b[0] < a[1])
+
+        self.stdout.write(f"vendor:          {connection.vendor}")
+        self.stdout.write(f"threads:         {threads}")
+        self.stdout.write(f"attempts:        {total} in {elapsed:.2f}s ({total / elapsed:.1f} req/s)")
+        self.stdout.write(f"created:         {results['created']}")
+        self.stdout.write(f"rejected:        {results['rejected']}")
+        self.stdout.write(f"errors:          {results['errors']}")
+        self.stdout.write(f"double bookings: {double_bookings}")
+
+    def setup(self, threads, slot_count):
+        with transaction.atomic():
+            provider = User.objects.create_user(username=f'{PREFIX}provider', password='x', role='provider')
+            customers = [User.objects.create_user(username=f'{PREFIX}customer{i}', password='x', role='customer')
+                         for i in range(threads)]
+            service = Service.objects.create(provider=provider, name=f'{PREFIX}service', price=10,
+                                             duration=30, buffer_time=0)
+            day = timezone.localdate() + timedelta(days=2)
+            Availability.objects.create(provider=provider, date=day, start_time=dtime(0), end_time=dtime(23, 59))
+            first = timezone.make_aware(timezone.datetime.combine(day, dtime(8)))
+            # 15 minute spacing with 30 minute appointments: neighbouring slots collide too
+            starts = [first + timedelta(minutes=15 * i) for i in range(slot_count)]
+        return provider, service, customers, starts
+
+    def cleanup(self):
+        ids = list(Appointment.objects.filter(provider__username__startswith=PREFIX).values_list('id', flat=True))
+        User.objects.filter(username__startswith=PREFIX).delete()
+        NotificationOutbox.objects.filter(appointment_id__in=ids).delete()
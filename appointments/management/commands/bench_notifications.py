@@ -0,0 +1,97 @@
+import socketserver
+import threading
+import time
+from django.core.mail import EmailMessage, get_connection
+from django.core.management.base import BaseCommand
+from django.test.utils import override_settings
+from notifications.tasks import deliver
+
+
+class SMTPStandIn(socketserver.ThreadingTCPServer):
+    """
+    Minimal local SMTP server: accepts every message and counts it. `handshake` seconds
+    are spent before the greeting of each connection to stand in for TCP + TLS setup.
+    """
+    daemon_threads = True
+    allow_reuse_address = True
+
+    def __init__(self, handshake):
+        self.handshake = handshake
+        self.received = 0
+        self.connections = 0
+        self.lock = threading.Lock()
+        super().__init__(('127.0.0.1', 0), SMTPHandler)
+
+
+class SMTPHandler(socketserver.StreamRequestHandler):
+    disable_nagle_algorithm = True
+
+    def reply(self, line):
+        self.wfile.write(line.encode() + b'\r\n')
+
+    def handle(self):
+        server = self.server
+        with server.lock:
+            server.connections += 1
+        time.sleep(server.handshake)
+        self.reply('220 localhost ESMTP stand-in')
+        while line := self.rfile.readline():
+            command = line.decode(errors='replace').strip().upper()
+            if command.startswith('EHLO'):
+                self.reply('250-localhost\r\n250 8BITMIME')
+            elif command.startswith('DATA'):
+                self.reply('354 End data with <CR><LF>.<CR><LF>')
+                while (data := self.rfile.readline()) and data != b'.\r\n':
+                    pass
+                with server.lock:
+                    server.received += 1
+                self.reply('250 OK')
+            elif command.startswith('QUIT'):
+                self.reply('221 Bye')
+                return
+            else:
+                # HELO, MAIL FROM, RCPT TO, RSET, NOOP
+                self.reply('250 OK')
+
+
+class Command(BaseCommand):
+    help = ("Benchmark notification mail delivery against a local SMTP stand-in: "
+            "one connection per message (send_mail) vs one pooled connection (notifications.tasks.deliver).")
+
+    def add_arguments(self, parser):
+        parser.add_argument('--messages', type=int, default=2000)
+        parser.add_argument('--handshake-ms', type=float, default=20.0,
+                            help='Simulated connection setup cost (TCP + TLS) per SMTP connection')
+
+    def handle(self, *args, **options):
+        server = SMTPStandIn(options['handshake_ms'] / 1000.0)
+        threading.Thread(target=server.serve_forever, daemon=True).start()
+        host, port = server.server_address
+        try:
+            with override_settings(EMAIL_BACKEND='django.core.mail.backends.smtp.EmailBackend',
+                                   EMAIL_HOST=host, EMAIL_PORT=port, EMAIL_USE_TLS=False, EMAIL_USE_SSL=False,
+                                   EMAIL_HOST_USER='', EMAIL_HOST_PASSWORD=''):
+                count = options['messages']
+                self.report('connection per message', server, count, lambda: self.send_each(count))
+                self.report('pooled connection', server, count, lambda: deliver(self.messages(count)))
+        finally:
+            server.shutdown()
+            server.server_close()
+
+    def messages(self, count):
+        for i in range(count):
+            yield EmailMessage('Appointment Reminder', f'Reminder: You have Service {i} tomorrow at 09:00',
+                               None, [f'customer{i}@example.com'])
+
+    def send_each(self, count):
+        # what send_mail() does: a fresh connection for every message
+        for message in self.messages(count):
+            get_connection().send_messages([message])
+
+    def report(self, label, server, count, send):
+        server.received = server.connections = 0
+        t0 = time.perf_counter()
+        send()
+        elapsed = time.perf_counter() - t0
+        self.stdout.write(f"{label + ':':24} {server.received} messages over {server.connections} connections "
+                          f"in {elapsed:.2f}s ({server.received / elapsed:,.0f} msg/s)")
@@ -0,0 +1,68 @@
+import time
+from datetime import timedelta
+from django.core.management.base import BaseCommand
+from django.db import connection, transaction
+from django.test.utils import CaptureQueriesContext
+from django.utils import timezone
+from django.contrib.auth import get_user_model
+from appointments.models import Appointment
+from appointments.scheduling import has_conflict
+from services.models import Service
+
+User = get_user_model()
+
+
+class Rollback(Exception):
+    pass
+
+
+class Command(BaseCommand):
+    help = "Benchmark the booking overlap check as the provider's appointment history grows."
+
+    def add_arguments(self, parser):
+        parser.add_argument('--sizes', default='1000,10000,50000',
+                            help='Comma separated history sizes to benchmark')
+        parser.add_argument('--repeat', type=int, default=200, help='Checks per size')
+
+    def handle(self, *args, **options):
+        sizes = [int(s) for s in options['sizes'].split(',')]
+        repeat = options['repeat']
+        # everything is created inside a transaction that is rolled back at the end
+        try:
+            with transaction.atomic():
+                self.run(sizes, repeat)
+                raise Rollback
+        except Rollback:
+            pass
+
+    def run(self, sizes, repeat):
+        provider = User.objects.create_user(username='bench_provider', password='x', role='provider')
+        customer = User.objects.create_user(username='bench_customer', password='x', role='customer')
+        service = Service.objects.create(provider=provider, name='Bench', price=10, duration=30, buffer_time=10)
+
+        now = timezone.now().replace(minute=0, second=0, microsecond=0)
+        candidate_start = now + timedelta(days=1, hours=1)
+        candidate_end = candidate_start + timedelta(minutes=service.duration)
+
+        self.stdout.write(f"{'history':>10} {'queries':>8} {'avg ms':>10}")
+        created = 0
+        for size in sizes:
+            # history lives in the past, one appointment per hour
+            batch = []
+            for i in range(created, size):
+                start = now - timedelta(hours=i + 24)
+                batch.append(Appointment(service=service, provider=provider, customer=customer,
+                                         start_datetime=start, end_datetime=start + timedelta(minutes=30),
+                                         status='completed'))
+            Appointment.objects.bulk_create(batch, batch_size=1000)
+            created = size
+
+            with CaptureQueriesContext(connection) as ctx:
+                has_conflict(provider, service, candidate_start, candidate_end)
+            queries = len(ctx.captured_queries)
+
+            t0 = time.perf_counter()
+            for _ in range(repeat):
+                has_conflict(provider, service, candidate_start, candidate_end)
+            avg_ms = (time.perf_counter() - t0) * 1000.0 / repeat
+            self.stdout.write(f"{size:>10} {queries:>8} {avg_ms:>10.3f}")
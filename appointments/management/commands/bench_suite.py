@@ -0,0 +1,215 @@
+import json
+import statistics
+import subprocess
+import time
+from datetime import datetime, timedelta, time as dtime
+from django.conf import settings
+from django.core.cache import cache
+from django.core.management.base import BaseCommand, CommandError
+from django.db import connection, transaction
+from django.test.utils import CaptureQueriesContext, override_settings
+from django.utils import timezone
+from django.contrib.auth import get_user_model
+from rest_framework.request import Request
+from rest_framework.test import APIClient, APIRequestFactory
+from accounts.authentication import tokens_for
+from appointments.models import Appointment, Availability
+from appointments.serializers import AppointmentSerializer
+from notifications.tasks import due_reminder_chunks, send_reminders
+from services.models import Service
+from .generate_data import PREFIX, OPENING, CLOSING, WORKDAYS
+
+User = get_user_model()
+
+
+class Rollback(Exception):
+    pass
+
+
+def percentile(timings, share):
+    timings = sorted(timings)
+    return timings[max(0, int(len(timings) * share) - 1)]
+
+
+class Command(BaseCommand):
+    help = ("Benchmark the scheduling hot paths on the data of generate_data: booking validation, booking, "
+            "reschedule, dashboards, CSV export, list endpoints and daily_reminder. Reports p50/p95 latency and "
+            "query counts and writes them to a JSON file, so runs can be compared between commits.")
+
+    def add_arguments(self, parser):
+        parser.add_argument('--repeat', type=int, default=30, help='Timed runs per benchmark')
+        parser.add_argument('--output', default='bench-results.json')
+        parser.add_argument('--compare', help='Results JSON of an earlier run to compare against')
+        parser.add_argument('--only', help='Comma separated benchmark names')
+
+    def handle(self, *args, **options):
+        admin = User.objects.filter(username=f'{PREFIX}admin').first()
+        if admin is None:
+            raise CommandError("No generated data; run manage.py generate_data first.")
+        provider = User.objects.get(username=f'{PREFIX}provider0')
+        appointment, slot = self.reschedulable(provider)
+        customer = appointment.customer
+
+        benchmarks = self.benchmarks(admin, provider, customer, appointment, slot)
+        if options['only']:
+            names = options['only'].split(',')
+            unknown = set(names) - set(benchmarks)
+            if unknown:
+                raise CommandError(f"Unknown benchmarks: {', '.join(sorted(unknown))}")
+            benchmarks = {name: benchmarks[name] for name in names}
+        baseline = {}
+        if options['compare']:
+            with open(options['compare']) as f:
+                baseline = json.load(f)['results']
+
+        results = {}
+        self.stdout.write(f"{'benchmark':26} {'queries':>8} {'p50 ms':>9} {'p95 ms':>9} {'p95 vs base':>12}")
+        with override_settings(ALLOWED_HOSTS=['testserver']):
+            for name, run in benchmarks.items():
+                results[name] = result = self.measure(run, options['repeat'])
+                base = baseline.get(name)
+                change = f"{result['p95_ms'] / base['p95_ms']:>11.2f}x" if base and base['p95_ms'] else ''
+                self.stdout.write(f"{name:26} {result['queries']:>8} {result['p50_ms']:>9.2f} "
+                                  f"{result['p95_ms']:>9.2f} {change:>12}")
+
+        report = {
+            'created': timezone.now().isoformat(),
+            'commit': self.commit(),
+            'database': connection.vendor,
+            'data': {
+                'appointments': Appointment.objects.count(),
+                'services': Service.objects.count(),
+                'users': User.objects.count(),
+            },
+            'repeat': options['repeat'],
+            'results': results,
+        }
+        with open(options['output'], 'w') as f:
+            json.dump(report, f, indent=2)
+        self.stdout.write(self.style.SUCCESS(f"Results written to {options['output']}"))
+
+    def measure(self, run, repeat):
+        """Time `run` `repeat` times after one warm-up call, each time with a cold cache."""
+        timings, queries = [], 0
+        for i in range(repeat + 1):
+            # measure the work, not the cache (dashboards, conditional GET validators)
+            cache.clear()
+            with CaptureQueriesContext(connection) as captured:
+                t0 = time.perf_counter()
+                run()
+                elapsed = (time.perf_counter() - t0) * 1000.0
+            if i:
+                timings.append(elapsed)
+                queries = max(queries, len(captured))
+        return {
+            'p50_ms': round(statistics.median(timings), 3),
+            'p95_ms': round(percentile(timings, 0.95), 3),
+            'mean_ms': round(statistics.fmean(timings), 3),
+            'queries': queries,
+            'runs': repeat,
+        }
+
+    def benchmarks(self, admin, provider, customer, appointment, slot):
+        clients = {}
+        for user in (admin, provider, customer):
+            clients[user.role] = client = APIClient()
+            client.credentials(HTTP_AUTHORIZATION=f'Bearer {tokens_for(user)[1]}')
+        # end_datetime is required, and recomputed from the service duration
+        booking = {'service': appointment.service_id, 'start_datetime': slot.isoformat(),
+                   'end_datetime': (slot + timedelta(minutes=appointment.service.duration)).isoformat()}
+
+        def get(role, url):
+            def run():
+                response = clients[role].get(url)
+                if response.status_code != 200:
+                    raise CommandError(f"GET {url} as {role}: {response.status_code} {response.content[:200]}")
+                if response.streaming:
+                    for _ in response.streaming_content:
+                        pass
+            return run
+
+        def post(role, url, data, expected):
+            def run():
+                response = clients[role].post(url, data, format='json')
+                if response.status_code != expected:
+                    raise CommandError(f"POST {url} as {role}: {response.status_code} {response.content[:200]}")
+            return rolled_back(run)
+
+        def validate_booking():
+            request = Request(APIRequestFactory().post('/api/appointments/'))
+            request.user = customer
+            serializer = AppointmentSerializer(data=booking, context={'request': request})
+            if not serializer.is_valid():
+                raise CommandError(f"Booking validation failed: {serializer.errors}")
+
+        def reminders():
+            # daily_reminder with its send_reminders subtasks run inline, mailing into memory:
+            # no broker or result backend involved
+            with override_settings(EMAIL_BACKEND='django.core.mail.backends.locmem.EmailBackend'):
+                for ids in due_reminder_chunks(timezone.localdate() + timedelta(days=1)):
+                    send_reminders(ids)
+
+        return {
+            'booking_validation': validate_booking,
+            'booking': post('customer', '/api/appointments/', booking, 201),
+            # IsCustomerOrReadOnly leaves reschedules to providers and admins
+            'reschedule': post('admin', f'/api/appointments/{appointment.id}/reschedule/',
+                               {'start_datetime': slot.isoformat()}, 200),
+            'dashboard_admin': get('admin', '/api/dashboard/admin/'),
+            'dashboard_provider': get('provider', '/api/dashboard/provider/'),
+            'dashboard_customer': get('customer', '/api/dashboard/customer/'),
+            'dashboard_heatmap': get('provider', '/api/dashboard/heatmap/'),
+            'export_csv': get('admin', '/api/dashboard/export/'),
+            'list_services': get('customer', '/api/services/'),
+            'list_appointments_customer': get('customer', '/api/appointments/'),
+            'list_appointments_provider': get('provider', '/api/appointments/'),
+            'list_appointments_admin': get('admin', '/api/appointments/'),
+            'list_availability': get('provider', '/api/availability/'),
+            'daily_reminder': rolled_back(reminders),
+        }
+
+    def reschedulable(self, provider):
+        """
+        An upcoming appointment of `provider` that its customer may still move (more than
+        a day ahead), and a free working hour of the provider to move it to or book.
+        """
+        today = timezone.localdate()
+        upcoming = (Appointment.objects
+                    .filter(provider=provider, start_datetime__gte=timezone.now() + timedelta(days=2))
+                    .exclude(status='cancelled')
+                    .select_related('customer', 'service')
+                    .order_by('start_datetime'))
+        appointment = upcoming.first()
+        if appointment is None:
+            raise CommandError("No upcoming appointments; run generate_data with --days-ahead of 3 or more.")
+        taken = set(upcoming.values_list('start_datetime', flat=True))
+        days_off = set(Availability.objects.filter(provider=provider, is_available=False).values_list('date', flat=True))
+        last = upcoming.last().start_datetime.date()
+        day = today + timedelta(days=2)
+        while day <= last:
+            if day.weekday() in WORKDAYS and day not in days_off:
+                for hour in range(OPENING, CLOSING):
+                    start = timezone.make_aware(datetime.combine(day, dtime(hour)))
+                    if start not in taken:
+                        return appointment, start
+            day += timedelta(days=1)
+        raise CommandError(f"{provider.username} has no free hour to book; generate data with fewer appointments.")
+
+    def commit(self):
+        try:
+            return subprocess.run(['git', 'rev-parse', 'HEAD'], cwd=settings.BASE_DIR, capture_output=True,
+                                  text=True, check=True).stdout.strip()
+        except (OSError, subprocess.CalledProcessError):
+            return None
+
+
+def rolled_back(run):
+    # write paths leave the data as generated, so every run (and every later benchmark) sees the same rows
+    def rolled_back_run():
+        try:
+            with transaction.atomic():
+                run()
+                raise Rollback
+        except Rollback:
+            pass
+    return rolled_back_run
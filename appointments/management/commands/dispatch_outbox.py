@@ -0,0 +1,22 @@
+import time
+from django.core.management.base import BaseCommand
+from notifications.outbox import drain_outbox, OUTBOX_BATCH_SIZE
+
+
+class Command(BaseCommand):
+    help = "Drain the notification outbox in batches, to Celery or (--direct) straight to the notifier."
+
+    def add_arguments(self, parser):
+        parser.add_argument('--batch-size', type=int, default=OUTBOX_BATCH_SIZE)
+        parser.add_argument('--direct', action='store_true', help='Send in this process instead of queueing Celery tasks')
+        parser.add_argument('--loop', type=float, default=0,
+                            help='Keep polling, sleeping this many seconds whenever the outbox is empty')
+
+    def handle(self, *args, **options):
+        while True:
+            drained = drain_outbox(options['batch_size'], direct=options['direct'])
+            if drained:
+                self.stdout.write(f"dispatched {drained} outbox rows")
+            if not options['loop']:
+                break
+            time.sleep(options['loop'])
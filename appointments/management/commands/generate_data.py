@@ -0,0 +1,204 @@
+import math
+import random
+import time
+from datetime import datetime, timedelta, time as dtime
+from decimal import Decimal
+from django.contrib.auth import get_user_model
+from django.contrib.auth.hashers import make_password
+from django.core.management.base import BaseCommand
+from django.db import connection, transaction
+from django.db.models import DateTimeField, F, Value
+from django.db.models.functions import Least, Mod
+from django.utils import timezone
+from appointments.models import Appointment, Availability, AvailabilityRule
+from appointmentsys.conditional import invalidate_validators
+from dashboard.cache import bump_versions, provider_scope, GLOBAL_SCOPE
+from dashboard.rollups import rebuild
+from services.models import Category, Service
+from services.search import refresh_documents
+
+User = get_user_model()
+
+PREFIX = 'synthetic_'
+
+CATEGORIES = ['Hair', 'Nails', 'Massage', 'Dental', 'Physiotherapy', 'Skin care', 'Fitness', 'Tutoring',
+              'Counselling', 'Veterinary', 'Photography', 'Consulting']
+SERVICE_KINDS = ['Express', 'Standard', 'Premium', 'Consultation', 'Follow-up', 'Extended', 'Group session']
+
+# providers work Monday to Saturday, one slot per hour
+OPENING, CLOSING = 9, 17
+WORKDAYS = range(6)
+# durations and buffers that fit one hour, so neighbouring slots never collide
+DURATIONS = (30, 45)
+BUFFERS = (0, 5, 10, 15)
+# share of working hours that get booked, and of provider days taken off (blocked)
+OCCUPANCY = 0.7
+DAYS_OFF = 0.03
+
+# status mixes of past and upcoming appointments
+PAST_STATUSES = (('completed', 75), ('cancelled', 12), ('rejected', 5), ('confirmed', 8))
+UPCOMING_STATUSES = (('confirmed', 65), ('pending', 25), ('cancelled', 10))
+
+BATCH_SIZE = 5000
+
+# how long before its start an appointment was booked, in hours; repeats weigh the
+# short lead times more. Picked by appointment id modulo the length.
+LEAD_HOURS = (1, 3, 6, 12, 24, 24, 48, 48, 72, 72, 96, 120, 168, 168, 240, 336, 504, 672)
+
+
+class Command(BaseCommand):
+    help = ("Generate synthetic scheduling data: providers, customers, categories, services, weekly "
+            "availability, days off and appointments (up to millions) with realistic status mixes. "
+            f"Users are named {PREFIX}*; --clear removes them and everything they own.")
+
+    def add_arguments(self, parser):
+        parser.add_argument('--providers', type=int, default=200)
+        parser.add_argument('--customers', type=int, default=20000)
+        parser.add_argument('--services-per-provider', type=int, default=4)
+        parser.add_argument('--appointments', type=int, default=1000000)
+        parser.add_argument('--days-ahead', type=int, default=30, help='How far into the future bookings go')
+        parser.add_argument('--seed', type=int, default=0)
+        parser.add_argument('--clear', action='store_true', help='Only remove previously generated data')
+
+    def handle(self, *args, **options):
+        self.clear()
+        if options['clear']:
+            return
+        rng = random.Random(options['seed'])
+        t0 = time.perf_counter()
+        total = options['appointments']
+        providers = options['providers']
+        # enough past days to hold the requested appointments at the target occupancy
+        slots_per_day = providers * (CLOSING - OPENING) * len(WORKDAYS) / 7 * OCCUPANCY * (1 - DAYS_OFF)
+        last_day = timezone.localdate() + timedelta(days=options['days_ahead'])
+        first_day = last_day - timedelta(days=max(1, math.ceil(total / slots_per_day)))
+
+        with transaction.atomic():
+            provider_ids, customer_ids = self.users(providers, options['customers'])
+            services = self.services(rng, provider_ids, options['services_per_provider'])
+            days_off = self.availability(rng, provider_ids, first_day, last_day)
+        self.stdout.write(f"{len(provider_ids)} providers, {len(customer_ids)} customers, {len(services)} services, "
+                          f"{len(days_off)} days off from {first_day} to {last_day}")
+
+        created = self.appointments(rng, services, customer_ids, days_off, first_day, last_day, total)
+        self.stdout.write(f"{created} appointments")
+
+        rebuild()
+        refresh_documents([s.id for s in services])
+        # bulk inserts send no signals: expire what the caches hold
+        invalidate_validators(['services', 'appointments', 'availability'], related=True)
+        bump_versions([GLOBAL_SCOPE] + [provider_scope(pk) for pk in provider_ids])
+        self.stdout.write(self.style.SUCCESS(f"Generated in {time.perf_counter() - t0:.1f}s"))
+
+    def users(self, providers, customers):
+        # one hash for all: nobody logs in with these, and hashing per user would dominate
+        password = make_password(None)
+        users = [User(username=f'{PREFIX}admin', role='admin', email='admin@example.com', password=password)]
+        users += [User(username=f'{PREFIX}provider{i}', role='provider', email=f'provider{i}@example.com',
+                       password=password) for i in range(providers)]
+        users += [User(username=f'{PREFIX}customer{i}', role='customer', email=f'customer{i}@example.com',
+                       password=password) for i in range(customers)]
+        User.objects.bulk_create(users, batch_size=BATCH_SIZE)
+        ids = dict(User.objects.filter(username__startswith=PREFIX).values_list('username', 'id'))
+        return ([ids[f'{PREFIX}provider{i}'] for i in range(providers)],
+                [ids[f'{PREFIX}customer{i}'] for i in range(customers)])
+
+    def services(self, rng, provider_ids, per_provider):
+        categories = [Category.objects.get_or_create(name=name)[0] for name in CATEGORIES]
+        services = []
+        for provider_id in provider_ids:
+            # a provider works in one or two categories
+            own = rng.sample(categories, 2)
+            for kind in rng.sample(SERVICE_KINDS, min(per_provider, len(SERVICE_KINDS))):
+                category = rng.choice(own)
+                services.append(Service(
+                    provider_id=provider_id, category=category, name=f"{category.name} {kind.lower()}",
+                    price=Decimal(rng.randrange(1500, 15000)) / 100,
+                    duration=rng.choice(DURATIONS), buffer_time=rng.choice(BUFFERS)))
+        return Service.objects.bulk_create(services, batch_size=BATCH_SIZE)
+
+    def availability(self, rng, provider_ids, first_day, last_day):
+        AvailabilityRule.objects.bulk_create([
+            AvailabilityRule(provider_id=provider_id, weekday=weekday, start_time=dtime(OPENING),
+                             end_time=dtime(CLOSING), valid_from=first_day)
+            for provider_id in provider_ids for weekday in WORKDAYS
+        ], batch_size=BATCH_SIZE)
+        days_off = set()
+        day = first_day
+        while day <= last_day:
+            if day.weekday() in WORKDAYS:
+                days_off.update((provider_id, day) for provider_id in provider_ids if rng.random() < DAYS_OFF)
+            day += timedelta(days=1)
+        Availability.objects.bulk_create([
+            Availability(provider_id=provider_id, date=day, start_time=dtime(OPENING), end_time=dtime(CLOSING),
+                         is_available=False)
+            for provider_id, day in sorted(days_off)
+        ], batch_size=BATCH_SIZE)
+        return days_off
+
+    def appointments(self, rng, services, customer_ids, days_off, first_day, last_day, total):
+        by_provider = {}
+        for service in services:
+            by_provider.setdefault(service.provider_id, []).append(service)
+        past_statuses, past_weights = zip(*PAST_STATUSES)
+        upcoming_statuses, upcoming_weights = zip(*UPCOMING_STATUSES)
+        now = timezone.now()
+
+        created, batch = 0, []
+        day = first_day
+        while day <= last_day and created + len(batch) < total:
+            if day.weekday() in WORKDAYS:
+                for provider_id, provider_services in by_provider.items():
+                    if (provider_id, day) in days_off:
+                        continue
+                    for hour in range(OPENING, CLOSING):
+                        if rng.random() >= OCCUPANCY:
+                            continue
+                        service = rng.choice(provider_services)
+                        start = timezone.make_aware(datetime.combine(day, dtime(hour)))
+                        past = start < now
+                        status = rng.choices(past_statuses if past else upcoming_statuses,
+                                             past_weights if past else upcoming_weights)[0]
+                        batch.append(Appointment(
+                            service_id=service.id, provider_id=provider_id, customer_id=rng.choice(customer_ids),
+                            start_datetime=start, end_datetime=start + timedelta(minutes=service.duration),
+                            status=status, price=service.price,
+                            reminder_sent_for=start if past and status != 'cancelled' else None))
+                        if created + len(batch) >= total:
+                            break
+                    if len(batch) >= BATCH_SIZE:
+                        Appointment.objects.bulk_create(batch)
+                        created += len(batch)
+                        batch = []
+                    if created + len(batch) >= total:
+                        break
+            day += timedelta(days=1)
+        if batch:
+            Appointment.objects.bulk_create(batch)
+            created += len(batch)
+
+        # bulk_create stamps created_at with now (auto_now_add): backdate each appointment to its
+        # booking, never later than now, with one UPDATE per lead time
+        generated = Appointment.objects.filter(provider__username__startswith=PREFIX).alias(
+            lead=Mod('id', len(LEAD_HOURS)))
+        for position, hours in enumerate(LEAD_HOURS):
+            generated.filter(lead=position).update(created_at=Least(
+                F('start_datetime') - timedelta(hours=hours), Value(now), output_field=DateTimeField()))
+        return created
+
+    def clear(self):
+        users = User.objects.filter(username__startswith=PREFIX)
+        if not users.exists():
+            return
+        # appointments go in one DELETE, without the per-row delete signals (notification outbox,
+        # rollups, calendar pushes) that a cascade from the users would send for each of them
+        provider_ids = users.values('id')
+        sql, params = provider_ids.query.sql_with_params()
+        quote = connection.ops.quote_name
+        with connection.cursor() as cursor:
+            cursor.execute(f"DELETE FROM {quote(Appointment._meta.db_table)} "
+                           f"WHERE {quote(Appointment._meta.get_field('provider').column)} IN ({sql})", params)
+            deleted = cursor.rowcount
+        # services, rules, availability and rollup rows go with the users
+        users.delete()
+        self.stdout.write(f"Removed {deleted} generated appointments and their users")
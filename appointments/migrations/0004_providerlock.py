@@ -0,0 +1,23 @@
+# Generated by Django 5.2.18 on 2026-10-18 05:28
+
+import django.db.models.deletion
+from django.conf import settings
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('accounts', '0001_initial'),
+        ('appointments', '0003_availabilityrule'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='ProviderLock',
+            fields=[
+                ('provider', models.OneToOneField(on_delete=django.db.models.deletion.CASCADE, primary_key=True, related_name='booking_lock', serialize=False, to=settings.AUTH_USER_MODEL)),
+                ('locked_at', models.DateTimeField(blank=True, null=True)),
+            ],
+        ),
+    ]
@@ -0,0 +1,76 @@
+# Generated by Django 5.2.18 on 2026-10-18 05:28
+
+from django.db import migrations
+
+# Database-level guard against two non-cancelled appointments of one provider overlapping.
+# Buffer times are still enforced by the application; this catches raw overlaps that slip
+# past it (e.g. writes that bypass the booking serializers).
+
+POSTGRES_FORWARD = [
+    "CREATE EXTENSION IF NOT EXISTS btree_gist",
+    """
+    ALTER TABLE appointments_appointment
+    ADD CONSTRAINT appointment_no_provider_overlap
+    EXCLUDE USING gist (
+        provider_id WITH =,
+        tstzrange(start_datetime, end_datetime, '[)') WITH &&
+    ) WHERE (status <> 'cancelled')
+    """,
+]
+POSTGRES_BACKWARD = [
+    "ALTER TABLE appointments_appointment DROP CONSTRAINT IF EXISTS appointment_no_provider_overlap",
+]
+
+SQLITE_OVERLAP = """
+    EXISTS (
+        SELECT 1 FROM appointments_appointment a
+        WHERE a.provider_id = NEW.provider_id
+          AND a.status <> 'cancelled'
+          AND a.start_datetime < NEW.end_datetime
+          AND a.end_datetime > NEW.start_datetime
+          {extra}
+    )
+"""
+SQLITE_FORWARD = [
+    f"""
+    CREATE TRIGGER appointment_no_provider_overlap_insert
+    BEFORE INSERT ON appointments_appointment
+    WHEN NEW.status <> 'cancelled' AND {SQLITE_OVERLAP.format(extra='')}
+    BEGIN
+        SELECT RAISE(ABORT, 'appointment overlaps another appointment of this provider');
+    END
+    """,
+    f"""
+    CREATE TRIGGER appointment_no_provider_overlap_update
+    BEFORE UPDATE OF provider_id, start_datetime, end_datetime, status ON appointments_appointment
+    WHEN NEW.status <> 'cancelled' AND {SQLITE_OVERLAP.format(extra='AND a.id <> NEW.id')}
+    BEGIN
+        SELECT RAISE(ABORT, 'appointment overlaps another appointment of this provider');
+    END
+    """,
+]
+SQLITE_BACKWARD = [
+    "DROP TRIGGER IF EXISTS appointment_no_provider_overlap_insert",
+    "DROP TRIGGER IF EXISTS appointment_no_provider_overlap_update",
+]
+
+
+def run(statements):
+    def apply(apps, schema_editor):
+        for sql in statements.get(schema_editor.connection.vendor, []):
+            schema_editor.execute(sql)
+    return apply
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('appointments', '0004_providerlock'),
+    ]
+
+    operations = [
+        migrations.RunPython(
+            run({'postgresql': POSTGRES_FORWARD, 'sqlite': SQLITE_FORWARD}),
+            run({'postgresql': POSTGRES_BACKWARD, 'sqlite': SQLITE_BACKWARD}),
+        ),
+    ]
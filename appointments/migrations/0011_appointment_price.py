@@ -0,0 +1,28 @@
+# Generated by Django 5.2.18 on 2026-10-18 12:40
+
+from django.db import migrations, models
+from django.db.models import OuterRef, Subquery
+
+
+def backfill_prices(apps, schema_editor):
+    # existing bookings keep the price their rollup revenue was counted with: today's service price
+    Appointment = apps.get_model('appointments', 'Appointment')
+    Service = apps.get_model('services', 'Service')
+    Appointment.objects.filter(price__isnull=True).update(
+        price=Subquery(Service.objects.filter(pk=OuterRef('service_id')).values('price')[:1]))
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('appointments', '0010_availability_updated_at'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='appointment',
+            name='price',
+            field=models.DecimalField(blank=True, decimal_places=2, editable=False, max_digits=8, null=True),
+        ),
+        migrations.RunPython(backfill_prices, migrations.RunPython.noop),
+    ]
@@ -0,0 +1,20 @@
+# Generated by Django 5.2.18 on 2026-10-18 06:57
+
+from django.conf import settings
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('appointments', '0012_notificationoutbox_details'),
+        ('services', '0003_searchindexversion'),
+        migrations.swappable_dependency(settings.AUTH_USER_MODEL),
+    ]
+
+    operations = [
+        migrations.AddIndex(
+            model_name='appointment',
+            index=models.Index(condition=models.Q(('status', 'cancelled'), _negated=True), fields=['provider', 'start_datetime'], name='appt_provider_active_start_idx'),
+        ),
+    ]
@@ -1,4 +1,4 @@
-from django.db import models
+from django.db import models, transaction
 from django.conf import settings
 from django.utils import timezone
 from django.core.exceptions import ValidationError
@@ -16,6 +16,7 @@ class Availability(models.Model):
     start_time = models.TimeField()
     end_time = models.TimeField()
     is_available = models.BooleanField(default=True)  # False = blocked
+    updated_at = models.DateTimeField(auto_now=True)
 
     class Meta:
         ordering = ['date', 'start_time']
@@ -25,6 +26,43 @@ class Availability(models.Model):
         return f"{self.provider.username} - {self.date} {self.start_time}-{self.end_time} ({'open' if self.is_available else 'blocked'})"
 
 
+class AvailabilityRule(models.Model):
+    """
+    Weekly recurring availability template for a provider, e.g. every Monday 09:00-17:00.
+    Rules are expanded on demand for the requested window (see appointments.scheduling).
+    Concrete `Availability` rows act as exceptions: an open row on a date replaces the
+    template for that date, and `is_available=False` rows block time (breaks/holidays).
+    """
+    WEEKDAY_CHOICES = [
+        (0, 'Monday'),
+        (1, 'Tuesday'),
+        (2, 'Wednesday'),
+        (3, 'Thursday'),
+        (4, 'Friday'),
+        (5, 'Saturday'),
+        (6, 'Sunday'),
+    ]
+
+    provider = models.ForeignKey(User, on_delete=models.CASCADE, related_name='availability_rules')
+    weekday = models.PositiveSmallIntegerField(choices=WEEKDAY_CHOICES)
+    start_time = models.TimeField()
+    end_time = models.TimeField()
+    valid_from = models.DateField(default=timezone.localdate)
+    valid_until = models.DateField(null=True, blank=True)  # None = open ended
+
+    class Meta:
+        ordering = ['weekday', 'start_time']
+
+    def clean(self):
+        if self.start_time >= self.end_time:
+            raise ValidationError("start_time must be before end_time")
+        if self.valid_until and self.valid_until < self.valid_from:
+            raise ValidationError("valid_until must not be before valid_from")
+
+    def __str__(self):
+        return f"{self.provider.username} - {self.get_weekday_display()} {self.start_time}-{self.end_time}"
+
+
 class Appointment(models.Model):
     STATUS_CHOICES = (
         ('pending', 'Pending'),
@@ -45,9 +83,33 @@ class Appointment(models.Model):
     updated_at = models.DateTimeField(auto_now=True)
     # optionally store a cancellation/reschedule reason
     reason = models.TextField(blank=True)
+    # start time the reminder was sent for; a rerun skips rows where it equals start_datetime,
+    # and a reschedule makes the appointment due for a reminder again
+    reminder_sent_for = models.DateTimeField(null=True, blank=True, editable=False)
+    # service price when booked (set on save): revenue rollups count it, so a later price
+    # change of the service leaves the revenue of existing bookings alone
+    price = models.DecimalField(max_digits=8, decimal_places=2, null=True, blank=True, editable=False)
 
     class Meta:
         ordering = ['-start_datetime']
+        indexes = [
+            # overlap check: provider's appointments ending after a given instant
+            models.Index(fields=['provider', 'end_datetime'], name='appt_provider_end_idx'),
+            # provider dashboard / serializer: provider + status + time range
+            models.Index(fields=['provider', 'status', 'start_datetime'], name='appt_provider_status_start_idx'),
+            # customer dashboard
+            models.Index(fields=['customer', 'start_datetime'], name='appt_customer_start_idx'),
+            # provider's appointment list, newest first (keyset pagination)
+            models.Index(fields=['provider', 'start_datetime'], name='appt_provider_start_idx'),
+            # overlap checks and slot searches only look at appointments holding their time;
+            # cancelled rows pile up over the years and stay out of this index
+            models.Index(fields=['provider', 'start_datetime'], condition=~models.Q(status='cancelled'),
+                         name='appt_provider_active_start_idx'),
+            # admin dashboard trends and CSV export
+            models.Index(fields=['created_at'], name='appt_created_idx'),
+            # daily reminders: start time range + status
+            models.Index(fields=['start_datetime', 'status'], name='appt_start_status_idx'),
+        ]
 
     def clean(self):
         if self.start_datetime >= self.end_datetime:
@@ -56,8 +118,48 @@ class Appointment(models.Model):
             raise ValidationError("Provider and customer cannot be the same user.")
 
     def save(self, *args, **kwargs):
+        if self.price is None:
+            self.price = self.service.price
         self.full_clean()
-        return super().save(*args, **kwargs)
+        # post_save receivers (notification outbox, rollups) write in the same transaction
+        with transaction.atomic():
+            return super().save(*args, **kwargs)
 
     def __str__(self):
         return f"{self.service.name} ({self.customer.username}) @ {self.start_datetime} -> {self.status}"
+
+
+class ProviderLock(models.Model):
+    """
+    Advisory lock row, one per provider. Booking transactions update it before their final
+    overlap check, which serializes concurrent bookings for the same provider:
+    a row lock on PostgreSQL, the database write lock on SQLite.
+    """
+    provider = models.OneToOneField(User, on_delete=models.CASCADE, primary_key=True, related_name='booking_lock')
+    locked_at = models.DateTimeField(null=True, blank=True)
+
+    def __str__(self):
+        return f"lock for provider {self.provider_id}"
+
+
+class NotificationOutbox(models.Model):
+    """
+    Booking notification waiting to be dispatched. Rows are written by the appointment
+    signals in the same transaction as the change, so a rolled-back booking never notifies,
+    and are drained in batches by notifications.outbox.dispatch_outbox.
+    """
+    # not a foreign key: a 'deleted' event outlives its appointment
+    appointment_id = models.BigIntegerField(db_index=True)
+    event_type = models.CharField(max_length=20)
+    # part of a bulk booking: sent as one digest per customer/provider
+    digest = models.BooleanField(default=False)
+    # what the mail says (notifications.tasks.booking_details), kept for 'deleted' events,
+    # whose appointment is gone by the time they are dispatched
+    details = models.JSONField(null=True, blank=True)
+    created_at = models.DateTimeField(auto_now_add=True)
+
+    class Meta:
+        ordering = ['id']
+
+    def __str__(self):
+        return f"{self.event_type} appointment {self.appointment_id}"
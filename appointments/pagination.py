@@ -0,0 +1,129 @@
+import base64
+import json
+from django.core.exceptions import ValidationError
+from django.db.models import Q
+from rest_framework.exceptions import NotFound
+from rest_framework.pagination import BasePagination
+from rest_framework.response import Response
+from rest_framework.utils.urls import replace_query_param
+
+
+class KeysetPagination(BasePagination):
+    """
+    Cursor pagination on a composite key such as ('-start_datetime', '-id').
+    The cursor carries the key of the row at the page edge, and the next page is a range
+    seek past it on an index over the same columns, so page 1000 costs what page 1 does.
+    The trailing unique field makes the key total: rows sharing a start time are neither
+    skipped nor repeated.
+    """
+    ordering = ('-id',)
+    page_size = 50
+    max_page_size = 200
+    page_size_query_param = 'page_size'
+    cursor_query_param = 'cursor'
+    invalid_cursor_message = 'Invalid cursor'
+
+    def paginate_queryset(self, queryset, request, view=None):
+        self.request = request
+        self.ordering = getattr(view, 'pagination_ordering', self.ordering)
+        self.page_size = self.get_page_size(request)
+        self.cursor = self.decode_cursor(request)
+        reverse = bool(self.cursor and self.cursor['reverse'])
+
+        ordering = [self.flip(field) for field in self.ordering] if reverse else list(self.ordering)
+        queryset = queryset.order_by(*ordering)
+        try:
+            if self.cursor:
+                queryset = queryset.filter(self.after(ordering, self.cursor['key']))
+            rows = list(queryset[:self.page_size + 1])
+        except (ValidationError, TypeError, ValueError):
+            # a tampered key that the field can't parse
+            raise NotFound(self.invalid_cursor_message)
+        has_more = len(rows) > self.page_size
+        rows = rows[:self.page_size]
+        if reverse:
+            rows.reverse()
+
+        # forwards: a previous page exists iff we arrived through a cursor;
+        # backwards: the page we came from is always a next page
+        self.next_key = self.key(rows[-1]) if rows and (reverse or has_more) else None
+        self.previous_key = self.key(rows[0]) if rows and (has_more if reverse else self.cursor) else None
+        return rows
+
+    def get_paginated_response(self, data):
+        return Response({
+            'next': self.link(self.next_key, reverse=False),
+            'previous': self.link(self.previous_key, reverse=True),
+            'results': data,
+        })
+
+    def get_paginated_response_schema(self, schema):
+        return {
+            'type': 'object',
+            'required': ['results'],
+            'properties': {
+                'next': {'type': 'string', 'nullable': True, 'format': 'uri'},
+                'previous': {'type': 'string', 'nullable': True, 'format': 'uri'},
+                'results': schema,
+            },
+        }
+
+    def get_page_size(self, request):
+        try:
+            size = int(request.query_params.get(self.page_size_query_param, self.page_size))
+        except ValueError:
+            return self.page_size
+        return max(1, min(size, self.max_page_size))
+
+    @staticmethod
+    def flip(field):
+        return field[1:] if field.startswith('-') else f'-{field}'
+
+    @staticmethod
+    def after(ordering, key):
+        """
+        Rows strictly past `key` in `ordering`:
+        (a > x) OR (a = x AND b > y) OR ..., with < for descending fields.
+        The redundant a >= x in front gives the planner a range to seek on.
+        """
+        condition = Q()
+        equal = {}
+        for field, value in zip(ordering, key):
+            name = field.lstrip('-')
+            lookup = f"{name}__lt" if field.startswith('-') else f"{name}__gt"
+            condition |= Q(**equal, **{lookup: value})
+            equal[name] = value
+        first = ordering[0]
+        bound = f"{first[1:]}__lte" if first.startswith('-') else f"{first}__gte"
+        return Q(**{bound: key[0]}) & condition
+
+    def key(self, instance):
+        return [self.field_value(instance, field.lstrip('-')) for field in self.ordering]
+
+    @staticmethod
+    def field_value(instance, name):
+        value = getattr(instance, name)
+        # dates/datetimes/times go through isoformat and are parsed back by the field's lookup
+        return value.isoformat() if hasattr(value, 'isoformat') else value
+
+    def decode_cursor(self, request):
+        encoded = request.query_params.get(self.cursor_query_param)
+        if not encoded:
+            return None
+        try:
+            cursor = json.loads(base64.urlsafe_b64decode(encoded.encode('ascii')))
+            key = cursor['key']
+            if not isinstance(key, list) or len(key) != len(self.ordering):
+                raise ValueError
+            if not all(isinstance(value, (str, int, float)) for value in key):
+                raise ValueError
+            return {'key': cursor['key'], 'reverse': bool(cursor.get('reverse'))}
+        except (TypeError, ValueError, KeyError, UnicodeError):
+            raise NotFound(self.invalid_cursor_message)
+
+    def link(self, key, reverse):
+        if key is None:
+            return None
+        url = self.request.build_absolute_uri()
+        encoded = base64.urlsafe_b64encode(json.dumps({'key': key, 'reverse': reverse}).encode()).decode('ascii')
+        return replace_query_param(url, self.cursor_query_param, encoded)
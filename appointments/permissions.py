@@ -11,7 +11,7 @@ class IsCustomerOrReadOnly(BasePermission):
         if request.method in SAFE_METHODS:
             return True
         # create allowed for authenticated customers
-        if view.action == 'create':
+        if view.action in ('create', 'bulk_create'):
             return request.user.is_authenticated and request.user.role == 'customer'
         # other mutating actions allowed for provider/admin (we do object checks later)
         return request.user.is_authenticated and request.user.role in ['provider', 'admin']
@@ -20,7 +20,7 @@ class IsCustomerOrReadOnly(BasePermission):
         # read allowed to customer if they own, provider if their appointment, admin always
         if request.method in SAFE_METHODS:
             return (request.user.is_authenticated and
-                    (request.user == obj.customer or request.user == obj.provider or request.user.role == 'admin'))
+                    (request.user.id in (obj.customer_id, obj.provider_id) or request.user.role == 'admin'))
 
         # for mutations:
         # - customer may cancel/reschedule their own (object-level checks elsewhere for time-limits)
@@ -28,8 +28,8 @@ class IsCustomerOrReadOnly(BasePermission):
         # - admin can do all
         if request.user.role == 'admin':
             return True
-        if request.user == obj.provider and request.user.role == 'provider':
+        if request.user.id == obj.provider_id and request.user.role == 'provider':
             return True
-        if request.user == obj.customer and request.user.role == 'customer':
+        if request.user.id == obj.customer_id and request.user.role == 'customer':
             return True
         return False
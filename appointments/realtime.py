@@ -0,0 +1,117 @@
+import importlib.util
+from collections import defaultdict
+from datetime import datetime
+from asgiref.sync import async_to_sync
+from django.conf import settings
+from django.db import transaction
+from django.utils import timezone
+
+# Calendar changes are pushed to WebSocket subscribers (appointments.consumers) when the
+# optional Django Channels is installed and CHANNEL_LAYERS is configured. Without them,
+# nothing below runs a query or touches a channel layer.
+CHANNELS_INSTALLED = importlib.util.find_spec('channels') is not None
+
+# Delta events, as sent to clients:
+#   slot_taken / slot_freed  {start, end}: time on the calendar got booked or blocked / released
+#   day_changed              {date}: the open hours of a date changed (an open Availability row
+#                            replaces the weekly rule for its date), re-read that date's slots
+#   calendar_changed         {}: the weekly rules changed, re-read everything
+SLOT_TAKEN = 'slot_taken'
+SLOT_FREED = 'slot_freed'
+DAY_CHANGED = 'day_changed'
+CALENDAR_CHANGED = 'calendar_changed'
+
+
+def realtime_enabled():
+    return CHANNELS_INSTALLED and bool(getattr(settings, 'CHANNEL_LAYERS', None))
+
+
+def calendar_group(provider_id):
+    return f"calendar.provider.{provider_id}"
+
+
+def slot(event, start, end, source, **extra):
+    return {'event': event, 'start': start.isoformat(), 'end': end.isoformat(), 'source': source, **extra}
+
+
+def appointment_state(appointment):
+    return (appointment.provider_id, appointment.start_datetime, appointment.end_datetime, appointment.status)
+
+
+def appointment_deltas(previous, current, service_id):
+    """
+    [(provider_id, delta)] for an appointment going from `previous` to `current`
+    (appointment_state tuples; None before creation / after deletion). Only the time an
+    appointment occupies matters: anything but a cancelled appointment holds its slot.
+    """
+    before = previous[:3] if previous and previous[3] != 'cancelled' else None
+    after = current[:3] if current and current[3] != 'cancelled' else None
+    if before == after:
+        return []
+    deltas = []
+    if before:
+        deltas.append((before[0], slot(SLOT_FREED, before[1], before[2], 'appointment', service=service_id)))
+    if after:
+        deltas.append((after[0], slot(SLOT_TAKEN, after[1], after[2], 'appointment', service=service_id)))
+    return deltas
+
+
+def availability_state(availability):
+    return (availability.provider_id, availability.date, availability.start_time, availability.end_time,
+            availability.is_available)
+
+
+def availability_deltas(previous, current):
+    """
+    [(provider_id, delta)] for an Availability row going from `previous` to `current`
+    (availability_state tuples or None). A blocked row takes its window whatever else is
+    on the date; an open row replaces the date's weekly hours, so it can only be reported
+    as a changed day.
+    """
+    if previous == current:
+        return []
+    deltas = []
+    for state, event in ((previous, SLOT_FREED), (current, SLOT_TAKEN)):
+        if state is None:
+            continue
+        provider_id, date, start_time, end_time, is_available = state
+        if is_available:
+            deltas.append((provider_id, {'event': DAY_CHANGED, 'date': date.isoformat(), 'source': 'availability'}))
+        else:
+            start = timezone.make_aware(datetime.combine(date, start_time))
+            end = timezone.make_aware(datetime.combine(date, end_time))
+            deltas.append((provider_id, slot(event, start, end, 'availability')))
+    # an open row moved within its date reports that date once
+    unique = []
+    for delta in deltas:
+        if delta not in unique:
+            unique.append(delta)
+    return unique
+
+
+def rules_deltas(provider_id):
+    return [(provider_id, {'event': CALENDAR_CHANGED, 'source': 'availability_rule'})]
+
+
+def publish(deltas):
+    """
+    Send [(provider_id, delta)] to the providers' calendar groups once the transaction
+    commits, one message per provider. A broken channel layer is logged, never raised:
+    the write already succeeded.
+    """
+    if not deltas or not realtime_enabled():
+        return
+    by_provider = defaultdict(list)
+    for provider_id, delta in deltas:
+        by_provider[provider_id].append(delta)
+
+    def send():
+        from channels.layers import get_channel_layer
+        layer = get_channel_layer()
+        for provider_id, provider_deltas in by_provider.items():
+            async_to_sync(layer.group_send)(calendar_group(provider_id), {
+                'type': 'calendar.delta',
+                'provider': provider_id,
+                'deltas': provider_deltas,
+            })
+    transaction.on_commit(send, robust=True)
@@ -0,0 +1,7 @@
+from django.urls import path
+from .consumers import CalendarConsumer
+
+websocket_urlpatterns = [
+    path('ws/calendar/provider/<int:provider_id>/', CalendarConsumer.as_asgi()),
+    path('ws/calendar/service/<int:service_id>/', CalendarConsumer.as_asgi()),
+]
@@ -0,0 +1,395 @@
+import heapq
+from collections import defaultdict
+from datetime import timedelta, datetime
+from itertools import islice
+from django.db.models import Max
+from django.utils import timezone
+from .models import Appointment, Availability, AvailabilityRule, ProviderLock
+from services.models import Service
+
+
+def lock_providers(provider_ids):
+    """
+    Serialize bookings per provider. Must run inside transaction.atomic; the lock is held
+    until the transaction ends. Providers are locked in id order so batches touching
+    several providers cannot deadlock each other.
+    """
+    now = timezone.now()
+    for provider_id in sorted(set(provider_ids)):
+        if not ProviderLock.objects.filter(provider_id=provider_id).update(locked_at=now):
+            ProviderLock.objects.bulk_create([ProviderLock(provider_id=provider_id)], ignore_conflicts=True)
+            ProviderLock.objects.filter(provider_id=provider_id).update(locked_at=now)
+
+
+def max_buffer_minutes(provider, service=None):
+    """
+    Largest buffer_time among the provider's services (and `service`, if given).
+    Used to widen the overlap search window so no conflicting row can fall outside it.
+    """
+    provider_max = Service.objects.filter(provider=provider).aggregate(m=Max('buffer_time'))['m'] or 0
+    this_buffer = getattr(service, 'buffer_time', 0) or 0
+    return max(provider_max, this_buffer)
+
+
+def nearby_appointments(provider, start_dt, end_dt, window_minutes, exclude_pk=None):
+    """
+    Non-cancelled provider appointments that intersect [start_dt, end_dt] widened by
+    `window_minutes` on both sides. Returns (start, end, buffer_time) tuples.
+    The cost depends only on how many appointments are near the window, not on
+    the provider's whole history.
+    """
+    window = timedelta(minutes=window_minutes)
+    qs = (Appointment.objects
+          .filter(provider=provider,
+                  start_datetime__lt=end_dt + window,
+                  end_datetime__gt=start_dt - window)
+          .exclude(status='cancelled'))
+    if exclude_pk is not None:
+        qs = qs.exclude(pk=exclude_pk)
+    return qs.values_list('start_datetime', 'end_datetime', 'service__buffer_time')
+
+
+def collides(candidate_start, candidate_end, this_buffer, others):
+    """
+    True if the candidate interval overlaps any (start, end, buffer) in `others`,
+    using the larger of the two buffers (conservative).
+    """
+    for other_start, other_end, other_buffer in others:
+        buffer = timedelta(minutes=max(other_buffer or 0, this_buffer or 0))
+        # overlapping if candidate_start < other_end + buffer and candidate_end + buffer > other_start
+        if candidate_start < other_end + buffer and candidate_end + buffer > other_start:
+            return True
+    return False
+
+
+def has_conflict(provider, service, candidate_start, candidate_end, exclude_pk=None):
+    """
+    Overlap check against other appointments for provider, respecting buffer times.
+    Runs one aggregate over the provider's services and one bounded range query.
+    """
+    window = max_buffer_minutes(provider, service)
+    others = nearby_appointments(provider, candidate_start, candidate_end, window, exclude_pk=exclude_pk)
+    return collides(candidate_start, candidate_end, getattr(service, 'buffer_time', 0), others)
+
+
+def merge_intervals(intervals):
+    """
+    Merge overlapping (start, end) intervals. Returns a sorted, disjoint list.
+    Intervals that only touch are kept apart, so their shared endpoint stays free.
+    """
+    merged = []
+    for start, end in sorted(intervals):
+        if merged and start < merged[-1][1]:
+            if end > merged[-1][1]:
+                merged[-1][1] = end
+        else:
+            merged.append([start, end])
+    return [(start, end) for start, end in merged]
+
+
+def iter_rule_rows(rules, start_date, end_date, skip_dates=()):
+    """
+    Lazily expand weekly rules (weekday, start_time, end_time, valid_from, valid_until)
+    into (date, start_time, end_time, True) rows for dates in [start_date, end_date].
+    Each rule jumps straight from one matching weekday to the next.
+    """
+    for weekday, start_time, end_time, valid_from, valid_until in rules:
+        first = max(start_date, valid_from)
+        last = min(end_date, valid_until) if valid_until else end_date
+        day = first + timedelta(days=(weekday - first.weekday()) % 7)
+        while day <= last:
+            if day not in skip_dates:
+                yield day, start_time, end_time, True
+            day += timedelta(days=7)
+
+
+def expand_availability(provider_ids, start_date, end_date):
+    """
+    Availability rows (date, start_time, end_time, is_available) per provider for
+    [start_date, end_date], combining concrete Availability rows with expanded
+    AvailabilityRule templates. Two queries regardless of window length.
+    A date with any concrete open row uses those rows instead of the template;
+    blocked rows always apply.
+    """
+    concrete = defaultdict(list)
+    rows = (Availability.objects
+            .filter(provider__in=provider_ids, date__gte=start_date, date__lte=end_date)
+            .values_list('provider', 'date', 'start_time', 'end_time', 'is_available'))
+    for provider_id, *row in rows:
+        concrete[provider_id].append(tuple(row))
+
+    rules = defaultdict(list)
+    rule_rows = (AvailabilityRule.objects
+                 .filter(provider__in=provider_ids, valid_from__lte=end_date)
+                 .exclude(valid_until__lt=start_date)
+                 .values_list('provider', 'weekday', 'start_time', 'end_time', 'valid_from', 'valid_until'))
+    for provider_id, *rule in rule_rows:
+        rules[provider_id].append(rule)
+
+    expanded = defaultdict(list)
+    for provider_id in set(concrete) | set(rules):
+        provider_rows = concrete[provider_id]
+        overridden = {row[0] for row in provider_rows if row[3]}
+        expanded[provider_id] = provider_rows + list(
+            iter_rule_rows(rules[provider_id], start_date, end_date, skip_dates=overridden))
+    return expanded
+
+
+def within_availability(rows, candidate_start, candidate_end):
+    """
+    True if the candidate fits inside one open window and touches no blocked window.
+    """
+    open_windows, blocked = availability_windows(rows)
+    if any(candidate_start < block_end and candidate_end > block_start for block_start, block_end in blocked):
+        return False
+    return any(candidate_start >= window_start and candidate_end <= window_end
+               for window_start, window_end in open_windows)
+
+
+def availability_windows(rows):
+    """
+    Split availability rows (date, start_time, end_time, is_available) into
+    aware (open, blocked) datetime interval lists.
+    """
+    open_windows, blocked = [], []
+    for day, start_time, end_time, is_available in rows:
+        start = timezone.make_aware(datetime.combine(day, start_time))
+        end = timezone.make_aware(datetime.combine(day, end_time))
+        (open_windows if is_available else blocked).append((start, end))
+    return open_windows, blocked
+
+
+def forbidden_starts(duration, this_buffer, busy, blocked):
+    """
+    Start times that would collide, as merged (lo, hi) open intervals.
+    A candidate starting at s collides with an appointment (o_start, o_end, o_buffer) when
+    s < o_end + b and s + duration + b > o_start, with b the larger buffer, i.e. when
+    s lies in (o_start - duration - b, o_end + b). Blocked slots forbid (b_start - duration, b_end).
+    """
+    length = timedelta(minutes=duration)
+    intervals = []
+    for other_start, other_end, other_buffer in busy:
+        buffer = timedelta(minutes=max(other_buffer or 0, this_buffer or 0))
+        intervals.append((other_start - length - buffer, other_end + buffer))
+    for block_start, block_end in blocked:
+        intervals.append((block_start - length, block_end))
+    return merge_intervals(intervals)
+
+
+def starts_in(intervals, pointers, key, start):
+    """
+    Whether `start` lies in one of the merged open `intervals` (as from forbidden_starts),
+    for starts checked in increasing order: pointers[key] keeps the sweep position.
+    """
+    i = pointers[key]
+    while i < len(intervals) and intervals[i][1] <= start:
+        i += 1
+    pointers[key] = i
+    return i < len(intervals) and intervals[i][0] < start
+
+
+def iter_slots(open_windows, forbidden, duration, step, range_start, range_end):
+    """
+    Yield, in increasing order, every start time aligned to `step` from the start of its
+    availability window that fits inside the window, lies in [range_start, range_end)
+    and is not in a forbidden interval. Each window's candidates are already sorted, so
+    they are merged lazily and checked against the sorted forbidden list in one pass.
+    """
+    length = timedelta(minutes=duration)
+    step = timedelta(minutes=step)
+
+    def window_candidates(window_start, window_end):
+        slot = window_start
+        if slot < range_start:
+            # jump to the first aligned start inside the range
+            slot += -((window_start - range_start) // step) * step
+        while slot + length <= window_end and slot < range_end:
+            yield slot
+            slot += step
+
+    candidates = heapq.merge(*(window_candidates(start, end) for start, end in sorted(open_windows)))
+    i = 0
+    last = None
+    for slot in candidates:
+        if slot == last:
+            # overlapping availability rows produce the same start twice
+            continue
+        last = slot
+        while i < len(forbidden) and forbidden[i][1] <= slot:
+            i += 1
+        if i < len(forbidden) and forbidden[i][0] < slot:
+            continue
+        yield slot
+
+
+def bookable_slots(service, range_start, range_end, step):
+    """
+    Bookable start times for `service` between range_start and range_end.
+    Reads the provider's availability and nearby appointments once each, then sweeps.
+    """
+    provider = service.provider_id
+    range_start = max(range_start, timezone.now())
+    if range_start >= range_end:
+        return []
+
+    rows = expand_availability([provider], range_start.date(), range_end.date())[provider]
+    open_windows, blocked = availability_windows(rows)
+    if not open_windows:
+        return []
+
+    window = max_buffer_minutes(provider, service)
+    busy = nearby_appointments(provider, range_start, range_end + timedelta(minutes=service.duration), window)
+    forbidden = forbidden_starts(service.duration, service.buffer_time, busy, blocked)
+    return list(iter_slots(open_windows, forbidden, service.duration, step, range_start, range_end))
+
+
+def earliest_slots(services, range_start, range_end, step, limit):
+    """
+    The `limit` earliest bookable (start, service) pairs across `services`, which may
+    belong to many providers. Availability (rows and rules), provider buffers and appointments
+    are read once for all providers; every service then gets a lazy slot generator
+    and a k-way heap merge stops as soon as `limit` results are found.
+    """
+    services = list(services)
+    range_start = max(range_start, timezone.now())
+    if not services or range_start >= range_end:
+        return []
+    provider_ids = {s.provider_id for s in services}
+
+    windows = expand_availability(provider_ids, range_start.date(), range_end.date())
+
+    buffers = dict(Service.objects
+                   .filter(provider__in=provider_ids)
+                   .values('provider')
+                   .annotate(m=Max('buffer_time'))
+                   .values_list('provider', 'm'))
+    max_buffer = max([b or 0 for b in buffers.values()] + [s.buffer_time for s in services])
+    max_duration = max(s.duration for s in services)
+
+    busy = defaultdict(list)
+    appointments = (Appointment.objects
+                    .filter(provider__in=provider_ids,
+                            start_datetime__lt=range_end + timedelta(minutes=max_duration + max_buffer),
+                            end_datetime__gt=range_start - timedelta(minutes=max_buffer))
+                    .exclude(status='cancelled')
+                    .values_list('provider', 'start_datetime', 'end_datetime', 'service__buffer_time'))
+    for provider_id, *row in appointments:
+        busy[provider_id].append(row)
+
+    def service_slots(service):
+        # forbidden intervals are only built once the merge first pulls from this service
+        open_windows, blocked = availability_windows(windows[service.provider_id])
+        forbidden = forbidden_starts(service.duration, service.buffer_time, busy[service.provider_id], blocked)
+        for slot in iter_slots(open_windows, forbidden, service.duration, step, range_start, range_end):
+            yield slot, service.id, service
+
+    streams = [service_slots(s) for s in services if windows[s.provider_id]]
+    merged = heapq.merge(*streams, key=lambda item: (item[0], item[1]))
+    return [(slot, service) for slot, _, service in islice(merged, limit)]
+
+
+def contained_in_windows(candidates, open_windows):
+    """
+    For (start, end) candidates sorted by start, yield whether each lies entirely inside
+    a single open window. Windows are swept in start order, tracking the furthest end
+    among the windows that have already opened.
+    """
+    windows = sorted(open_windows)
+    i = 0
+    furthest_end = None
+    for start, end in candidates:
+        while i < len(windows) and windows[i][0] <= start:
+            if furthest_end is None or windows[i][1] > furthest_end:
+                furthest_end = windows[i][1]
+            i += 1
+        yield furthest_end is not None and furthest_end >= end
+
+
+def validate_batch(customer, items):
+    """
+    Validate many bookings at once against availability, existing appointments and each other.
+    `items` is a list of dicts with `service` and `start_datetime`. Returns (accepted, errors):
+    accepted holds (index, service, start, end) tuples, errors maps item index -> message.
+
+    Availability (rows and rules), provider buffers and nearby appointments are read once for
+    all providers involved; every check after that is a sort-and-sweep over the batch.
+    """
+    errors = {}
+    now = timezone.now()
+    candidates = []
+    for index, item in enumerate(items):
+        service, start = item['service'], item['start_datetime']
+        if start < now:
+            errors[index] = "Cannot book an appointment in the past."
+        elif service.provider_id == customer.id:
+            errors[index] = "Provider and customer cannot be the same user."
+        else:
+            candidates.append((start, start + timedelta(minutes=service.duration), index, service))
+    if not candidates:
+        return [], errors
+
+    candidates.sort(key=lambda c: (c[0], c[2]))
+    provider_ids = {c[3].provider_id for c in candidates}
+    range_start, range_end = candidates[0][0], max(c[1] for c in candidates)
+
+    windows = expand_availability(provider_ids, range_start.date(), range_end.date())
+
+    buffers = dict(Service.objects
+                   .filter(provider__in=provider_ids)
+                   .values('provider')
+                   .annotate(m=Max('buffer_time'))
+                   .values_list('provider', 'm'))
+    max_buffer = max([b or 0 for b in buffers.values()] + [c[3].buffer_time for c in candidates])
+
+    busy = defaultdict(list)
+    appointments = (Appointment.objects
+                    .filter(provider__in=provider_ids,
+                            start_datetime__lt=range_end + timedelta(minutes=max_buffer),
+                            end_datetime__gt=range_start - timedelta(minutes=max_buffer))
+                    .exclude(status='cancelled')
+                    .values_list('provider', 'start_datetime', 'end_datetime', 'service__buffer_time'))
+    for provider_id, *row in appointments:
+        busy[provider_id].append(row)
+
+    by_provider = defaultdict(list)
+    for candidate in candidates:
+        by_provider[candidate[3].provider_id].append(candidate)
+
+    accepted = []
+    for provider_id, provider_candidates in by_provider.items():
+        open_windows, blocked = availability_windows(windows[provider_id])
+        inside = contained_in_windows([(c[0], c[1]) for c in provider_candidates], open_windows)
+
+        # forbidden start intervals depend on the service's duration and buffer; blocked slots
+        # and appointments are kept apart so each is reported as the single booking reports it
+        blocked_starts, busy_starts = {}, {}
+        pointers = defaultdict(int)
+        # running maxima over accepted candidates: end + own buffer, and plain end
+        max_end_with_buffer = max_end = None
+        for (start, end, index, service), ok in zip(provider_candidates, inside):
+            if service.id not in busy_starts:
+                blocked_starts[service.id] = forbidden_starts(service.duration, 0, [], blocked)
+                busy_starts[service.id] = forbidden_starts(service.duration, service.buffer_time,
+                                                           busy[provider_id], [])
+            if not ok or starts_in(blocked_starts[service.id], pointers, ('blocked', service.id), start):
+                errors[index] = "Selected time not within provider availability (or provider has blocked the slot)."
+                continue
+            if starts_in(busy_starts[service.id], pointers, ('busy', service.id), start):
+                errors[index] = "This time collides with another appointment for the provider (respecting buffer times)."
+                continue
+
+            # against earlier accepted items of the batch: b collides with earlier a when
+            # b.start < a.end + max(a.buffer, b.buffer)
+            buffer = timedelta(minutes=service.buffer_time or 0)
+            if max_end is not None and (start < max_end_with_buffer or start < max_end + buffer):
+                errors[index] = "This time collides with another appointment in the same batch."
+                continue
+
+            accepted.append((index, service, start, end))
+            if max_end is None or end + buffer > max_end_with_buffer:
+                max_end_with_buffer = end + buffer
+            if max_end is None or end > max_end:
+                max_end = end
+
+    accepted.sort(key=lambda a: a[0])
+    return accepted, errors
@@ -1,9 +1,11 @@
 from rest_framework import serializers
 from django.utils import timezone
-from django.db import transaction
+from django.db import transaction, IntegrityError
 from datetime import timedelta
 from django.conf import settings
-from .models import Appointment, Availability
+from .models import Appointment, Availability, AvailabilityRule
+from .scheduling import has_conflict, validate_batch, expand_availability, within_availability, lock_providers
+from .signals import appointments_bulk_created
 from services.models import Service
 from django.contrib.auth import get_user_model
 
@@ -20,7 +22,31 @@ class AvailabilitySerializer(serializers.ModelSerializer):
         return super().create(validated_data)
 
 
+class AvailabilityRuleSerializer(serializers.ModelSerializer):
+    class Meta:
+        model = AvailabilityRule
+        fields = ['id', 'provider', 'weekday', 'start_time', 'end_time', 'valid_from', 'valid_until']
+        read_only_fields = ['provider']
+
+    def validate(self, data):
+        start_time = data.get('start_time') or (self.instance.start_time if self.instance else None)
+        end_time = data.get('end_time') or (self.instance.end_time if self.instance else None)
+        if start_time and end_time and start_time >= end_time:
+            raise serializers.ValidationError("start_time must be before end_time")
+        valid_from = data.get('valid_from') or (self.instance.valid_from if self.instance else None)
+        valid_until = data.get('valid_until', self.instance.valid_until if self.instance else None)
+        if valid_from and valid_until and valid_until < valid_from:
+            raise serializers.ValidationError("valid_until must not be before valid_from")
+        return data
+
+    def create(self, validated_data):
+        validated_data['provider'] = self.context['request'].user
+        return super().create(validated_data)
+
+
 class AppointmentSerializer(serializers.ModelSerializer):
+    # provider is read in validate() and by Service.__str__ (browsable API choices)
+    service = serializers.PrimaryKeyRelatedField(queryset=Service.objects.select_related('provider'))
     service_detail = serializers.CharField(source='service.name', read_only=True)
     customer_name = serializers.CharField(source='customer.username', read_only=True)
     provider_name = serializers.CharField(source='provider.username', read_only=True)
@@ -70,42 +96,21 @@ class AppointmentSerializer(serializers.ModelSerializer):
         if candidate_start < timezone.now():
             raise serializers.ValidationError("Cannot book an appointment in the past.")
 
-        # Check provider availability: there must be at least one Availability with is_available=True
-        availabilities = Availability.objects.filter(provider=provider, date=candidate_start.date(), is_available=True)
-        in_avail = False
-        for a in availabilities:
-            # convert times to datetimes for comparison
-            start_time_dt = timezone.make_aware(timezone.datetime.combine(a.date, a.start_time))
-            end_time_dt = timezone.make_aware(timezone.datetime.combine(a.date, a.end_time))
-            if candidate_start >= start_time_dt and candidate_end <= end_time_dt:
-                in_avail = True
-                break
-        if not in_avail:
+        # Check provider availability: the slot must fit inside one open window (concrete
+        # Availability row or expanded weekly rule) and must not touch a blocked slot
+        day = candidate_start.date()
+        rows = expand_availability([provider.id], day, day)[provider.id]
+        if not within_availability(rows, candidate_start, candidate_end):
             # if provider has no explicit availability entries for that date consider denial:
             # to be strict, we deny if no matching availability slot found
             raise serializers.ValidationError("Selected time not within provider availability (or provider has blocked the slot).")
 
         # Overlap check against other appointments for provider (exclude self when updating)
-        # consider buffer: use max buffer between existing service and current service
-        qs = Appointment.objects.filter(provider=provider).exclude(status='cancelled')
-        if self.instance:
-            qs = qs.exclude(pk=self.instance.pk)
-
-        for other in qs:
-            other_start = other.start_datetime
-            other_end = other.end_datetime
-            # compute buffer in minutes: take the buffer of either service (conservative)
-            other_buffer = getattr(other.service, 'buffer_time', 0) or 0
-            this_buffer = getattr(service, 'buffer_time', 0) or 0
-            buffer_minutes = max(other_buffer, this_buffer)
-
-            # extended window = other_end + buffer
-            other_end_with_buffer = other_end + timedelta(minutes=buffer_minutes)
-            candidate_end_with_buffer = candidate_end + timedelta(minutes=buffer_minutes)
-
-            # overlapping if candidate_start < other_end_with_buffer and candidate_end_with_buffer > other_start
-            if (candidate_start < other_end_with_buffer) and (candidate_end_with_buffer > other_start):
-                raise serializers.ValidationError("This time collides with another appointment for the provider (respecting buffer times).")
+        # consider buffer: use max buffer between existing service and current service.
+        # Only appointments within the max-buffer-widened window are fetched.
+        exclude_pk = self.instance.pk if self.instance else None
+        if has_conflict(provider, service, candidate_start, candidate_end, exclude_pk=exclude_pk):
+            raise serializers.ValidationError("This time collides with another appointment for the provider (respecting buffer times).")
 
         # if all validations pass, store computed times back into data
         data['end_datetime'] = candidate_end
@@ -114,14 +119,90 @@ class AppointmentSerializer(serializers.ModelSerializer):
 
         return data
 
+    def check_conflict_locked(self, validated_data):
+        """
+        Repeat the overlap check while holding the provider's booking lock, so two
+        concurrent requests cannot both pass validate() for the same slot.
+        """
+        provider = validated_data['provider']
+        lock_providers([provider.id])
+        exclude_pk = self.instance.pk if self.instance else None
+        if has_conflict(provider, validated_data['service'], validated_data['start_datetime'],
+                        validated_data['end_datetime'], exclude_pk=exclude_pk):
+            raise serializers.ValidationError("This time collides with another appointment for the provider (respecting buffer times).")
+
     @transaction.atomic
     def create(self, validated_data):
+        self.check_conflict_locked(validated_data)
         validated_data['status'] = 'pending'  # default new booking status
-        appointment = super().create(validated_data)
+        try:
+            appointment = super().create(validated_data)
+        except IntegrityError:
+            # database overlap guard (see migration 0005)
+            raise serializers.ValidationError("This time collides with another appointment for the provider.")
         # (Optional) send notifications / emails here
         return appointment
 
     @transaction.atomic
     def update(self, instance, validated_data):
         # only certain fields allowed to update depending on user/role; view should check permissions
-        return super().update(instance, validated_data)
+        if 'start_datetime' in validated_data:
+            validated_data.setdefault('service', instance.service)
+            self.check_conflict_locked(validated_data)
+        service = validated_data.get('service')
+        if service is not None and service.pk != instance.service_id:
+            # moved to another service: charged at that service's price
+            validated_data['price'] = service.price
+        try:
+            return super().update(instance, validated_data)
+        except IntegrityError:
+            raise serializers.ValidationError("This time collides with another appointment for the provider.")
+
+
+class BulkAppointmentItemSerializer(serializers.Serializer):
+    # the provider is loaded with the service: it is set on the new appointments and serialized back
+    service = serializers.PrimaryKeyRelatedField(queryset=Service.objects.select_related('provider'))
+    start_datetime = serializers.DateTimeField()
+    notes = serializers.CharField(required=False, allow_blank=True, default='')
+
+
+class BulkAppointmentSerializer(serializers.Serializer):
+    """
+    Book many appointments at once for the requesting customer.
+    With atomic=True (default) either every item is booked or none is;
+    with atomic=False valid items are booked and the rest are reported per index.
+    """
+    MAX_ITEMS = 100
+
+    items = BulkAppointmentItemSerializer(many=True, allow_empty=False)
+    atomic = serializers.BooleanField(default=True)
+
+    def validate_items(self, items):
+        if len(items) > self.MAX_ITEMS:
+            raise serializers.ValidationError(f"At most {self.MAX_ITEMS} appointments per request.")
+        return items
+
+    @transaction.atomic
+    def create(self, validated_data):
+        customer = self.context['request'].user
+        items = validated_data['items']
+        # validate under the providers' booking locks so concurrent bookings cannot interleave
+        lock_providers([item['service'].provider_id for item in items])
+        accepted, self.item_errors = validate_batch(customer, items)
+        if self.item_errors and validated_data['atomic']:
+            raise serializers.ValidationError({'errors': self.item_errors})
+        appointments = [
+            Appointment(service=service, provider=service.provider, customer=customer,
+                        start_datetime=start, end_datetime=end, status='pending',
+                        notes=items[index]['notes'], price=service.price)
+            for index, service, start, end in accepted
+        ]
+        # bulk_create skips Appointment.save / post_save; notify once for the whole batch
+        try:
+            created = Appointment.objects.bulk_create(appointments)
+        except IntegrityError:
+            # database overlap guard (see migration 0005)
+            raise serializers.ValidationError("One of the appointments collides with another appointment for the provider.")
+        if created:
+            appointments_bulk_created.send(sender=Appointment, instances=created)
+        return created
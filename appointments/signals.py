@@ -1,7 +1,25 @@
-from django.db.models.signals import post_save, pre_delete
-from django.dispatch import receiver
-from appointments.models import Appointment
-from notifications.tasks import send_booking_notification
+from django.contrib.auth import get_user_model
+from django.db.models.signals import pre_save, post_save, pre_delete, post_delete
+from django.dispatch import receiver, Signal
+from appointments import realtime
+from appointments.models import Appointment, Availability, AvailabilityRule
+from appointmentsys.conditional import invalidate_validators
+from notifications.outbox import record_event, record_events
+from notifications.tasks import booking_details
+from services.models import Service
+
+# sent once per batch by bulk booking (bulk_create does not fire post_save)
+appointments_bulk_created = Signal()
+
+@receiver(pre_save, sender=Appointment)
+def remember_slot(sender, instance, **kwargs):
+   # the stored time/status, to push what a save freed and took (only read if anyone listens)
+   instance._slot_previous = None
+   if instance.pk and realtime.realtime_enabled():
+     instance._slot_previous = (Appointment.objects
+                                .filter(pk=instance.pk)
+                                .values_list('provider_id', 'start_datetime', 'end_datetime', 'status')
+                                .first())
 
 @receiver(post_save, sender=Appointment)
 def appointment_saved(sender, instance, created, **kwargs):
@@ -11,8 +29,66 @@ def appointment_saved(sender, instance, created, **kwargs):
      event = 'cancelled'
    else:
      event = 'updated'
-   send_booking_notification.delay(instance.id, event)
+   # queued in the save's transaction; notifications.outbox dispatches it after commit
+   record_event(instance.id, event)
+   realtime.publish(realtime.appointment_deltas(
+     getattr(instance, '_slot_previous', None), realtime.appointment_state(instance), instance.service_id))
 
 @receiver(pre_delete, sender=Appointment)
 def appointment_deleted(sender, instance, **kwargs):
-   send_booking_notification.delay(instance.id, 'deleted')
+   # the appointment is gone when this is dispatched: keep what the mail says
+   record_event(instance.id, 'deleted', details=booking_details(instance))
+   realtime.publish(realtime.appointment_deltas(realtime.appointment_state(instance), None, instance.service_id))
+
+@receiver(appointments_bulk_created, sender=Appointment)
+def appointments_bulk_saved(sender, instances, **kwargs):
+   # dispatched together as one digest per customer/provider
+   record_events([a.id for a in instances], 'booked', digest=True)
+   realtime.publish([delta for a in instances
+                     for delta in realtime.appointment_deltas(None, realtime.appointment_state(a), a.service_id)])
+
+@receiver(post_save, sender=Appointment)
+@receiver(post_delete, sender=Appointment)
+@receiver(appointments_bulk_created, sender=Appointment)
+def appointments_changed(sender, **kwargs):
+   invalidate_validators(['appointments'])
+
+@receiver(post_save, sender=Availability)
+@receiver(post_delete, sender=Availability)
+def availability_changed(sender, **kwargs):
+   invalidate_validators(['availability'])
+
+@receiver(pre_save, sender=Availability)
+def remember_window(sender, instance, **kwargs):
+   instance._window_previous = None
+   if instance.pk and realtime.realtime_enabled():
+     instance._window_previous = (Availability.objects
+                                  .filter(pk=instance.pk)
+                                  .values_list('provider_id', 'date', 'start_time', 'end_time', 'is_available')
+                                  .first())
+
+@receiver(post_save, sender=Availability)
+def availability_saved(sender, instance, **kwargs):
+   realtime.publish(realtime.availability_deltas(
+     getattr(instance, '_window_previous', None), realtime.availability_state(instance)))
+
+@receiver(post_delete, sender=Availability)
+def availability_deleted(sender, instance, **kwargs):
+   realtime.publish(realtime.availability_deltas(realtime.availability_state(instance), None))
+
+@receiver(post_save, sender=AvailabilityRule)
+@receiver(post_delete, sender=AvailabilityRule)
+def availability_rule_changed(sender, instance, **kwargs):
+   realtime.publish(realtime.rules_deltas(instance.provider_id))
+
+@receiver(post_save, sender=Service)
+def service_renamed(sender, created, **kwargs):
+   # appointment payloads show the service name
+   if not created:
+     invalidate_validators(['appointments'], related=True)
+
+@receiver(post_save, sender=get_user_model())
+def user_renamed(sender, created, update_fields=None, **kwargs):
+   # ... and customer/provider usernames; most user saves (last_login) leave those alone
+   if not created and (update_fields is None or 'username' in update_fields):
+     invalidate_validators(['appointments'], related=True)
@@ -1,3 +1,560 @@
-from django.test import TestCase
+import base64
+import json
+import os
+import re
+import tempfile
+from datetime import datetime, time, timedelta
+from io import StringIO
+from unittest import mock, skipUnless
+from asgiref.sync import sync_to_async
+from django.core.management import call_command
+from django.core import mail
+from django.db import IntegrityError, connection, transaction
+from django.db.models import F
+from django.test import TestCase, TransactionTestCase, override_settings
+from django.utils import timezone
+from django.contrib.auth import get_user_model
+from rest_framework.test import APITestCase
+from appointments import realtime
+from appointments.models import Appointment, Availability, AvailabilityRule, NotificationOutbox
+from appointments.pagination import KeysetPagination
+from appointments.scheduling import expand_availability, nearby_appointments, validate_batch, within_availability
+from appointmentsys.testing import QueryBudgetTestCase
+from dashboard.views import booking_export_queryset, booking_trend_queryset, top_services_queryset
+from notifications.outbox import coalesce, dispatch_outbox, drain_outbox
+from notifications import tasks as notification_tasks
+from notifications.tasks import due_reminder_chunks, reminder_queryset, send_reminders
+from services.models import Category, Service
 
-# Create your tests here.
+User = get_user_model()
+
+
+class HotQueryPlanTests(TestCase):
+    """
+    EXPLAIN each hot Appointment/Availability query and fail if it falls back to a full table scan.
+    """
+
+    @classmethod
+    def setUpTestData(cls):
+        cls.provider = User.objects.create_user(username='plan_provider', password='x', role='provider')
+        cls.customer = User.objects.create_user(username='plan_customer', password='x', role='customer')
+        cls.admin = User.objects.create_user(username='plan_admin', password='x', role='admin')
+        cls.now = timezone.now()
+
+    def assertUsesIndex(self, qs, index=None):
+        vendor = connection.vendor
+        table = qs.model._meta.db_table
+        if vendor == 'postgresql':
+            # tiny test tables are always cheaper to seq scan; make the planner show its index choice
+            with connection.cursor() as cursor:
+                cursor.execute('SET LOCAL enable_seqscan = off')
+            plan = qs.explain()
+            full_scan = re.search(rf'Seq Scan on {table}\b', plan)
+        elif vendor == 'sqlite':
+            plan = qs.explain()
+            # "SCAN <table>" (with or without a covering index) reads every row
+            full_scan = re.search(rf'\bSCAN {table}\b', plan)
+        else:
+            self.skipTest(f'no plan check for {vendor}')
+        self.assertIsNone(full_scan, f'full scan of {table}:\n{plan}')
+        if index:
+            self.assertIn(index, plan)
+
+    def test_overlap_check(self):
+        # the partial index without cancelled appointments
+        self.assertUsesIndex(nearby_appointments(self.provider.id, self.now, self.now + timedelta(hours=1), 15),
+                             index='appt_provider_active_start_idx')
+
+    def test_availability_window(self):
+        day = self.now.date()
+        self.assertUsesIndex(Availability.objects.filter(
+            provider__in=[self.provider.id], date__gte=day, date__lte=day + timedelta(days=7)))
+
+    def test_availability_rules(self):
+        day = self.now.date()
+        self.assertUsesIndex(AvailabilityRule.objects.filter(
+            provider__in=[self.provider.id], valid_from__lte=day).exclude(valid_until__lt=day))
+
+    def test_provider_dashboard(self):
+        qs = Appointment.objects.filter(provider=self.provider)
+        self.assertUsesIndex(qs.filter(start_datetime__gte=self.now, status__in=['pending', 'confirmed']))
+        self.assertUsesIndex(qs.filter(status='completed'))
+        self.assertUsesIndex(qs.filter(start_datetime__gte=self.now, start_datetime__lte=self.now + timedelta(days=7)))
+
+    def test_customer_dashboard(self):
+        qs = Appointment.objects.filter(customer=self.customer)
+        self.assertUsesIndex(qs.filter(start_datetime__gte=self.now, status__in=['pending', 'confirmed']))
+        self.assertUsesIndex(qs.filter(start_datetime__lt=self.now))
+
+    def test_admin_dashboard(self):
+        # the DailyBookingStats rollup, ranged on the leading day of its unique index
+        today = self.now.date()
+        self.assertUsesIndex(top_services_queryset(today))
+        self.assertUsesIndex(booking_trend_queryset(today))
+
+    def test_appointment_list_pages(self):
+        # keyset pagination: the page after a cursor is a range seek, for every role
+        paginator = KeysetPagination()
+        ordering = ['-start_datetime', '-id']
+        after = paginator.after(ordering, [self.now.isoformat(), 100])
+        for qs in (Appointment.objects.filter(provider=self.provider),
+                   Appointment.objects.filter(customer=self.customer),
+                   Appointment.objects.all()):
+            self.assertUsesIndex(qs.filter(after).order_by(*ordering)[:51])
+
+    def test_availability_list_pages(self):
+        paginator = KeysetPagination()
+        ordering = ['date', 'start_time', 'id']
+        after = paginator.after(ordering, [self.now.date().isoformat(), '09:00:00', 100])
+        self.assertUsesIndex(Availability.objects.filter(provider=self.provider).filter(after).order_by(*ordering)[:51])
+
+    def test_export(self):
+        since = self.now - timedelta(days=30)
+        for user in (self.admin, self.provider, self.customer):
+            self.assertUsesIndex(booking_export_queryset(user, since, self.now))
+
+    def test_daily_reminder(self):
+        self.assertUsesIndex(reminder_queryset(self.now.date()))
+
+
+class AppointmentEndpointQueryBudgetTests(QueryBudgetTestCase):
+    """
+    List and detail endpoints run a fixed number of queries, whatever the page size
+    (authentication is forced, so no user lookup is counted): the conditional GET
+    validator aggregate and the page itself.
+    """
+
+    @classmethod
+    def setUpTestData(cls):
+        cls.provider = User.objects.create(username='budget_provider', role='provider')
+        cls.customer = User.objects.create(username='budget_customer', role='customer')
+        cls.admin = User.objects.create(username='budget_admin', role='admin')
+        category = Category.objects.create(name='Budget')
+        service = Service.objects.create(provider=cls.provider, category=category, name='Cut', price=20, duration=30)
+        start = timezone.now() + timedelta(days=1)
+        Appointment.objects.bulk_create([
+            Appointment(service=service, provider=cls.provider, customer=cls.customer,
+                        start_datetime=start + timedelta(hours=i), end_datetime=start + timedelta(hours=i, minutes=30))
+            for i in range(60)
+        ])
+        Availability.objects.bulk_create([
+            Availability(provider=cls.provider, date=start.date() + timedelta(days=i), start_time='09:00', end_time='17:00')
+            for i in range(60)
+        ])
+        cls.appointment = Appointment.objects.first()
+
+    def test_appointment_list(self):
+        for user in (self.customer, self.provider, self.admin):
+            self.assertQueryBudget(user, '/api/appointments/', 2)
+        self.assertQueryBudget(self.admin, '/api/appointments/?status=pending', 2)
+
+    def test_appointment_detail(self):
+        for user in (self.customer, self.provider, self.admin):
+            self.assertQueryBudget(user, f'/api/appointments/{self.appointment.id}/', 2)
+
+    def test_tampered_cursor_is_not_found(self):
+        self.client.force_authenticate(user=self.admin)
+        for key in ([{}, 1], [[1], 2], ['not a date', 1], [1]):
+            cursor = base64.urlsafe_b64encode(json.dumps({'key': key}).encode()).decode('ascii')
+            response = self.client.get('/api/appointments/', {'cursor': cursor})
+            self.assertEqual(response.status_code, 404, key)
+
+    def test_availability_list(self):
+        for user in (self.provider, self.admin):
+            self.assertQueryBudget(user, '/api/availability/', 2)
+
+
+class SlotDeltaTests(TestCase):
+    """What an appointment/availability change tells calendar subscribers (appointments.realtime)."""
+
+    def setUp(self):
+        self.start = timezone.now().replace(microsecond=0) + timedelta(days=1)
+        self.end = self.start + timedelta(minutes=30)
+
+    def events(self, deltas):
+        return [(provider, delta['event']) for provider, delta in deltas]
+
+    def test_booking_cancel_and_reschedule(self):
+        booked = (1, self.start, self.end, 'pending')
+        self.assertEqual(self.events(realtime.appointment_deltas(None, booked, 7)), [(1, 'slot_taken')])
+        # confirming keeps the slot taken
+        self.assertEqual(realtime.appointment_deltas(booked, booked[:3] + ('confirmed',), 7), [])
+        cancelled = booked[:3] + ('cancelled',)
+        self.assertEqual(self.events(realtime.appointment_deltas(booked, cancelled, 7)), [(1, 'slot_freed')])
+        self.assertEqual(realtime.appointment_deltas(cancelled, None, 7), [])
+        moved = (1, self.end, self.end + timedelta(minutes=30), 'pending')
+        deltas = realtime.appointment_deltas(booked, moved, 7)
+        self.assertEqual(self.events(deltas), [(1, 'slot_freed'), (1, 'slot_taken')])
+        self.assertEqual(deltas[0][1]['start'], self.start.isoformat())
+        self.assertEqual(deltas[1][1]['start'], self.end.isoformat())
+
+    def test_availability_changes(self):
+        day = self.start.date()
+        blocked = (1, day, self.start.time(), self.end.time(), False)
+        self.assertEqual(self.events(realtime.availability_deltas(None, blocked)), [(1, 'slot_taken')])
+        self.assertEqual(self.events(realtime.availability_deltas(blocked, None)), [(1, 'slot_freed')])
+        opened = blocked[:4] + (True,)
+        self.assertEqual(self.events(realtime.availability_deltas(blocked, opened)), [(1, 'slot_freed'), (1, 'day_changed')])
+        widened = (1, day, self.start.time(), (self.end + timedelta(hours=1)).time(), True)
+        self.assertEqual(realtime.availability_deltas(opened, widened),
+                         [(1, {'event': 'day_changed', 'date': day.isoformat(), 'source': 'availability'})])
+
+
+class AvailabilityRuleTests(APITestCase):
+    """Weekly rules expand over a date range; concrete Availability rows override them per date."""
+
+    def setUp(self):
+        self.provider = User.objects.create(username='rule_provider', role='provider')
+        self.customer = User.objects.create(username='rule_customer', role='customer')
+        self.service = Service.objects.create(provider=self.provider, name='Cut', price=20, duration=30)
+        today = timezone.localdate()
+        self.monday = today + timedelta(days=7 - today.weekday())
+        self.client.force_authenticate(self.provider)
+        for rule in ({'weekday': 0, 'start_time': '09:00', 'end_time': '12:00'},
+                     # the second Wednesday is past valid_until
+                     {'weekday': 2, 'start_time': '14:00', 'end_time': '17:00',
+                      'valid_until': (self.monday + timedelta(days=7)).isoformat()}):
+            response = self.client.post('/api/availability-rules/', rule, format='json')
+            self.assertEqual(response.status_code, 201, response.content)
+
+    def rows(self, first, last):
+        return sorted(expand_availability([self.provider.id], first, last)[self.provider.id])
+
+    def at(self, day, hour, minute=0):
+        return timezone.make_aware(datetime.combine(day, time(hour, minute)))
+
+    def test_rules_expand_over_a_range(self):
+        monday, wednesday = self.monday, self.monday + timedelta(days=2)
+        self.assertEqual(self.rows(monday, monday + timedelta(days=13)), [
+            (monday, time(9), time(12), True),
+            (wednesday, time(14), time(17), True),
+            (monday + timedelta(days=7), time(9), time(12), True),
+        ])
+
+    def test_blocked_day(self):
+        day = self.monday + timedelta(days=7)
+        Availability.objects.create(provider=self.provider, date=day, start_time=time(0), end_time=time(23, 59),
+                                    is_available=False)
+        rows = self.rows(day, day)
+        self.assertIn((day, time(9), time(12), True), rows)
+        self.assertFalse(within_availability(rows, self.at(day, 10), self.at(day, 10, 30)))
+
+    def test_open_override_replaces_the_rule(self):
+        Availability.objects.create(provider=self.provider, date=self.monday, start_time=time(13), end_time=time(15))
+        self.assertEqual(self.rows(self.monday, self.monday), [(self.monday, time(13), time(15), True)])
+        rows = self.rows(self.monday, self.monday)
+        self.assertTrue(within_availability(rows, self.at(self.monday, 13), self.at(self.monday, 13, 30)))
+        self.assertFalse(within_availability(rows, self.at(self.monday, 9), self.at(self.monday, 9, 30)))
+
+    def test_booking_follows_the_rules(self):
+        self.client.force_authenticate(self.customer)
+
+        def book(start):
+            return self.client.post('/api/appointments/', {
+                'service': self.service.id, 'start_datetime': start.isoformat(),
+                'end_datetime': (start + timedelta(minutes=30)).isoformat()}, format='json')
+
+        self.assertEqual(book(self.at(self.monday, 11, 30)).status_code, 201)
+        # runs past the end of the window
+        response = book(self.at(self.monday, 11, 45))
+        self.assertEqual(response.status_code, 400)
+        self.assertIn("not within provider availability", str(response.data))
+        # the second Wednesday's rule has expired
+        self.assertEqual(book(self.at(self.monday + timedelta(days=9), 15)).status_code, 400)
+        self.assertEqual(book(self.at(self.monday + timedelta(days=2), 15)).status_code, 201)
+
+
+class OverlapGuardTests(APITestCase):
+    """The database refuses overlapping bookings of a provider that bypass the serializers (migration 0005)."""
+
+    def setUp(self):
+        self.provider = User.objects.create(username='guard_provider', role='provider')
+        self.customer = User.objects.create(username='guard_customer', role='customer')
+        self.service = Service.objects.create(provider=self.provider, name='Cut', price=20, duration=30)
+        self.day = timezone.localdate() + timedelta(days=2)
+        AvailabilityRule.objects.create(provider=self.provider, weekday=self.day.weekday(),
+                                        start_time=time(9), end_time=time(17))
+        self.start = timezone.make_aware(datetime.combine(self.day, time(10)))
+        self.booked = self.create(self.start)
+
+    def create(self, start, **fields):
+        return Appointment.objects.create(service=self.service, provider=self.provider, customer=self.customer,
+                                          start_datetime=start, end_datetime=start + timedelta(minutes=30), **fields)
+
+    def test_overlapping_insert_and_update_fail(self):
+        with self.assertRaises(IntegrityError), transaction.atomic():
+            self.create(self.start + timedelta(minutes=15))
+        later = self.create(self.start + timedelta(hours=1))
+        later.start_datetime, later.end_datetime = self.start, self.start + timedelta(minutes=30)
+        with self.assertRaises(IntegrityError), transaction.atomic():
+            later.save()
+        # cancelled appointments don't hold their time
+        self.create(self.start, status='cancelled')
+
+    def test_serializer_turns_the_guard_into_a_400(self):
+        self.client.force_authenticate(self.customer)
+        # as if a concurrent booking got past the application's overlap checks
+        with mock.patch('appointments.serializers.has_conflict', return_value=False):
+            response = self.client.post('/api/appointments/', {
+                'service': self.service.id, 'start_datetime': self.start.isoformat(),
+                'end_datetime': (self.start + timedelta(minutes=30)).isoformat()}, format='json')
+        self.assertEqual(response.status_code, 400)
+        self.assertIn("collides with another appointment", str(response.data))
+        self.assertEqual(Appointment.objects.filter(provider=self.provider).count(), 1)
+
+
+class BatchValidationTests(TestCase):
+    """validate_batch reports each rejected item the way a single booking would."""
+
+    def test_blocked_slot_and_collision(self):
+        provider = User.objects.create(username='batch_provider', role='provider')
+        customer = User.objects.create(username='batch_customer', role='customer')
+        service = Service.objects.create(provider=provider, name='Cut', price=20, duration=30)
+        day = timezone.localdate() + timedelta(days=1)
+        AvailabilityRule.objects.create(provider=provider, weekday=day.weekday(), start_time=time(9), end_time=time(17))
+        Availability.objects.create(provider=provider, date=day, start_time=time(12), end_time=time(13),
+                                    is_available=False)
+
+        def at(hour, minute=0):
+            return timezone.make_aware(datetime.combine(day, time(hour, minute)))
+
+        Appointment.objects.create(service=service, provider=provider, customer=customer,
+                                   start_datetime=at(14), end_datetime=at(14, 30))
+
+        items = [{'service': service, 'start_datetime': start} for start in (at(10), at(12, 15), at(11, 45), at(14))]
+        accepted, errors = validate_batch(customer, items)
+        self.assertEqual([a[0] for a in accepted], [0])
+        unavailable = "Selected time not within provider availability (or provider has blocked the slot)."
+        self.assertEqual(errors, {
+            1: unavailable,
+            2: unavailable,
+            3: "This time collides with another appointment for the provider (respecting buffer times).",
+        })
+
+
+class BulkBookingTests(APITestCase):
+    """POST /api/appointments/bulk/ books a batch with a fixed number of queries per item."""
+
+    @classmethod
+    def setUpTestData(cls):
+        cls.customer = User.objects.create(username='bulk_customer', role='customer')
+        cls.day = timezone.localdate() + timedelta(days=1)
+        cls.services = []
+        for name in ('bulk_provider_a', 'bulk_provider_b'):
+            provider = User.objects.create(username=name, role='provider')
+            AvailabilityRule.objects.create(provider=provider, weekday=cls.day.weekday(),
+                                            start_time=time(9), end_time=time(17))
+            cls.services.append(Service.objects.create(provider=provider, name='Cut', price=20, duration=30))
+
+    def test_bulk_create_queries(self):
+        items = [{'service': self.services[i % 2].id,
+                  'start_datetime': timezone.make_aware(datetime.combine(self.day, time(10 + i))).isoformat()}
+                 for i in range(4)]
+        self.client.force_authenticate(self.customer)
+        # a lookup per item for its service (and provider); then locks, validation, the insert,
+        # the outbox and the rollup buckets; serializing the response needs no further queries
+        with self.assertNumQueries(24):
+            response = self.client.post('/api/appointments/bulk/', {'items': items}, format='json')
+        self.assertEqual(response.status_code, 201, response.data)
+        self.assertEqual([a['provider_name'] for a in response.data['created']],
+                         ['bulk_provider_a', 'bulk_provider_b'] * 2)
+
+
+@skipUnless(realtime.CHANNELS_INSTALLED, 'Django Channels is not installed')
+@override_settings(CHANNEL_LAYERS={'default': {'BACKEND': 'channels.layers.InMemoryChannelLayer'}})
+class CalendarConsumerTests(TransactionTestCase):
+    """Deltas reach WebSocket subscribers after commit, through the in-memory channel layer."""
+
+    def setUp(self):
+        self.provider = User.objects.create(username='ws_provider', role='provider')
+        self.customer = User.objects.create(username='ws_customer', role='customer')
+        category = Category.objects.create(name='Realtime')
+        self.service = Service.objects.create(provider=self.provider, category=category, name='Cut', price=20,
+                                              duration=30)
+        self.start = timezone.now().replace(microsecond=0) + timedelta(days=1)
+
+    def book(self):
+        return Appointment.objects.create(service=self.service, provider=self.provider, customer=self.customer,
+                                          start_datetime=self.start, end_datetime=self.start + timedelta(minutes=30))
+
+    def cancel(self, appointment):
+        appointment.status = 'cancelled'
+        appointment.save()
+
+    async def test_service_subscriber_gets_taken_and_freed(self):
+        from channels.routing import URLRouter
+        from channels.testing import WebsocketCommunicator
+        from appointments.routing import websocket_urlpatterns
+
+        communicator = WebsocketCommunicator(URLRouter(websocket_urlpatterns),
+                                             f'/ws/calendar/service/{self.service.id}/')
+        connected, _ = await communicator.connect()
+        self.assertTrue(connected)
+
+        appointment = await sync_to_async(self.book)()
+        message = await communicator.receive_json_from(timeout=2)
+        self.assertEqual(message['provider'], self.provider.id)
+        self.assertEqual([d['event'] for d in message['deltas']], ['slot_taken'])
+        self.assertEqual(message['deltas'][0]['start'], self.start.isoformat())
+
+        await sync_to_async(self.cancel)(appointment)
+        message = await communicator.receive_json_from(timeout=2)
+        self.assertEqual([d['event'] for d in message['deltas']], ['slot_freed'])
+        await communicator.disconnect()
+
+    async def test_unknown_service_is_rejected(self):
+        from channels.routing import URLRouter
+        from channels.testing import WebsocketCommunicator
+        from appointments.routing import websocket_urlpatterns
+
+        communicator = WebsocketCommunicator(URLRouter(websocket_urlpatterns), '/ws/calendar/service/0/')
+        connected, _ = await communicator.connect()
+        self.assertFalse(connected)
+
+
+class ReminderTests(TestCase):
+    """daily_reminder's chunks are sent once per start time, over one connection per chunk."""
+
+    def setUp(self):
+        self.tomorrow = timezone.localdate() + timedelta(days=1)
+        self.customer = User.objects.create(username='reminder_customer', role='customer', email='c@example.com')
+        self.appointments = {}
+        for name, count in (('reminder_a', 5), ('reminder_b', 1)):
+            provider = User.objects.create(username=name, role='provider', email=f'{name}@example.com')
+            service = Service.objects.create(provider=provider, name='Cut', price=20, duration=30)
+            self.appointments[name] = [
+                Appointment.objects.create(service=service, provider=provider, customer=self.customer,
+                                           start_datetime=self.at(9 + i), end_datetime=self.at(9 + i, 30))
+                for i in range(count)
+            ]
+
+    def at(self, hour, minute=0):
+        return timezone.make_aware(datetime.combine(self.tomorrow, time(hour, minute)))
+
+    def send_all(self):
+        return sum(send_reminders(ids) for ids in due_reminder_chunks(self.tomorrow))
+
+    def test_reminders_are_chunked(self):
+        a = [appt.id for appt in self.appointments['reminder_a']]
+        b = [appt.id for appt in self.appointments['reminder_b']]
+        with mock.patch.object(notification_tasks, 'REMINDER_CHUNK_SIZE', 2):
+            chunks = due_reminder_chunks(self.tomorrow)
+        # a provider stays in one chunk up to twice the size; only then is it split
+        self.assertEqual(chunks, [a[:4], a[4:] + b])
+        with mock.patch.object(notification_tasks, 'get_connection', wraps=notification_tasks.get_connection) as connect:
+            sent = [send_reminders(ids) for ids in chunks]
+        self.assertEqual(connect.call_count, 2)
+        # a reminder per appointment and a digest per provider in each chunk
+        self.assertEqual(sent, [5, 4])
+        self.assertEqual(len(mail.outbox), 9)
+
+    def test_second_run_sends_nothing(self):
+        self.assertEqual(self.send_all(), 8)
+        self.assertEqual(due_reminder_chunks(self.tomorrow), [])
+        # a retried subtask skips the rows that are already marked, without connecting
+        ids = [appt.id for appt in self.appointments['reminder_a']]
+        with mock.patch.object(notification_tasks, 'get_connection') as connect:
+            self.assertEqual(send_reminders(ids), 0)
+        connect.assert_not_called()
+        self.assertEqual(len(mail.outbox), 8)
+
+    def test_rescheduled_appointment_is_due_again(self):
+        self.send_all()
+        mail.outbox = []
+        appointment = self.appointments['reminder_b'][0]
+        appointment.start_datetime, appointment.end_datetime = self.at(16), self.at(16, 30)
+        appointment.save()
+        self.assertEqual(due_reminder_chunks(self.tomorrow), [[appointment.id]])
+        self.assertEqual(self.send_all(), 2)
+        self.assertEqual(sorted(m.to[0] for m in mail.outbox), ['c@example.com', 'reminder_b@example.com'])
+        self.assertIn('16:00', mail.outbox[0].body + mail.outbox[1].body)
+        self.assertEqual(due_reminder_chunks(self.tomorrow), [])
+
+
+class SyntheticDataTests(TestCase):
+    """generate_data builds consistent data at small scale, and bench_suite runs on it."""
+
+    def test_generate_and_benchmark(self):
+        call_command('generate_data', providers=3, customers=20, appointments=300, days_ahead=14, stdout=StringIO())
+        appointments = Appointment.objects.filter(provider__username__startswith='synthetic_')
+        self.assertEqual(appointments.count(), 300)
+        self.assertTrue(appointments.filter(start_datetime__gt=timezone.now(), status='pending').exists())
+        self.assertTrue(appointments.filter(start_datetime__lt=timezone.now(), status='completed').exists())
+        self.assertFalse(appointments.filter(created_at__gt=timezone.now()).exists())
+        # booked ahead of the start, without touching the model's auto_now_add
+        self.assertFalse(appointments.filter(created_at__gt=F('start_datetime')).exists())
+        self.assertTrue(Appointment._meta.get_field('created_at').auto_now_add)
+        # one booking per provider and hour: nothing to trip the overlap checks
+        self.assertEqual(appointments.values('provider', 'start_datetime').distinct().count(), 300)
+
+        with tempfile.TemporaryDirectory() as directory:
+            output = os.path.join(directory, 'results.json')
+            call_command('bench_suite', repeat=1, output=output, stdout=StringIO())
+            with open(output) as f:
+                results = json.load(f)['results']
+        self.assertIn('daily_reminder', results)
+        self.assertGreater(results['booking']['queries'], 0)
+
+        call_command('generate_data', clear=True, stdout=StringIO())
+        self.assertFalse(User.objects.filter(username__startswith='synthetic_').exists())
+        self.assertFalse(Appointment.objects.exists())
+
+
+class NotificationOutboxTests(TestCase):
+    """Queued booking events are coalesced per appointment and mailed once (notifications.outbox)."""
+
+    @classmethod
+    def setUpTestData(cls):
+        cls.provider = User.objects.create(username='outbox_provider', role='provider', email='provider@example.com')
+        cls.customer = User.objects.create(username='outbox_customer', role='customer', email='customer@example.com')
+        cls.service = Service.objects.create(provider=cls.provider, name='Cut', price=20, duration=30)
+        cls.start = timezone.now().replace(microsecond=0) + timedelta(days=2)
+
+    def book(self, hours=0):
+        start = self.start + timedelta(hours=hours)
+        return Appointment.objects.create(service=self.service, provider=self.provider, customer=self.customer,
+                                          start_datetime=start, end_datetime=start + timedelta(minutes=30))
+
+    def sent(self):
+        return sorted((message.subject, message.to[0]) for message in mail.outbox)
+
+    def test_coalesce(self):
+        self.assertEqual(coalesce(['booked', 'updated', 'updated']), 'booked')
+        self.assertEqual(coalesce(['booked', 'updated', 'cancelled']), 'cancelled')
+        self.assertEqual(coalesce(['updated', 'updated']), 'updated')
+        self.assertEqual(coalesce(['booked', 'updated', 'deleted']), 'deleted')
+
+    def test_burst_of_saves_sends_one_notification(self):
+        appointment = self.book()
+        for notes in ('a', 'b', 'c'):
+            appointment.notes = notes
+            appointment.save()
+        self.assertEqual(NotificationOutbox.objects.count(), 4)
+        self.assertEqual(drain_outbox(direct=True), 4)
+        self.assertEqual(self.sent(), [('Appointment Booked', 'customer@example.com'),
+                                       ('Appointment Booked', 'provider@example.com')])
+        self.assertFalse(NotificationOutbox.objects.exists())
+
+    def test_deleted_booking_is_notified(self):
+        appointment = self.book()
+        self.book(hours=1)
+        appointment.notes = 'moved'
+        appointment.save()
+        appointment.delete()
+        drain_outbox(direct=True)
+        self.assertEqual(self.sent(), [('Appointment Booked', 'customer@example.com'),
+                                       ('Appointment Booked', 'provider@example.com'),
+                                       ('Appointment Deleted', 'customer@example.com'),
+                                       ('Appointment Deleted', 'provider@example.com')])
+        deleted = next(m for m in mail.outbox if m.subject == 'Appointment Deleted' and m.to == ['customer@example.com'])
+        self.assertIn(f"Cut on {self.start:%Y-%m-%d %H:%M} has been deleted", deleted.body)
+
+    def test_rows_are_deleted_only_after_publishing(self):
+        self.book()
+        with mock.patch('notifications.outbox.group', side_effect=OSError('broker down')):
+            with self.assertRaises(OSError):
+                dispatch_outbox()
+        self.assertEqual(NotificationOutbox.objects.count(), 1)
+        self.assertEqual(dispatch_outbox(direct=True), 1)
+        self.assertFalse(NotificationOutbox.objects.exists())
+        self.assertEqual(len(mail.outbox), 2)
@@ -1,8 +1,9 @@
 from rest_framework.routers import DefaultRouter
-from .views import AppointmentViewSet, AvailabilityViewSet
+from .views import AppointmentViewSet, AvailabilityViewSet, AvailabilityRuleViewSet
 
 router = DefaultRouter()
 router.register(r'appointments', AppointmentViewSet, basename='appointments')
 router.register(r'availability', AvailabilityViewSet, basename='availability')
+router.register(r'availability-rules', AvailabilityRuleViewSet, basename='availability-rules')
 
 urlpatterns = router.urls
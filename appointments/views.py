@@ -2,35 +2,67 @@ from rest_framework import viewsets, status
 from rest_framework.decorators import action
 from rest_framework.response import Response
 from rest_framework.permissions import IsAuthenticatedOrReadOnly
+from django_filters.rest_framework import DjangoFilterBackend
 from django.utils import timezone
 from datetime import timedelta
-from .models import Appointment, Availability
-from .serializers import AppointmentSerializer, AvailabilitySerializer
+from .models import Appointment, Availability, AvailabilityRule
+from .serializers import AppointmentSerializer, AvailabilitySerializer, AvailabilityRuleSerializer, BulkAppointmentSerializer
 from .permissions import IsCustomerOrReadOnly
+from .filters import AppointmentFilter, AvailabilityFilter
+from .pagination import KeysetPagination
+from appointmentsys.conditional import ConditionalGetMixin
 
-class AvailabilityViewSet(viewsets.ModelViewSet):
+class AvailabilityViewSet(ConditionalGetMixin, viewsets.ModelViewSet):
+    conditional_scope = 'availability'
     serializer_class = AvailabilitySerializer
     permission_classes = [IsAuthenticatedOrReadOnly]
+    pagination_class = KeysetPagination
+    # matches the (provider, date, start_time, ...) unique index
+    pagination_ordering = ('date', 'start_time', 'id')
+    filter_backends = [DjangoFilterBackend]
+    filterset_class = AvailabilityFilter
 
     def get_queryset(self):
         user = self.request.user
         if user.is_anonymous:
             return Availability.objects.none()  # hide provider availabilities to anonymous
         if user.role == 'provider':
-            return Availability.objects.filter(provider=user)
+            return Availability.objects.filter(provider=user).select_related('provider')
         if user.role == 'admin':
-            return Availability.objects.all()
+            return Availability.objects.select_related('provider')
         # customers can only view provider availability via service listing endpoint (not this)
         return Availability.objects.none()
 
 
-class AppointmentViewSet(viewsets.ModelViewSet):
+class AvailabilityRuleViewSet(viewsets.ModelViewSet):
+    serializer_class = AvailabilityRuleSerializer
+    permission_classes = [IsAuthenticatedOrReadOnly]
+
+    def get_queryset(self):
+        user = self.request.user
+        if user.is_anonymous:
+            return AvailabilityRule.objects.none()
+        if user.role == 'provider':
+            return AvailabilityRule.objects.filter(provider=user)
+        if user.role == 'admin':
+            return AvailabilityRule.objects.all()
+        return AvailabilityRule.objects.none()
+
+
+class AppointmentViewSet(ConditionalGetMixin, viewsets.ModelViewSet):
+    conditional_scope = 'appointments'
     serializer_class = AppointmentSerializer
     permission_classes = [IsCustomerOrReadOnly]
+    pagination_class = KeysetPagination
+    # newest first; served by the (customer|provider, start_datetime) and (start_datetime, status) indexes
+    pagination_ordering = ('-start_datetime', '-id')
+    filter_backends = [DjangoFilterBackend]
+    filterset_class = AppointmentFilter
 
     def get_queryset(self):
         user = self.request.user
-        qs = Appointment.objects.all()
+        # the serializer and __str__ read service/customer/provider: join them instead of a query per row
+        qs = Appointment.objects.select_related('service', 'customer', 'provider')
         if user.is_anonymous:
             return qs.none()
         if user.role == 'customer':
@@ -44,6 +76,20 @@ class AppointmentViewSet(viewsets.ModelViewSet):
         # serializer will assign provider/customer and end_datetime
         serializer.save()
 
+    @action(detail=False, methods=['post'], url_path='bulk')
+    def bulk_create(self, request):
+        """
+        Book a batch of (service, start_datetime) items in one transaction.
+        Body: {"items": [{"service": 1, "start_datetime": "..."}], "atomic": true}
+        """
+        serializer = BulkAppointmentSerializer(data=request.data, context={'request': request})
+        serializer.is_valid(raise_exception=True)
+        created = serializer.save()
+        return Response({
+            'created': AppointmentSerializer(created, many=True, context={'request': request}).data,
+            'errors': serializer.item_errors,
+        }, status=status.HTTP_201_CREATED if created else status.HTTP_400_BAD_REQUEST)
+
     @action(detail=True, methods=['post'], url_path='reschedule')
     def reschedule(self, request, pk=None):
         """
@@ -13,4 +13,18 @@ from django.core.asgi import get_asgi_application
 
 os.environ.setdefault('DJANGO_SETTINGS_MODULE', 'appointmentsys.settings')
 
-application = get_asgi_application()
+django_application = get_asgi_application()
+
+try:
+    from channels.routing import ProtocolTypeRouter, URLRouter
+except ImportError:
+    # Django Channels is optional: without it only HTTP is served
+    application = django_application
+else:
+    from channels.security.websocket import AllowedHostsOriginValidator
+    from appointments.routing import websocket_urlpatterns
+
+    application = ProtocolTypeRouter({
+        'http': django_application,
+        'websocket': AllowedHostsOriginValidator(URLRouter(websocket_urlpatterns)),
+    })
@@ -0,0 +1,21 @@
+from django.conf import settings
+from django.core.cache import caches
+from django.core.cache.backends.dummy import DummyCache
+from django.core.cache.backends.locmem import LocMemCache
+
+# Entries invalidated by version counters (dashboards, conditional GET validators) can
+# only live long when every process reads and bumps the same counters. With a cache
+# that is private to the process (the LocMemCache default when CACHE_URL is unset), a
+# write bumps its own process's counters only, so entries are kept this short instead.
+LOCAL_CACHE_MAX_AGE = getattr(settings, 'LOCAL_CACHE_MAX_AGE', 60)
+
+
+def cache_is_shared(alias='default'):
+    return not isinstance(caches[alias], (LocMemCache, DummyCache))
+
+
+def versioned_cache_timeout(timeout):
+    """Timeout for a version-invalidated entry: capped at LOCAL_CACHE_MAX_AGE unless the cache is shared."""
+    if cache_is_shared():
+        return timeout
+    return LOCAL_CACHE_MAX_AGE if timeout is None else min(timeout, LOCAL_CACHE_MAX_AGE)
@@ -0,0 +1,114 @@
+import hashlib
+import time
+from django.core.cache import cache
+from django.db import transaction
+from django.db.models import Count, Max
+from django.utils.cache import get_conditional_response, patch_vary_headers
+from django.utils.http import http_date
+from .caching import versioned_cache_timeout
+from .replicas import replica_cache_timeout
+
+# Validators are cached against a per-scope version that every write to the scope bumps,
+# so they can live long: a stale one is never used, it just stops matching.
+CONDITIONAL_VALIDATOR_TTL = 60 * 60
+
+
+def version_key(scope):
+    return f"conditional_version_{scope}"
+
+
+def generation_key(scope):
+    return f"conditional_generation_{scope}"
+
+
+def invalidate_validators(scopes, related=False):
+    """
+    Bump the validator versions of `scopes` once the write commits. related=True is for
+    writes to data the scope's payloads show but whose rows don't carry (a renamed
+    category or provider): it also changes the ETags of unchanged rows.
+    """
+    keys = [version_key(scope) for scope in scopes]
+    if related:
+        keys += [generation_key(scope) for scope in scopes]
+
+    def bump():
+        for key in keys:
+            try:
+                cache.incr(key)
+            except ValueError:
+                # seeded from the clock, like the dashboard versions: a fresh counter
+                # must not line up with one an old cached validator was stored under
+                cache.add(key, time.time_ns(), timeout=None)
+    transaction.on_commit(bump)
+
+
+def validator_key(scope, request):
+    user = request.user
+    params = sorted(request.query_params.lists())
+    digest = hashlib.md5(f"{user.pk}:{request.path}:{params}".encode()).hexdigest()
+    return f"conditional_validator_{scope}_{digest}"
+
+
+class ConditionalGetMixin:
+    """
+    ETag / Last-Modified for list and detail GETs of a model viewset.
+
+    The validator is the row count and latest updated_at of the filtered queryset, so
+    any insert, update or delete in it changes the ETag. It is cached per user and URL
+    under the scope's version (see invalidate_validators), so a poll that ends in
+    304 Not Modified costs one cache round trip and no query or serialization.
+
+    Lists get no Last-Modified: deleting a row leaves the latest updated_at as it was,
+    so If-Modified-Since alone would keep answering 304 for a list that lost a row.
+    """
+    conditional_scope = None
+
+    def list(self, request, *args, **kwargs):
+        return self.conditional(
+            request, lambda: self.filter_queryset(self.get_queryset()),
+            lambda: super(ConditionalGetMixin, self).list(request, *args, **kwargs), last_modified=False)
+
+    def retrieve(self, request, *args, **kwargs):
+        lookup = {self.lookup_field: kwargs[self.lookup_url_kwarg or self.lookup_field]}
+        return self.conditional(
+            request, lambda: self.filter_queryset(self.get_queryset()).filter(**lookup),
+            lambda: super(ConditionalGetMixin, self).retrieve(request, *args, **kwargs))
+
+    def conditional(self, request, queryset, respond, last_modified=True):
+        etag, latest = self.validators(request, queryset)
+        last_modified = latest if last_modified else None
+        response = get_conditional_response(request, etag=etag, last_modified=last_modified)
+        if response is None:
+            response = respond()
+            if response.status_code != 200:
+                return response
+        response['ETag'] = etag
+        if last_modified is not None:
+            response['Last-Modified'] = http_date(last_modified)
+        # the payload depends on who is asking
+        patch_vary_headers(response, ['Authorization'])
+        return response
+
+    def validators(self, request, queryset):
+        scope = self.conditional_scope
+        key = validator_key(scope, request)
+        found = cache.get_many([version_key(scope), generation_key(scope), key])
+        version, generation = found.get(version_key(scope)), found.get(generation_key(scope))
+        cached = found.get(key)
+        if version is not None and cached is not None and cached[0] == version:
+            return cached[1], cached[2]
+
+        if version is None:
+            cache.add(version_key(scope), time.time_ns(), timeout=None)
+            version = cache.get(version_key(scope))
+        if generation is None:
+            cache.add(generation_key(scope), time.time_ns(), timeout=None)
+            generation = cache.get(generation_key(scope))
+        stats = queryset().order_by().aggregate(latest=Max('updated_at'), count=Count('pk'))
+        latest = stats['latest']
+        tag = hashlib.md5(f"{key}:{stats['count']}:{latest and latest.isoformat()}:{generation}".encode())
+        etag = f'W/"{tag.hexdigest()}"'
+        last_modified = int(latest.timestamp()) if latest else None
+        cache.set(key, (version, etag, last_modified),
+                  replica_cache_timeout(versioned_cache_timeout(CONDITIONAL_VALIDATOR_TTL)))
+        return etag, last_modified
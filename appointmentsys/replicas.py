@@ -0,0 +1,152 @@
+import hashlib
+import random
+import time
+from contextvars import ContextVar
+from django.conf import settings
+from django.core.cache import cache
+from django.db import DEFAULT_DB_ALIAS, DatabaseError, connections
+
+# Read replicas are opt-in per request: only safe-method list/retrieve calls of the
+# viewsets and the views of REPLICA_READ_VIEW_MODULES read from them, everything else
+# (writes, Celery tasks, management commands) stays on the primary.
+REPLICA_READ_VIEW_MODULES = getattr(settings, 'REPLICA_READ_VIEW_MODULES', ('dashboard.views',))
+REPLICA_READ_ACTIONS = ('list', 'retrieve')
+# upper bound on replication lag: a client that wrote reads from the primary for this long,
+# and cache entries computed from a replica expire after it
+REPLICA_MAX_LAG = getattr(settings, 'REPLICA_MAX_LAG', 5)
+# how often a replica's health is re-checked per process
+REPLICA_HEALTH_INTERVAL = getattr(settings, 'REPLICA_HEALTH_INTERVAL', 10)
+
+
+class RequestRouting:
+    def __init__(self, client=None):
+        self.client = client
+        self.replica_reads = False
+        self.replica = None
+        self.wrote = False
+
+
+routing = ContextVar('request_database_routing', default=None)
+health = {}
+
+
+def client_key(request):
+    # who is asking, without a query: the bearer token or the session cookie
+    credential = request.headers.get('Authorization') or request.COOKIES.get(settings.SESSION_COOKIE_NAME)
+    return hashlib.md5(credential.encode()).hexdigest() if credential else None
+
+
+def pin_key(client):
+    return f"replica_pin_{client}"
+
+
+def is_healthy(alias):
+    healthy, checked_at = health.get(alias, (False, None))
+    now = time.monotonic()
+    if checked_at is not None and now - checked_at < REPLICA_HEALTH_INTERVAL:
+        return healthy
+    try:
+        connection = connections[alias]
+        connection.ensure_connection()
+        healthy = connection.is_usable()
+    except DatabaseError:
+        healthy = False
+    health[alias] = (healthy, now)
+    return healthy
+
+
+def replica_cache_timeout(timeout):
+    """
+    Cache timeout for a value computed in the current request: capped at REPLICA_MAX_LAG
+    when it was read from a replica, which may not have a write that is already committed
+    (and already bumped the cache versions) on the primary.
+    """
+    state = routing.get()
+    if state is not None and state.replica is not None:
+        return REPLICA_MAX_LAG if timeout is None else min(timeout, REPLICA_MAX_LAG)
+    return timeout
+
+
+class ReplicaRouter:
+    """
+    Sends the reads of replica-enabled requests to one healthy replica (the same one for
+    the whole request) and everything else to the primary. Once a request writes, its
+    remaining reads go to the primary too.
+    """
+
+    def db_for_read(self, model, **hints):
+        state = routing.get()
+        if state is None or not state.replica_reads or state.wrote:
+            return DEFAULT_DB_ALIAS
+        if connections[DEFAULT_DB_ALIAS].in_atomic_block:
+            # reads inside a transaction belong to it
+            return DEFAULT_DB_ALIAS
+        if state.replica is None:
+            healthy = [alias for alias in getattr(settings, 'READ_REPLICAS', []) if is_healthy(alias)]
+            if not healthy:
+                return DEFAULT_DB_ALIAS
+            state.replica = random.choice(healthy)
+        return state.replica
+
+    def db_for_write(self, model, **hints):
+        state = routing.get()
+        if state is not None:
+            state.wrote = True
+        return DEFAULT_DB_ALIAS
+
+    def allow_relation(self, obj1, obj2, **hints):
+        # replicas hold the same data as the primary
+        return True
+
+
+def reads_from_replica(view_func, method):
+    method = 'get' if method == 'HEAD' else method.lower()
+    actions = getattr(view_func, 'actions', None)
+    if actions is not None:
+        # a DRF viewset route, e.g. {'get': 'list', 'post': 'create'}
+        return actions.get(method) in REPLICA_READ_ACTIONS
+    view_class = getattr(view_func, 'view_class', None)
+    module = view_class.__module__ if view_class else view_func.__module__
+    return method in ('get', 'options') and module in REPLICA_READ_VIEW_MODULES
+
+
+class ReplicaRoutingMiddleware:
+    """
+    Tracks database routing per request (see ReplicaRouter). A client whose request
+    wrote is pinned to the primary for REPLICA_MAX_LAG seconds, so it reads its own
+    writes even from the next request.
+    """
+
+    def __init__(self, get_response):
+        self.get_response = get_response
+
+    def __call__(self, request):
+        state = RequestRouting(client_key(request))
+        token = routing.set(state)
+        try:
+            response = self.get_response(request)
+        finally:
+            routing.reset(token)
+        if state.wrote and state.client:
+            cache.set(pin_key(state.client), True, REPLICA_MAX_LAG)
+        if response.streaming and not response.is_async:
+            # streamed bodies (exports) are read after this returns
+            response.streaming_content = self.routed(state, response.streaming_content)
+        return response
+
+    def process_view(self, request, view_func, view_args, view_kwargs):
+        state = routing.get()
+        if state is None or not getattr(settings, 'READ_REPLICAS', None):
+            return None
+        if reads_from_replica(view_func, request.method):
+            state.replica_reads = not (state.client and cache.get(pin_key(state.client)))
+        return None
+
+    @staticmethod
+    def routed(state, content):
+        previous = routing.get()
+        routing.set(state)
+        try:
+            yield from content
+        finally:
+            routing.set(previous)
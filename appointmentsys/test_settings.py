@@ -0,0 +1,13 @@
+"""
+Settings for `manage.py test` (its default, see manage.py): the regular settings plus a
+second SQLite database that the replica routing tests (appointmentsys/tests.py) use as
+a read replica. READ_REPLICAS stays empty, so every other test reads from the primary.
+"""
+from .settings import *  # noqa: F401,F403
+from .settings import BASE_DIR, DATABASES
+
+# only its test database (in memory) is ever opened
+DATABASES['test_replica'] = {
+    'ENGINE': 'django.db.backends.sqlite3',
+    'NAME': BASE_DIR / 'test_replica.sqlite3',
+}
@@ -0,0 +1,33 @@
+from django.core.cache import cache
+from django.db import connection
+from django.test.utils import CaptureQueriesContext
+from rest_framework.test import APITestCase
+
+
+class QueryBudgetTestCase(APITestCase):
+    """
+    Base class for endpoint query budgets: an endpoint must run a fixed number of
+    queries whatever the page size, so an N+1 shows up as a failed test.
+    """
+
+    def setUp(self):
+        # a conditional GET validator cached by an earlier test would save a query
+        cache.clear()
+
+    def assertQueryBudget(self, user, url, budget, page_sizes=(1, 50)):
+        """
+        GET `url` as `user` once per page size and fail if any request runs more than
+        `budget` queries or the counts differ between page sizes. Returns the last response.
+        """
+        self.client.force_authenticate(user=user)
+        counts = {}
+        for size in page_sizes:
+            separator = '&' if '?' in url else '?'
+            with CaptureQueriesContext(connection) as queries:
+                response = self.client.get(f"{url}{separator}page_size={size}")
+            self.assertEqual(response.status_code, 200, response.content[:500])
+            counts[size] = len(queries)
+            self.assertLessEqual(len(queries), budget, f"{url} page_size={size} ran {len(queries)} queries:\n"
+                                 + "\n".join(q['sql'] for q in queries.captured_queries))
+        self.assertEqual(len(set(counts.values())), 1, f"{url} query count depends on page size: {counts}")
+        return response
@@ -0,0 +1,101 @@
+import time
+from datetime import timedelta
+from unittest import skipUnless
+from django.conf import settings
+from django.contrib.auth import get_user_model
+from django.core.cache import cache
+from django.db import DEFAULT_DB_ALIAS
+from django.test import override_settings
+from django.utils import timezone
+from rest_framework.test import APITransactionTestCase
+from accounts.authentication import tokens_for
+from appointments.models import Appointment
+from appointmentsys.replicas import ReplicaRouter, RequestRouting, health, routing
+from services.models import Category, Service
+
+User = get_user_model()
+
+# the second database of appointmentsys.test_settings
+REPLICA = 'test_replica'
+
+
+@skipUnless(REPLICA in settings.DATABASES, 'run with appointmentsys.test_settings (manage.py test)')
+@override_settings(READ_REPLICAS=[REPLICA])
+class ReplicaRoutingTests(APITransactionTestCase):
+    """
+    ReplicaRouter and ReplicaRoutingMiddleware against two SQLite databases holding
+    different rows, so the response shows where a request read from. Reads inside a
+    transaction stay on the primary: TransactionTestCase.
+    """
+    # the primary and the replica (without test_settings the class is skipped)
+    databases = '__all__'
+
+    def setUp(self):
+        cache.clear()
+        health.clear()
+        self.admin = User.objects.create(username='replica_admin', role='admin')
+        Category.objects.create(name='On primary')
+        Category.objects.using(REPLICA).create(name='On replica')
+
+    def tearDown(self):
+        health.clear()
+
+    def categories(self):
+        response = self.client.get('/api/categories/')
+        self.assertEqual(response.status_code, 200)
+        return sorted(row['name'] for row in response.data)
+
+    def test_reads_go_to_the_replica(self):
+        self.assertEqual(self.categories(), ['On replica'])
+        self.assertIsNone(routing.get())
+
+    def test_writes_go_to_the_primary(self):
+        self.client.force_authenticate(self.admin)
+        self.assertEqual(self.client.post('/api/categories/', {'name': 'New'}).status_code, 201)
+        self.assertTrue(Category.objects.filter(name='New').exists())
+        self.assertFalse(Category.objects.using(REPLICA).filter(name='New').exists())
+
+    def test_reads_after_a_write_stay_on_the_primary(self):
+        router = ReplicaRouter()
+        state = RequestRouting()
+        state.replica_reads = True
+        token = routing.set(state)
+        try:
+            self.assertEqual(router.db_for_read(Category), REPLICA)
+            self.assertEqual(router.db_for_write(Category), DEFAULT_DB_ALIAS)
+            self.assertEqual(router.db_for_read(Category), DEFAULT_DB_ALIAS)
+        finally:
+            routing.reset(token)
+
+    def test_writer_is_pinned_to_the_primary(self):
+        self.client.credentials(HTTP_AUTHORIZATION=f'Bearer {tokens_for(self.admin)[1]}')
+        self.assertEqual(self.client.post('/api/categories/', {'name': 'New'}).status_code, 201)
+        # the next request of the same client reads its own write
+        self.assertEqual(self.categories(), ['New', 'On primary'])
+        self.client.credentials()
+        self.assertEqual(self.categories(), ['On replica'])
+
+    def test_unhealthy_replica_is_skipped(self):
+        health[REPLICA] = (False, time.monotonic())
+        self.assertEqual(self.categories(), ['On primary'])
+
+    def test_state_is_reset_between_requests(self):
+        # a write without a client to pin leaves the next request free to use the replica
+        self.client.force_authenticate(self.admin)
+        self.assertEqual(self.client.post('/api/categories/', {'name': 'New'}).status_code, 201)
+        self.assertIsNone(routing.get())
+        self.assertEqual(self.categories(), ['On replica'])
+
+    def test_streamed_response_reads_from_the_replica(self):
+        customer = User.objects.create(username='replica_customer', role='customer')
+        service = Service.objects.create(provider=self.admin, name='Cut', price=20, duration=30)
+        start = timezone.now() + timedelta(days=1)
+        Appointment.objects.create(service=service, provider=self.admin, customer=customer,
+                                   start_datetime=start, end_datetime=start + timedelta(minutes=30))
+        self.client.force_authenticate(self.admin)
+        response = self.client.get('/api/dashboard/export/')
+        # the rows are read while the body streams, after the middleware returned
+        self.assertIsNone(routing.get())
+        lines = b''.join(response.streaming_content).decode().splitlines()
+        self.assertEqual(len(lines), 1, 'the export read the primary')
+        self.assertIsNone(routing.get())
@@ -0,0 +1,117 @@
+import asyncio
+import time
+import uuid
+from django.conf import settings
+from django.core.cache import cache
+from appointmentsys.caching import versioned_cache_timeout
+from appointmentsys.replicas import replica_cache_timeout
+
+# Dashboard payloads are keyed by a version counter that every relevant write bumps,
+# so an entry is never served after the data behind it changed and can live for hours
+# (with a shared cache; see appointmentsys.caching).
+DASHBOARD_CACHE_TTL = getattr(settings, 'DASHBOARD_CACHE_TTL', 6 * 60 * 60)
+# how long one request may hold the recompute lock, and how long others wait for it
+RECOMPUTE_LOCK_TTL = 30
+RECOMPUTE_WAIT = 5.0
+RECOMPUTE_POLL = 0.05
+
+GLOBAL_SCOPE = 'global'
+
+
+def version_key(scope):
+    return f"dashboard_version_{scope}"
+
+
+def provider_scope(provider_id):
+    return f"provider_{provider_id}"
+
+
+def initial_version():
+    # seeded from the clock rather than 1: if the counter is evicted, a fresh one
+    # can't line up with the version of an old payload that is still cached
+    return time.time_ns()
+
+
+def get_versions(scopes):
+    keys = {scope: version_key(scope) for scope in scopes}
+    found = cache.get_many(keys.values())
+    versions = {}
+    for scope, key in keys.items():
+        if key not in found:
+            cache.add(key, initial_version(), timeout=None)
+            found[key] = cache.get(key)
+        versions[scope] = found[key]
+    return versions
+
+
+def bump_versions(scopes):
+    for scope in set(scopes):
+        key = version_key(scope)
+        try:
+            cache.incr(key)
+        except ValueError:
+            # no counter yet: nothing can be cached under it, so just start one
+            cache.add(key, initial_version(), timeout=None)
+
+
+def versioned_key(name, scopes):
+    versions = get_versions(scopes)
+    return f"{name}:" + ":".join(f"{scope}={versions[scope]}" for scope in scopes)
+
+
+def get_or_compute(key, compute, timeout=DASHBOARD_CACHE_TTL):
+    """
+    Return the cached value for key, computing it with compute() on a miss.
+    Only the caller holding the recompute lock runs compute(); concurrent callers
+    wait for its result (up to RECOMPUTE_WAIT seconds) instead of repeating the queries.
+    """
+    lock_key = f"{key}:lock"
+    token = uuid.uuid4().hex
+    deadline = time.monotonic() + RECOMPUTE_WAIT
+    while True:
+        value = cache.get(key)
+        if value is not None:
+            return value
+        if cache.add(lock_key, token, RECOMPUTE_LOCK_TTL):
+            break
+        if time.monotonic() >= deadline:
+            # serve the caller rather than fail; the result is still stored for the next one
+            token = None
+            break
+        time.sleep(RECOMPUTE_POLL)
+
+    try:
+        value = compute()
+        cache.set(key, value, replica_cache_timeout(versioned_cache_timeout(timeout)))
+        return value
+    finally:
+        if token and cache.get(lock_key) == token:
+            cache.delete(lock_key)
+
+
+async def aget_or_compute(key, compute, timeout=DASHBOARD_CACHE_TTL):
+    """
+    get_or_compute for async views: `compute` is a coroutine function, and waiting for
+    another caller's recompute doesn't block the event loop.
+    """
+    lock_key = f"{key}:lock"
+    token = uuid.uuid4().hex
+    deadline = time.monotonic() + RECOMPUTE_WAIT
+    while True:
+        value = await cache.aget(key)
+        if value is not None:
+            return value
+        if await cache.aadd(lock_key, token, RECOMPUTE_LOCK_TTL):
+            break
+        if time.monotonic() >= deadline:
+            token = None
+            break
+        await asyncio.sleep(RECOMPUTE_POLL)
+
+    try:
+        value = await compute()
+        await cache.aset(key, value, replica_cache_timeout(versioned_cache_timeout(timeout)))
+        return value
+    finally:
+        if token and await cache.aget(lock_key) == token:
+            await cache.adelete(lock_key)
@@ -0,0 +1,34 @@
+import asyncio
+from concurrent.futures import ThreadPoolExecutor
+from asgiref.sync import sync_to_async
+from django.conf import settings
+from django.db import close_old_connections
+
+# Independent dashboard queries run side by side on these threads, each thread with its
+# own (persistent, see CONN_MAX_AGE) database connection. Django's async ORM would run
+# them one after another on the single thread-sensitive executor.
+DASHBOARD_QUERY_THREADS = getattr(settings, 'DASHBOARD_QUERY_THREADS', 8)
+executor = ThreadPoolExecutor(max_workers=DASHBOARD_QUERY_THREADS, thread_name_prefix='dashboard-query')
+
+
+def run_query(query):
+    # what the request cycle does around each request: drop this thread's connection
+    # if it expired or broke, so a long-lived worker doesn't hold a dead one
+    close_old_connections()
+    return query()
+
+
+def run_queries(queries):
+    """Run name -> zero-argument callable queries one after another; returns name -> result."""
+    return {name: query() for name, query in queries.items()}
+
+
+async def gather_queries(queries):
+    """
+    run_queries for async views: all queries at once, so the wait is the slowest query
+    rather than the sum. Request context (e.g. replica routing) is carried into the threads.
+    """
+    names = list(queries)
+    results = await asyncio.gather(*(
+        sync_to_async(run_query, thread_sensitive=False, executor=executor)(queries[name]) for name in names))
+    return dict(zip(names, results))
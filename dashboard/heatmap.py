@@ -0,0 +1,135 @@
+from datetime import datetime, time, timedelta, timezone as dt_timezone
+import numpy as np
+from django.db.models import CharField
+from django.db.models.functions import Cast, Substr
+from django.utils import timezone
+from appointments.models import Appointment
+from appointments.scheduling import expand_availability
+from .utilization import UTILIZATION_STATUSES, day_start
+
+MINUTES_PER_DAY = 24 * 60
+HEATMAP_RESOLUTIONS = (60, 15)
+HEATMAP_MAX_DAYS = 366
+
+
+def coverage(starts, ends, length):
+    """
+    Per-minute coverage of [0, length) by the intervals [starts[i], ends[i]):
+    +1 at every start, -1 at every end, then a running sum.
+    """
+    starts = np.clip(starts, 0, length)
+    ends = np.clip(ends, 0, length)
+    keep = ends > starts
+    diff = (np.bincount(starts[keep], minlength=length + 1)
+            - np.bincount(ends[keep], minlength=length + 1))
+    return np.cumsum(diff[:length])
+
+
+def fold_week(per_minute, start_date, days, bin_minutes):
+    """
+    Fold a per-minute timeline of `days` days into a 7 x (1440 / bin_minutes) matrix
+    (Monday first), summing every week of the range into one.
+    """
+    weekdays = (start_date.weekday() + np.arange(days)) % 7
+    per_day = per_minute.reshape(days, MINUTES_PER_DAY)
+    week = np.stack([per_day[weekdays == weekday].sum(axis=0) for weekday in range(7)])
+    return week.reshape(7, MINUTES_PER_DAY // bin_minutes, bin_minutes).sum(axis=2)
+
+
+def local_offsets(start_date, days):
+    """
+    UTC offset in minutes of the current time zone for every hour of the range, so
+    aware timestamps can be shifted to local wall-clock time with one array lookup.
+    Only days on which the offset changes (DST) are looked up hour by hour.
+    """
+    tz = timezone.get_current_timezone()
+    # step in UTC: arithmetic on a local aware datetime would follow the wall clock
+    first = (day_start(start_date) - timedelta(days=1)).astimezone(dt_timezone.utc)
+
+    def offset(moment):
+        return moment.astimezone(tz).utcoffset().total_seconds() // 60
+
+    daily = [offset(first + timedelta(days=d)) for d in range(days + 3)]
+    offsets = np.repeat(np.array(daily[:-1], dtype=np.int64), 24)
+    for d in range(days + 2):
+        if daily[d] != daily[d + 1]:
+            day = first + timedelta(days=d)
+            offsets[d * 24:(d + 1) * 24] = [offset(day + timedelta(hours=h)) for h in range(24)]
+    return int(first.timestamp() // 60), offsets
+
+
+def utc_text(field):
+    # 'YYYY-MM-DD HH:MM:SS' in UTC (the connection time zone), which numpy parses in bulk;
+    # much cheaper than building an aware datetime object per row
+    return Substr(Cast(field, CharField()), 1, 19)
+
+
+def utc_minutes(values):
+    return np.array(values, dtype='datetime64[s]').astype('datetime64[m]').astype(np.int64)
+
+
+def booked_timeline(intervals, start_date, days):
+    """
+    Per-minute booked coverage of the range in local time.
+    `intervals` is an (n, 2) array of UTC epoch minutes.
+    """
+    length = days * MINUTES_PER_DAY
+    if not len(intervals):
+        return np.zeros(length, dtype=np.int64)
+    first_utc, offsets = local_offsets(start_date, days)
+    hour_index = np.clip((intervals - first_utc) // 60, 0, len(offsets) - 1)
+    # local minutes since the range's first local midnight
+    origin = int(datetime.combine(start_date, time.min, tzinfo=dt_timezone.utc).timestamp() // 60)
+    local = intervals + offsets[hour_index] - origin
+    return coverage(local[:, 0], local[:, 1], length)
+
+
+def available_timeline(rows, start_date, days):
+    """
+    Per-minute availability of the range: inside an open window and not blocked.
+    Overlapping windows count once.
+    """
+    length = days * MINUTES_PER_DAY
+    if not rows:
+        return np.zeros(length, dtype=bool)
+    flat = np.array([((day - start_date).days, start_time.hour * 60 + start_time.minute,
+                      end_time.hour * 60 + end_time.minute, is_available)
+                     for day, start_time, end_time, is_available in rows], dtype=np.int64)
+    starts = flat[:, 0] * MINUTES_PER_DAY + flat[:, 1]
+    ends = flat[:, 0] * MINUTES_PER_DAY + flat[:, 2]
+    is_open = flat[:, 3] == 1
+    opened = coverage(starts[is_open], ends[is_open], length) > 0
+    blocked = coverage(starts[~is_open], ends[~is_open], length) > 0
+    return opened & ~blocked
+
+
+def occupancy_heatmap(provider_id, start_date, end_date, bin_minutes=60, service_id=None):
+    """
+    Hour-of-week (or quarter-hour-of-week) occupancy for a provider, optionally limited
+    to one service's appointments, over [start_date, end_date] in local time.
+    Returns 7 x bins matrices of booked and available minutes (Monday first).
+    Three queries; everything else is array arithmetic.
+    """
+    days = (end_date - start_date).days + 1
+    window_start, window_end = day_start(start_date), day_start(end_date + timedelta(days=1))
+    appointments = Appointment.objects.filter(
+        provider_id=provider_id, status__in=UTILIZATION_STATUSES,
+        start_datetime__lt=window_end, end_datetime__gt=window_start)
+    if service_id is not None:
+        appointments = appointments.filter(service_id=service_id)
+
+    intervals = utc_minutes(list(appointments
+                                 .annotate(start_utc=utc_text('start_datetime'), end_utc=utc_text('end_datetime'))
+                                 .values_list('start_utc', 'end_utc'))).reshape(-1, 2)
+    booked = fold_week(booked_timeline(intervals, start_date, days), start_date, days, bin_minutes)
+    rows = expand_availability([provider_id], start_date, end_date)[provider_id]
+    available = fold_week(available_timeline(rows, start_date, days), start_date, days, bin_minutes)
+
+    with np.errstate(divide='ignore', invalid='ignore'):
+        occupancy = np.where(available > 0, booked / available * 100.0, np.nan)
+    return {
+        'booked_minutes': booked.astype(int).tolist(),
+        'available_minutes': available.astype(int).tolist(),
+        'occupancy_percent': [[None if np.isnan(v) else round(float(v), 1) for v in row] for row in occupancy],
+        'days_per_weekday': np.bincount((start_date.weekday() + np.arange(days)) % 7, minlength=7).tolist(),
+    }
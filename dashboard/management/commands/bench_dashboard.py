@@ -0,0 +1,107 @@
+import asyncio
+import statistics
+import threading
+import time
+from datetime import timedelta, time as dtime
+from django.core.management.base import BaseCommand
+from django.db import connection
+from django.db.backends.signals import connection_created
+from django.test import AsyncClient
+from django.test.utils import override_settings
+from django.utils import timezone
+from django.contrib.auth import get_user_model
+from rest_framework_simplejwt.tokens import AccessToken
+from appointments.models import Appointment, AvailabilityRule
+from dashboard.cache import bump_versions, provider_scope, GLOBAL_SCOPE
+from dashboard.rollups import apply_deltas, deltas_for
+from services.models import Service
+
+User = get_user_model()
+
+PREFIX = 'bench_dashboard_'
+
+
+class RoundTrip:
+    """Execute wrapper adding a fixed delay to every query, standing in for a remote database."""
+
+    def __init__(self, seconds):
+        self.seconds = seconds
+        self.queries = 0
+        self.lock = threading.Lock()
+
+    def __call__(self, execute, sql, params, many, context):
+        with self.lock:
+            self.queries += 1
+        time.sleep(self.seconds)
+        return execute(sql, params, many, context)
+
+
+class Command(BaseCommand):
+    help = ("Benchmark the sync and async dashboard endpoints under ASGI with a simulated database "
+            "round trip on every query. Needs a file-backed or server database; data is removed afterwards.")
+
+    def add_arguments(self, parser):
+        parser.add_argument('--latency-ms', type=float, default=20.0, help='Simulated round trip per query')
+        parser.add_argument('--requests', type=int, default=20, help='Requests per endpoint')
+        parser.add_argument('--appointments', type=int, default=2000)
+
+    def handle(self, *args, **options):
+        try:
+            self.cleanup()
+            admin, provider = self.setup(options['appointments'])
+            round_trip = RoundTrip(options['latency_ms'] / 1000.0)
+
+            def add_round_trip(sender, connection, **kwargs):
+                if round_trip not in connection.execute_wrappers:
+                    connection.execute_wrappers.append(round_trip)
+            connection_created.connect(add_round_trip)
+            try:
+                with override_settings(ALLOWED_HOSTS=['testserver']):
+                    asyncio.run(self.run(admin, provider, round_trip, options['requests']))
+            finally:
+                connection_created.disconnect(add_round_trip)
+        finally:
+            self.cleanup()
+
+    async def run(self, admin, provider, round_trip, count):
+        self.stdout.write(f"{'endpoint':30} {'queries':>8} {'p50 ms':>9} {'p95 ms':>9}")
+        for path, user in (('admin', admin), ('provider', provider)):
+            client = AsyncClient()
+            headers = {'authorization': f'Bearer {AccessToken.for_user(user)}'}
+            for url in (f'/api/dashboard/{path}/', f'/api/dashboard/{path}/async/'):
+                timings, queries = [], 0
+                for _ in range(count + 1):
+                    # a cold cache every time: measure the queries, not the cache
+                    bump_versions([GLOBAL_SCOPE, provider_scope(provider.id)])
+                    before = round_trip.queries
+                    t0 = time.perf_counter()
+                    response = await client.get(url, headers=headers)
+                    timings.append((time.perf_counter() - t0) * 1000.0)
+                    queries = round_trip.queries - before
+                    assert response.status_code == 200, response.content[:200]
+                timings = sorted(timings[1:])  # the first request opens the connections
+                p95 = timings[max(0, int(len(timings) * 0.95) - 1)]
+                self.stdout.write(f"{url:30} {queries:>8} {statistics.median(timings):>9.1f} {p95:>9.1f}")
+
+    def setup(self, count):
+        admin = User.objects.create(username=f'{PREFIX}admin', role='admin')
+        provider = User.objects.create(username=f'{PREFIX}provider', role='provider')
+        customer = User.objects.create(username=f'{PREFIX}customer', role='customer')
+        service = Service.objects.create(provider=provider, name=f'{PREFIX}service', price=25, duration=30)
+        for weekday in range(7):
+            AvailabilityRule.objects.create(provider=provider, weekday=weekday, start_time=dtime(9), end_time=dtime(17))
+        # half in the past, half ahead: both the totals and the utilization window have rows
+        first = timezone.now().replace(minute=0, second=0, microsecond=0) - timedelta(hours=count // 2)
+        appointments = Appointment.objects.bulk_create([
+            Appointment(service=service, provider=provider, customer=customer,
+                        start_datetime=first + timedelta(hours=i), end_datetime=first + timedelta(hours=i, minutes=30),
+                        status='confirmed' if i % 3 else 'completed', price=service.price)
+            for i in range(count)
+        ], batch_size=1000)
+        apply_deltas(deltas_for([(a.created_at, service.id, provider.id, a.status, a.price) for a in appointments]))
+        return admin, provider
+
+    def cleanup(self):
+        # appointments, rules and rollup rows go with the users
+        User.objects.filter(username__startswith=PREFIX).delete()
+        connection.close()
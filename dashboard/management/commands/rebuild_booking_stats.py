@@ -0,0 +1,13 @@
+from django.core.management.base import BaseCommand
+from dashboard.rollups import rebuild
+
+
+class Command(BaseCommand):
+    help = "Recompute the DailyBookingStats rollup from all appointments."
+
+    def add_arguments(self, parser):
+        parser.add_argument('--batch-size', type=int, default=1000)
+
+    def handle(self, *args, **options):
+        written = rebuild(batch_size=options['batch_size'])
+        self.stdout.write(self.style.SUCCESS(f"Rebuilt {written} daily booking stats rows."))
@@ -0,0 +1,20 @@
+# Generated by Django 5.2.18 on 2026-10-18 06:56
+
+from django.conf import settings
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('dashboard', '0001_initial'),
+        ('services', '0003_searchindexversion'),
+        migrations.swappable_dependency(settings.AUTH_USER_MODEL),
+    ]
+
+    operations = [
+        migrations.AddIndex(
+            model_name='dailybookingstats',
+            index=models.Index(fields=['status', 'day'], name='stats_status_day_idx'),
+        ),
+    ]
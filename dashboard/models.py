@@ -1,3 +1,32 @@
 from django.db import models
+from django.conf import settings
+from services.models import Service
 
-# Create your models here.
+User = settings.AUTH_USER_MODEL
+
+
+class DailyBookingStats(models.Model):
+    """
+    Rollup of appointments by booking day (created_at date), service, provider and status.
+    Kept current from appointment create / change / delete events (see dashboard.signals);
+    `manage.py rebuild_booking_stats` recomputes it from scratch.
+    Revenue is the sum of the booked prices (Appointment.price) of the appointments in the bucket.
+    """
+    day = models.DateField()
+    service = models.ForeignKey(Service, on_delete=models.CASCADE, related_name='daily_stats')
+    provider = models.ForeignKey(User, on_delete=models.CASCADE, related_name='daily_booking_stats')
+    status = models.CharField(max_length=20)
+    bookings = models.IntegerField(default=0)
+    revenue = models.DecimalField(max_digits=12, decimal_places=2, default=0)
+
+    class Meta:
+        ordering = ['day']
+        unique_together = ('day', 'service', 'provider', 'status')
+        indexes = [
+            models.Index(fields=['provider', 'day'], name='stats_provider_day_idx'),
+            # admin top services: confirmed/completed buckets of the last 90 days
+            models.Index(fields=['status', 'day'], name='stats_status_day_idx'),
+        ]
+
+    def __str__(self):
+        return f"{self.day} {self.service_id}/{self.provider_id} {self.status}: {self.bookings}"
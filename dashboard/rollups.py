@@ -0,0 +1,82 @@
+from collections import defaultdict
+from decimal import Decimal
+from django.db import transaction
+from django.db.models import Count, F, Sum
+from django.db.models.functions import TruncDate
+from django.utils import timezone
+from appointments.models import Appointment
+from .cache import bump_versions, provider_scope, GLOBAL_SCOPE
+from .models import DailyBookingStats
+
+
+def stats_key(created_at, service_id, provider_id, status):
+    return (timezone.localdate(created_at), service_id, provider_id, status)
+
+
+def apply_deltas(deltas):
+    """
+    Add {(day, service_id, provider_id, status): (bookings, revenue)} to the rollup with
+    F() expressions, creating missing buckets first. Call inside the writing transaction.
+    """
+    for (day, service_id, provider_id, status), (bookings, revenue) in deltas.items():
+        if not bookings and not revenue:
+            continue
+        key = dict(day=day, service_id=service_id, provider_id=provider_id, status=status)
+        updated = DailyBookingStats.objects.filter(**key).update(
+            bookings=F('bookings') + bookings, revenue=F('revenue') + revenue)
+        if not updated and bookings > 0:
+            # only additions create buckets (removals during cascade deletes must not);
+            # concurrent writers may race to create the bucket; let one win, then add
+            DailyBookingStats.objects.bulk_create([DailyBookingStats(**key)], ignore_conflicts=True)
+            DailyBookingStats.objects.filter(**key).update(
+                bookings=F('bookings') + bookings, revenue=F('revenue') + revenue)
+
+
+def deltas_for(appointments, sign=1):
+    """
+    Rollup deltas for adding (sign=1) or removing (sign=-1) appointment snapshots,
+    given as (created_at, service_id, provider_id, status, price) tuples.
+    """
+    deltas = defaultdict(lambda: [0, Decimal('0')])
+    for created_at, service_id, provider_id, status, price in appointments:
+        delta = deltas[stats_key(created_at, service_id, provider_id, status)]
+        delta[0] += sign
+        delta[1] += sign * (price or 0)
+    return deltas
+
+
+def merge_deltas(*parts):
+    merged = defaultdict(lambda: [0, Decimal('0')])
+    for part in parts:
+        for key, (bookings, revenue) in part.items():
+            merged[key][0] += bookings
+            merged[key][1] += revenue
+    return merged
+
+
+@transaction.atomic
+def rebuild(batch_size=1000):
+    """
+    Recompute the whole rollup from Appointment with one grouped query.
+    Returns the number of buckets written.
+    """
+    providers = set(DailyBookingStats.objects.values_list('provider', flat=True).distinct())
+    DailyBookingStats.objects.all().delete()
+    rows = (Appointment.objects
+            .annotate(day=TruncDate('created_at'))
+            .values('day', 'service', 'provider', 'status')
+            .annotate(bookings=Count('id'), revenue=Sum('price'))
+            .order_by())
+    batch, written = [], 0
+    for row in rows.iterator(chunk_size=batch_size):
+        batch.append(DailyBookingStats(day=row['day'], service_id=row['service'], provider_id=row['provider'],
+                                       status=row['status'], bookings=row['bookings'], revenue=row['revenue'] or 0))
+        providers.add(row['provider'])
+        if len(batch) >= batch_size:
+            DailyBookingStats.objects.bulk_create(batch)
+            written += len(batch)
+            batch = []
+    DailyBookingStats.objects.bulk_create(batch)
+    scopes = [provider_scope(pk) for pk in providers] + [GLOBAL_SCOPE]
+    transaction.on_commit(lambda: bump_versions(scopes))
+    return written + len(batch)
@@ -0,0 +1,66 @@
+from django.db import transaction
+from django.db.models.signals import pre_save, post_save, post_delete
+from django.dispatch import receiver
+from appointments.models import Appointment, Availability, AvailabilityRule
+from appointments.signals import appointments_bulk_created
+from .cache import bump_versions, provider_scope, GLOBAL_SCOPE
+from .rollups import apply_deltas, deltas_for, merge_deltas
+
+
+def invalidate_dashboards(provider_ids, admin=False):
+    """
+    Bump the dashboard cache versions once the write is committed, so a reader can't
+    cache pre-commit numbers under the new version.
+    """
+    scopes = [provider_scope(pk) for pk in provider_ids if pk is not None]
+    if admin:
+        scopes.append(GLOBAL_SCOPE)
+    transaction.on_commit(lambda: bump_versions(scopes))
+
+
+def snapshot(appt):
+    return (appt.created_at, appt.service_id, appt.provider_id, appt.status, appt.price)
+
+
+@receiver(pre_save, sender=Appointment)
+def remember_previous(sender, instance, **kwargs):
+    # read the stored row so a status/service change can be moved between rollup buckets,
+    # at the price it was counted with
+    instance._stats_previous = None
+    if instance.pk:
+        instance._stats_previous = (Appointment.objects
+                                    .filter(pk=instance.pk)
+                                    .values_list('created_at', 'service_id', 'provider_id', 'status', 'price')
+                                    .first())
+
+
+@receiver(post_save, sender=Appointment)
+def update_stats_on_save(sender, instance, created, **kwargs):
+    previous = getattr(instance, '_stats_previous', None)
+    current = snapshot(instance)
+    invalidate_dashboards({instance.provider_id, previous[2] if previous else None}, admin=True)
+    if previous == current:
+        return
+    removed = deltas_for([previous], sign=-1) if previous else {}
+    apply_deltas(merge_deltas(removed, deltas_for([current])))
+
+
+@receiver(post_delete, sender=Appointment)
+def update_stats_on_delete(sender, instance, **kwargs):
+    invalidate_dashboards([instance.provider_id], admin=True)
+    apply_deltas(deltas_for([snapshot(instance)], sign=-1))
+
+
+@receiver(appointments_bulk_created, sender=Appointment)
+def update_stats_on_bulk_create(sender, instances, **kwargs):
+    invalidate_dashboards({a.provider_id for a in instances}, admin=True)
+    apply_deltas(deltas_for([snapshot(a) for a in instances]))
+
+
+@receiver(post_save, sender=Availability)
+@receiver(post_delete, sender=Availability)
+@receiver(post_save, sender=AvailabilityRule)
+@receiver(post_delete, sender=AvailabilityRule)
+def invalidate_on_availability_change(sender, instance, **kwargs):
+    # availability only feeds the provider's utilization; the admin dashboard is unaffected
+    invalidate_dashboards([instance.provider_id])
@@ -1,3 +1,319 @@
-from django.test import TestCase
+import io
+from datetime import date, datetime, timedelta, time
+from decimal import Decimal
+from unittest import mock
+from asgiref.sync import async_to_sync
+from django.contrib.auth import get_user_model
+from django.core.cache import cache
+from django.test import AsyncClient, SimpleTestCase, TestCase, TransactionTestCase, override_settings
+from django.utils import timezone
+from rest_framework.test import APITestCase
+from rest_framework_simplejwt.tokens import AccessToken
+from appointmentsys.caching import LOCAL_CACHE_MAX_AGE, versioned_cache_timeout
+from appointments.models import Appointment, Availability, AvailabilityRule
+from services.models import Service
+from .heatmap import occupancy_heatmap
+from .models import DailyBookingStats
+from .rollups import rebuild
+from .utilization import available_minutes_by_day, booked_minutes_by_day
 
-# Create your tests here.
+User = get_user_model()
+
+
+class AsyncDashboardTests(TransactionTestCase):
+    """
+    The async dashboards run their queries on other threads (other connections), so the
+    data has to be committed: TransactionTestCase.
+    """
+
+    def setUp(self):
+        cache.clear()
+        self.admin = User.objects.create(username='async_admin', role='admin')
+        self.provider = User.objects.create(username='async_provider', role='provider')
+        customer = User.objects.create(username='async_customer', role='customer')
+        service = Service.objects.create(provider=self.provider, name='Cut', price=20, duration=30)
+        AvailabilityRule.objects.create(provider=self.provider, weekday=timezone.localdate().weekday(),
+                                        start_time=time(0), end_time=time(23, 59))
+        start = timezone.now() + timedelta(minutes=5)
+        for i, status in enumerate(['pending', 'confirmed', 'completed', 'cancelled']):
+            Appointment.objects.create(service=service, provider=self.provider, customer=customer, status=status,
+                                       start_datetime=start + timedelta(hours=i),
+                                       end_datetime=start + timedelta(hours=i, minutes=30))
+
+    def get(self, url, user):
+        client = AsyncClient()
+        return async_to_sync(client.get)(url, headers={'authorization': f'Bearer {AccessToken.for_user(user)}'})
+
+    def test_async_payload_matches_sync(self):
+        for path, user in (('admin/', self.admin), ('provider/?days=3&breakdown=day', self.provider)):
+            sync_url = f'/api/dashboard/{path}'
+            async_url = sync_url.replace('/?', '/async/?') if '?' in sync_url else f'{sync_url}async/'
+            async_response = self.get(async_url, user)
+            self.assertEqual(async_response.status_code, 200, async_response.content)
+            cache.clear()
+            sync_response = self.get(sync_url, user)
+            self.assertJSONEqual(async_response.content, sync_response.json())
+
+    def test_authentication_and_roles(self):
+        self.assertEqual(async_to_sync(AsyncClient().get)('/api/dashboard/admin/async/').status_code, 401)
+        self.assertEqual(self.get('/api/dashboard/admin/async/', self.provider).status_code, 403)
+        self.assertEqual(self.get('/api/dashboard/provider/async/?days=0', self.provider).status_code, 400)
+
+
+class BookingStatsTests(TestCase):
+    """The rollup follows appointment changes at the price each appointment was booked at."""
+
+    def setUp(self):
+        self.provider = User.objects.create(username='stats_provider', role='provider')
+        self.customer = User.objects.create(username='stats_customer', role='customer')
+        self.service = Service.objects.create(provider=self.provider, name='Cut', price=20, duration=30)
+
+    def book(self, days=1, service=None):
+        start = timezone.now() + timedelta(days=days)
+        return Appointment.objects.create(service=service or self.service, provider=self.provider,
+                                          customer=self.customer, start_datetime=start,
+                                          end_datetime=start + timedelta(minutes=30))
+
+    def rollup(self):
+        return sorted(DailyBookingStats.objects.values_list('status', 'bookings', 'revenue'))
+
+    def buckets(self):
+        # non-empty buckets; the incremental path leaves emptied buckets at zero, rebuild drops them
+        return sorted(DailyBookingStats.objects.exclude(bookings=0, revenue=0)
+                      .values_list('day', 'service', 'status', 'bookings', 'revenue'))
+
+    def test_price_change_leaves_booked_revenue_alone(self):
+        appointment = self.book()
+        self.service.price = 35
+        self.service.save()
+        appointment.status = 'completed'
+        appointment.save()
+        self.assertEqual(self.rollup(), [('completed', 1, 20), ('pending', 0, 0)])
+        rebuild()
+        self.assertEqual(self.rollup(), [('completed', 1, 20)])
+
+    def test_status_change_moves_the_booking(self):
+        appointment = self.book()
+        self.book(days=2)
+        appointment.status = 'confirmed'
+        appointment.save()
+        today = timezone.localdate()
+        self.assertEqual(self.buckets(), [(today, self.service.pk, 'confirmed', 1, 20),
+                                          (today, self.service.pk, 'pending', 1, 20)])
+
+    def test_price_change_moves_the_revenue(self):
+        appointment = self.book()
+        appointment.price = Decimal('25.50')
+        appointment.save()
+        self.assertEqual(self.rollup(), [('pending', 1, Decimal('25.50'))])
+
+    def test_date_change_moves_the_booking(self):
+        appointment = self.book()
+        appointment.created_at -= timedelta(days=1)
+        appointment.status = 'confirmed'
+        appointment.save()
+        yesterday = timezone.localdate(appointment.created_at)
+        self.assertEqual(self.buckets(), [(yesterday, self.service.pk, 'confirmed', 1, 20)])
+        self.assertEqual(self.rollup(), [('confirmed', 1, 20), ('pending', 0, 0)])
+
+    def test_service_change_moves_the_booking(self):
+        other = Service.objects.create(provider=self.provider, name='Shave', price=15, duration=30)
+        appointment = self.book()
+        appointment.service = other
+        appointment.save()
+        # the booking keeps its price; only the bucket changes
+        self.assertEqual(self.buckets(), [(timezone.localdate(), other.pk, 'pending', 1, 20)])
+
+    def test_delete_removes_the_booking(self):
+        self.book().delete()
+        self.assertEqual(self.buckets(), [])
+
+    def test_rebuild_matches_the_incremental_rollup(self):
+        other = Service.objects.create(provider=self.provider, name='Shave', price=15, duration=30)
+        appointments = [self.book(days=n, service=other if n % 2 else None) for n in range(1, 7)]
+        appointments[0].status = 'confirmed'
+        appointments[0].save()
+        appointments[1].status = 'cancelled'
+        appointments[1].price = 18
+        appointments[1].save()
+        appointments[2].created_at -= timedelta(days=3)
+        appointments[2].save()
+        appointments[3].service = other
+        appointments[3].save()
+        appointments[4].delete()
+        incremental = self.buckets()
+        rebuild()
+        self.assertEqual(self.buckets(), incremental)
+        self.assertEqual(sum(row[3] for row in incremental), 5)
+
+
+class OccupancyTestCase(TestCase):
+    """A provider with bookings at local wall-clock times around a Monday."""
+    monday = date(2026, 11, 2)
+
+    def setUp(self):
+        self.provider = User.objects.create(username='occupancy_provider', role='provider')
+        self.customer = User.objects.create(username='occupancy_customer', role='customer')
+        self.service = Service.objects.create(provider=self.provider, name='Cut', price=20, duration=30)
+
+    def at(self, day, hour, minute=0):
+        return timezone.make_aware(datetime.combine(day, time(hour, minute)))
+
+    def book(self, start, minutes, status='confirmed'):
+        return Appointment.objects.create(service=self.service, provider=self.provider, customer=self.customer,
+                                          start_datetime=start, end_datetime=start + timedelta(minutes=minutes),
+                                          status=status)
+
+    def open_window(self, day, start_hour, end_hour, is_available=True):
+        return Availability.objects.create(provider=self.provider, date=day, start_time=time(start_hour),
+                                           end_time=time(end_hour), is_available=is_available)
+
+
+class UtilizationTests(OccupancyTestCase):
+
+    def test_overlapping_windows_count_once(self):
+        self.open_window(self.monday, 9, 12)
+        self.open_window(self.monday, 11, 14)
+        self.open_window(self.monday, 13, 15, is_available=False)
+        AvailabilityRule.objects.create(provider=self.provider, weekday=1, start_time=time(9),
+                                        end_time=time(12), valid_from=self.monday)
+        AvailabilityRule.objects.create(provider=self.provider, weekday=1, start_time=time(10),
+                                        end_time=time(13), valid_from=self.monday)
+        tuesday = self.monday + timedelta(days=1)
+        self.assertEqual(available_minutes_by_day(self.provider.id, self.monday, tuesday),
+                         {self.monday: 240, tuesday: 240})
+
+    def test_booking_across_midnight_is_split(self):
+        tuesday = self.monday + timedelta(days=1)
+        self.book(self.at(self.monday, 10), 60)
+        self.book(self.at(self.monday, 23), 120)
+        self.assertEqual(booked_minutes_by_day(self.provider.id, self.monday, tuesday),
+                         {self.monday: 120, tuesday: 60})
+        # clipped to the window on either side
+        self.assertEqual(booked_minutes_by_day(self.provider.id, self.monday, self.monday), {self.monday: 120})
+        self.assertEqual(booked_minutes_by_day(self.provider.id, tuesday, tuesday), {tuesday: 60})
+
+    def test_cancelled_bookings_are_excluded(self):
+        self.book(self.at(self.monday, 10), 60, status='cancelled')
+        self.book(self.at(self.monday, 23), 120, status='cancelled')
+        self.book(self.at(self.monday, 12), 30)
+        self.assertEqual(booked_minutes_by_day(self.provider.id, self.monday, self.monday), {self.monday: 30})
+
+    @override_settings(TIME_ZONE='Europe/Berlin')
+    def test_range_across_dst_change(self):
+        # clocks go forward at 02:00 on Sunday 29 March 2026; the Sunday has 23 hours
+        saturday, sunday, monday = date(2026, 3, 28), date(2026, 3, 29), date(2026, 3, 30)
+        self.book(self.at(saturday, 23, 30), 60)
+        self.book(self.at(sunday, 1, 30), 60)
+        self.book(self.at(sunday, 23, 30), 60)
+        self.book(self.at(monday, 0, 45), 15)
+        self.open_window(sunday, 9, 17)
+        self.assertEqual(booked_minutes_by_day(self.provider.id, saturday, monday),
+                         {saturday: 30, sunday: 120, monday: 45})
+        self.assertEqual(available_minutes_by_day(self.provider.id, saturday, monday), {sunday: 480})
+
+
+class HeatmapTests(OccupancyTestCase):
+
+    def heatmap(self, start_date, end_date):
+        return occupancy_heatmap(self.provider.id, start_date, end_date)
+
+    def test_overlapping_windows_count_once(self):
+        self.open_window(self.monday, 9, 11)
+        self.open_window(self.monday, 10, 12)
+        self.open_window(self.monday, 11, 12, is_available=False)
+        available = self.heatmap(self.monday, self.monday)['available_minutes']
+        self.assertEqual(available[0][8:13], [0, 60, 60, 0, 0])
+        self.assertEqual(sum(map(sum, available)), 120)
+
+    def test_booking_across_midnight_is_split(self):
+        self.book(self.at(self.monday, 23, 30), 60)
+        booked = self.heatmap(self.monday, self.monday + timedelta(days=1))['booked_minutes']
+        self.assertEqual(booked[0][23], 30)
+        self.assertEqual(booked[1][0], 30)
+        self.assertEqual(sum(map(sum, booked)), 60)
+        # a range that ends at midnight keeps only the Monday half
+        booked = self.heatmap(self.monday, self.monday)['booked_minutes']
+        self.assertEqual(sum(map(sum, booked)), 30)
+
+    def test_cancelled_bookings_are_excluded(self):
+        self.book(self.at(self.monday, 10), 60, status='cancelled')
+        self.book(self.at(self.monday, 12), 30)
+        booked = self.heatmap(self.monday, self.monday)['booked_minutes']
+        self.assertEqual(booked[0][10], 0)
+        self.assertEqual(booked[0][12], 30)
+        self.assertEqual(sum(map(sum, booked)), 30)
+
+    @override_settings(TIME_ZONE='Europe/Berlin')
+    def test_range_across_dst_change(self):
+        saturday, sunday, monday = date(2026, 3, 28), date(2026, 3, 29), date(2026, 3, 30)
+        self.book(self.at(saturday, 23, 30), 60)
+        self.book(self.at(sunday, 23, 30), 60)
+        self.book(self.at(monday, 9), 60)
+        booked = self.heatmap(saturday, monday)['booked_minutes']
+        # local wall-clock hours: UTC+1 before the change, UTC+2 after it
+        self.assertEqual((booked[5][23], booked[6][0]), (30, 30))
+        self.assertEqual((booked[6][23], booked[0][0]), (30, 30))
+        self.assertEqual(booked[0][9], 60)
+        self.assertEqual(sum(map(sum, booked)), 180)
+
+
+class VersionedCacheTimeoutTests(SimpleTestCase):
+    """Version-invalidated entries only live long in a cache every process shares."""
+
+    @override_settings(CACHES={'default': {'BACKEND': 'django.core.cache.backends.locmem.LocMemCache'}})
+    def test_process_local_cache_caps_timeout(self):
+        self.assertEqual(versioned_cache_timeout(6 * 60 * 60), LOCAL_CACHE_MAX_AGE)
+        self.assertEqual(versioned_cache_timeout(None), LOCAL_CACHE_MAX_AGE)
+        self.assertEqual(versioned_cache_timeout(10), 10)
+
+    @override_settings(CACHES={'default': {'BACKEND': 'django.core.cache.backends.filebased.FileBasedCache',
+                                           'LOCATION': '/tmp/appointmentsys-test-cache'}})
+    def test_shared_cache_keeps_timeout(self):
+        self.assertEqual(versioned_cache_timeout(6 * 60 * 60), 6 * 60 * 60)
+
+
+class ExportTests(APITestCase):
+    """/dashboard/export/ streams the same rows as CSV, Parquet or an Arrow stream."""
+
+    @classmethod
+    def setUpTestData(cls):
+        cls.admin = User.objects.create(username='export_admin', role='admin')
+        provider = User.objects.create(username='export_provider', role='provider')
+        customer = User.objects.create(username='export_customer', role='customer')
+        service = Service.objects.create(provider=provider, name='Cut', price='20.50', duration=30)
+        start = timezone.now() + timedelta(days=1)
+        for hours in (0, 1):
+            Appointment.objects.create(service=service, provider=provider, customer=customer,
+                                       start_datetime=start + timedelta(hours=hours),
+                                       end_datetime=start + timedelta(hours=hours, minutes=30))
+
+    def export(self, **params):
+        self.client.force_authenticate(self.admin)
+        response = self.client.get('/api/dashboard/export/', params)
+        self.assertEqual(response.status_code, 200)
+        return b''.join(response.streaming_content)
+
+    def test_csv(self):
+        lines = self.export().decode().splitlines()
+        self.assertEqual(lines[0], 'id,service,provider,customer,start_datetime,end_datetime,status,price,created_at')
+        self.assertEqual(len(lines), 3)
+
+    def test_columnar_formats(self):
+        import pyarrow as pa
+        import pyarrow.parquet as pq
+        tables = {
+            'parquet': pq.read_table(io.BytesIO(self.export(format='parquet'))),
+            'arrow': pa.ipc.open_stream(self.export(format='arrow')).read_all(),
+        }
+        for export_format, table in tables.items():
+            self.assertEqual(table.num_rows, 2, export_format)
+            self.assertEqual(table.column('price').to_pylist(), [Decimal('20.50')] * 2)
+            self.assertEqual(table.schema.field('start_datetime').type, pa.timestamp('us', tz='UTC'))
+
+    def test_columnar_formats_need_pyarrow(self):
+        self.client.force_authenticate(self.admin)
+        with mock.patch('dashboard.views.pyarrow_available', return_value=False):
+            response = self.client.get('/api/dashboard/export/', {'format': 'parquet'})
+        self.assertEqual(response.status_code, 406)
+        self.assertEqual(self.client.get('/api/dashboard/export/', {'format': 'xlsx'}).status_code, 400)
@@ -1,9 +1,13 @@
 from django.urls import path
-from .views import AdminDashboardAPIView, ProviderDashboardAPIView, CustomerDashboardAPIView, DashboardExportAPIView
+from .views import (AdminDashboardAPIView, ProviderDashboardAPIView, CustomerDashboardAPIView, DashboardExportAPIView,
+                    HeatmapAPIView, AsyncAdminDashboardView, AsyncProviderDashboardView)
 
 urlpatterns = [
     path('admin/', AdminDashboardAPIView.as_view(), name='dashboard-admin'),
+    path('admin/async/', AsyncAdminDashboardView.as_view(), name='dashboard-admin-async'),
     path('provider/', ProviderDashboardAPIView.as_view(), name='dashboard-provider'),
+    path('provider/async/', AsyncProviderDashboardView.as_view(), name='dashboard-provider-async'),
     path('customer/', CustomerDashboardAPIView.as_view(), name='dashboard-customer'),
+    path('heatmap/', HeatmapAPIView.as_view(), name='dashboard-heatmap'),
     path('export/', DashboardExportAPIView.as_view(), name='dashboard-export'),
 ]
@@ -0,0 +1,115 @@
+from collections import defaultdict
+from datetime import datetime, time, timedelta
+from django.db.models import DurationField, ExpressionWrapper, F, Sum
+from django.db.models.functions import TruncDate
+from django.utils import timezone
+from appointments.models import Appointment
+from appointments.scheduling import expand_availability, merge_intervals
+
+UTILIZATION_STATUSES = ['pending', 'confirmed', 'completed']
+UTILIZATION_MAX_DAYS = 90
+
+
+def day_start(day):
+    return timezone.make_aware(datetime.combine(day, time.min))
+
+
+def booked_minutes_by_day(provider_id, start_date, end_date):
+    """
+    Booked minutes per local day in [start_date, end_date], clipped to the window.
+    Bookings inside one day are summed by the database, a row per day however many
+    appointments there are; the few that cross midnight are fetched and split between
+    the days they cover. Two queries.
+    """
+    window_start, window_end = day_start(start_date), day_start(end_date + timedelta(days=1))
+    appointments = (Appointment.objects
+                    .filter(provider_id=provider_id, status__in=UTILIZATION_STATUSES,
+                            start_datetime__lt=window_end, end_datetime__gt=window_start)
+                    .annotate(day=TruncDate('start_datetime'), end_day=TruncDate('end_datetime')))
+    duration = ExpressionWrapper(F('end_datetime') - F('start_datetime'), output_field=DurationField())
+    rows = (appointments
+            .filter(day=F('end_day'))
+            .values('day')
+            .annotate(booked=Sum(duration))
+            .order_by())
+    booked = defaultdict(float, {row['day']: row['booked'].total_seconds() / 60.0 for row in rows if row['booked']})
+
+    crossing = appointments.exclude(day=F('end_day')).values_list('start_datetime', 'end_datetime')
+    for start, end in crossing:
+        start, end = max(start, window_start), min(end, window_end)
+        while start < end:
+            day = timezone.localdate(start)
+            midnight = day_start(day + timedelta(days=1))
+            booked[day] += (min(end, midnight) - start).total_seconds() / 60.0
+            start = midnight
+    return {day: minutes for day, minutes in booked.items() if minutes}
+
+
+def minutes_of(t):
+    return t.hour * 60 + t.minute + t.second / 60.0
+
+
+def available_minutes_by_day(provider_id, start_date, end_date):
+    """
+    Available minutes per day in [start_date, end_date]: the union of the open windows
+    (concrete rows and expanded weekly rules) minus the union of blocked windows.
+    Overlapping rows are merged first so no minute is counted twice.
+    """
+    windows = defaultdict(lambda: ([], []))
+    for day, start_time, end_time, is_available in expand_availability([provider_id], start_date, end_date)[provider_id]:
+        windows[day][0 if is_available else 1].append((minutes_of(start_time), minutes_of(end_time)))
+
+    available = {}
+    for day, (open_windows, blocked) in windows.items():
+        open_windows, blocked = merge_intervals(open_windows), merge_intervals(blocked)
+        # both lists are disjoint, so pairwise overlaps add up to the blocked share exactly
+        overlap = sum(max(0.0, min(open_end, block_end) - max(open_start, block_start))
+                      for open_start, open_end in open_windows
+                      for block_start, block_end in blocked)
+        minutes = sum(end - start for start, end in open_windows) - overlap
+        if minutes > 0:
+            available[day] = minutes
+    return available
+
+
+def percent(booked, available):
+    return (booked / available * 100.0) if available > 0 else None
+
+
+def provider_utilization(provider_id, start_date, days, by_day=False):
+    """
+    Booked vs available minutes for a provider over `days` whole days from start_date.
+    Four queries for any window length. With by_day=True a per-day breakdown is included.
+    """
+    end_date = start_date + timedelta(days=days - 1)
+    booked = booked_minutes_by_day(provider_id, start_date, end_date)
+    available = available_minutes_by_day(provider_id, start_date, end_date)
+    return summarize_utilization(start_date, days, booked, available, by_day)
+
+
+def summarize_utilization(start_date, days, booked, available, by_day=False):
+    """
+    The provider_utilization result from per-day booked and available minutes, for callers
+    that fetch the two independently (see dashboard.concurrency).
+    """
+    booked_total = sum(booked.values())
+    available_total = sum(available.values())
+    result = {
+        'start': start_date,
+        'days': days,
+        'booked_minutes': booked_total,
+        'available_minutes': available_total,
+        'utilization_percent': percent(booked_total, available_total),
+    }
+    if by_day:
+        result['by_day'] = []
+        for offset in range(days):
+            day = start_date + timedelta(days=offset)
+            day_booked, day_available = booked.get(day, 0.0), available.get(day, 0.0)
+            result['by_day'].append({
+                'date': day,
+                'booked_minutes': day_booked,
+                'available_minutes': day_available,
+                'utilization_percent': percent(day_booked, day_available),
+            })
+    return result
@@ -1,7 +1,105 @@
+import csv
+import io
+import zlib
 from datetime import datetime, timedelta, date
 
+EXPORT_CHUNK_SIZE = 2000  # rows fetched per database round trip and written per streamed chunk
+
 def date_range(start_date, end_date):
     cur = start_date
     while cur <= end_date:
         yield cur
         cur += timedelta(days=1)
+
+
+def stream_csv(header, rows, rows_per_chunk=EXPORT_CHUNK_SIZE):
+    """
+    Yield CSV text in chunks of `rows_per_chunk` rows; only one chunk is held in memory.
+    """
+    buffer = io.StringIO()
+    writer = csv.writer(buffer)
+    writer.writerow(header)
+    for i, row in enumerate(rows, 1):
+        writer.writerow(row)
+        if i % rows_per_chunk == 0:
+            yield buffer.getvalue()
+            buffer.seek(0)
+            buffer.truncate(0)
+    yield buffer.getvalue()
+
+
+def gzip_stream(chunks):
+    """
+    Compress a stream of text chunks into a gzip byte stream on the fly.
+    """
+    compressor = zlib.compressobj(wbits=31)  # 31 = gzip container
+    for chunk in chunks:
+        data = compressor.compress(chunk.encode('utf-8'))
+        if data:
+            yield data
+    yield compressor.flush()
+
+
+class _ChunkSink(io.RawIOBase):
+    """
+    Write-only file object that collects bytes until drained, so a columnar writer's
+    output can be streamed out piece by piece.
+    """
+
+    def __init__(self):
+        super().__init__()
+        self._chunks = []
+        self._position = 0
+
+    def writable(self):
+        return True
+
+    def write(self, data):
+        self._chunks.append(bytes(data))
+        self._position += len(data)
+        return len(data)
+
+    def tell(self):
+        return self._position
+
+    def drain(self):
+        data = b''.join(self._chunks)
+        self._chunks = []
+        return data
+
+
+def stream_columnar(columns, rows, fmt, rows_per_batch=EXPORT_CHUNK_SIZE):
+    """
+    Yield a Parquet file (fmt='parquet', one row group per batch) or an Arrow IPC stream
+    (fmt='arrow') built from `rows` in record batches of `rows_per_batch`.
+    `columns` is a list of (name, pyarrow type). Requires pyarrow.
+    """
+    import pyarrow as pa
+    import pyarrow.parquet as pq
+
+    schema = pa.schema(columns)
+    sink = _ChunkSink()
+    if fmt == 'parquet':
+        writer = pq.ParquetWriter(sink, schema)
+    else:
+        writer = pa.ipc.new_stream(sink, schema)
+
+    def write(chunk):
+        values = list(zip(*chunk))
+        batch = pa.record_batch([pa.array(values[i], type=field.type) for i, field in enumerate(schema)],
+                                schema=schema)
+        writer.write_batch(batch)
+
+    chunk = []
+    for row in rows:
+        chunk.append(row)
+        if len(chunk) == rows_per_batch:
+            write(chunk)
+            chunk = []
+            data = sink.drain()
+            if data:
+                yield data
+    if chunk:
+        write(chunk)
+    writer.close()
+    yield sink.drain()
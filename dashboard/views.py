@@ -1,20 +1,53 @@
+from asgiref.sync import sync_to_async
 from rest_framework.views import APIView
 from rest_framework.response import Response
 from rest_framework.permissions import IsAuthenticated
+from rest_framework.negotiation import DefaultContentNegotiation
+from rest_framework.settings import APISettings
+from rest_framework.exceptions import AuthenticationFailed
+from rest_framework.utils.encoders import JSONEncoder
+from accounts.authentication import ClaimsJWTAuthentication
 from django.db.models import Count, Sum, F, Q, DateField
 from django.db.models.functions import TruncDay, TruncWeek, TruncMonth
-from django.core.cache import cache
-from django.http import HttpResponse
-import csv
+from django.utils import timezone
+from django.http import JsonResponse, StreamingHttpResponse
+from django.views import View
 from datetime import datetime, timedelta
 
 from appointments.models import Appointment
 from services.models import Service
+from .cache import aget_or_compute, get_or_compute, versioned_key, provider_scope, GLOBAL_SCOPE
+from .concurrency import gather_queries, run_queries
+from .heatmap import occupancy_heatmap, HEATMAP_RESOLUTIONS, HEATMAP_MAX_DAYS
+from .models import DailyBookingStats
+from .utilization import (available_minutes_by_day, booked_minutes_by_day, day_start, summarize_utilization,
+                          UTILIZATION_MAX_DAYS)
+from .utils import stream_csv, gzip_stream, stream_columnar, EXPORT_CHUNK_SIZE
 from django.contrib.auth import get_user_model
 
 User = get_user_model()
 
-CACHE_TTL = 60  # seconds; tune as needed or use settings
+
+def top_services_queryset(today):
+    # top services (by bookings & revenue) - last 90 days
+    since = today - timedelta(days=90)
+    return (DailyBookingStats.objects
+            .filter(day__gte=since, status__in=['confirmed','completed'])
+            .values('service')
+            .annotate(bookings=Sum('bookings'),
+                      revenue=Sum('revenue'))
+            .order_by('-bookings')[:10])
+
+
+def booking_trend_queryset(today):
+    # bookings trend (last 30 days)
+    last_30 = today - timedelta(days=30)
+    return (DailyBookingStats.objects
+            .filter(day__gte=last_30)
+            .values('day')
+            .annotate(bookings=Sum('bookings'))
+            .order_by('day'))
+
 
 class AdminDashboardAPIView(APIView):
     permission_classes = [IsAuthenticated]
@@ -23,54 +56,62 @@ class AdminDashboardAPIView(APIView):
         user = request.user
         if user.role != 'admin':
             return Response({'detail': 'Forbidden'}, status=403)
+        return Response(get_or_compute(self.cache_key(), self.build_payload))
+
+    @staticmethod
+    def cache_key():
+        # the version changes on every appointment write; the date rolls the 30/90 day windows
+        return versioned_key(f"admin_dashboard_{timezone.localdate()}", [GLOBAL_SCOPE])
+
+    @staticmethod
+    def queries(today):
+        """
+        The payload's independent queries (name -> callable), run one after another here
+        and concurrently by AsyncAdminDashboardView.
+        Everything reads the DailyBookingStats rollup: O(days x services) rows
+        instead of scanning appointments.
+        """
+        return {
+            'totals': lambda: DailyBookingStats.objects.aggregate(
+                total_bookings=Sum('bookings'),
+                total_confirmed=Sum('bookings', filter=Q(status='confirmed')),
+                total_cancelled=Sum('bookings', filter=Q(status='cancelled')),
+                total_revenue=Sum('revenue', filter=Q(status='completed')),
+            ),
+            'top_services': lambda: list(top_services_queryset(today)),
+            'trend': lambda: list(booking_trend_queryset(today)),
+        }
 
-        cache_key = f"admin_dashboard_v1"
-        cached = cache.get(cache_key)
-        if cached:
-            return Response(cached)
-
-        # basic totals
-        total_bookings = Appointment.objects.filter().count()
-        total_confirmed = Appointment.objects.filter(status='confirmed').count()
-        total_cancelled = Appointment.objects.filter(status='cancelled').count()
-        total_revenue = Appointment.objects.filter(status='completed').aggregate(
-            revenue=Sum(F('service__price'))
-        )['revenue'] or 0
-
-        # top services (by bookings & revenue) - last 90 days
-        since = datetime.now() - timedelta(days=90)
-        top_services_qs = (Appointment.objects
-            .filter(created_at__gte=since, status__in=['confirmed','completed'])
-            .values('service')
-            .annotate(bookings=Count('id'),
-                      revenue=Sum(F('service__price')))
-            .order_by('-bookings')[:10])
-
-        # bookings trend (last 30 days)
-        last_30 = datetime.now() - timedelta(days=30)
-        trend_qs = (Appointment.objects
-            .filter(created_at__gte=last_30)
-            .annotate(day=TruncDay('created_at'))
-            .values('day')
-            .annotate(bookings=Count('id'))
-            .order_by('day'))
-
-        # format trend
-        trend = [{'date': t['day'].date(), 'bookings': t['bookings']} for t in trend_qs]
-
-        payload = {
+    @staticmethod
+    def payload(results):
+        totals = results['totals']
+        return {
             'totals': {
-                'total_bookings': total_bookings,
-                'total_confirmed': total_confirmed,
-                'total_cancelled': total_cancelled,
-                'total_revenue': float(total_revenue),
+                'total_bookings': totals['total_bookings'] or 0,
+                'total_confirmed': totals['total_confirmed'] or 0,
+                'total_cancelled': totals['total_cancelled'] or 0,
+                'total_revenue': float(totals['total_revenue'] or 0),
             },
-            'top_services': list(top_services_qs),
-            'trend': trend,
+            'top_services': results['top_services'],
+            'trend': [{'date': t['day'], 'bookings': t['bookings']} for t in results['trend']],
         }
 
-        cache.set(cache_key, payload, CACHE_TTL)
-        return Response(payload)
+    def build_payload(self):
+        return self.payload(run_queries(self.queries(timezone.localdate())))
+
+
+def parse_provider_dashboard_params(params):
+    """
+    Read days/breakdown for the provider dashboard.
+    Returns (days, by_day) or raises ValueError with a client-facing message.
+    """
+    try:
+        days = int(params.get('days', 7))
+    except ValueError:
+        raise ValueError('days must be an integer')
+    if not 1 <= days <= UTILIZATION_MAX_DAYS:
+        raise ValueError(f'days must be between 1 and {UTILIZATION_MAX_DAYS}')
+    return days, params.get('breakdown') == 'day'
 
 
 class ProviderDashboardAPIView(APIView):
@@ -80,62 +121,126 @@ class ProviderDashboardAPIView(APIView):
         user = request.user
         if user.role not in ['provider', 'admin']:
             return Response({'detail': 'Forbidden'}, status=403)
-
-        cache_key = f"provider_dashboard_{user.id}_v1"
-        cached = cache.get(cache_key)
-        if cached:
-            return Response(cached)
-
-        # totals for provider
+        try:
+            days, by_day = parse_provider_dashboard_params(request.query_params)
+        except ValueError as e:
+            return Response({'detail': str(e)}, status=400)
+        return Response(get_or_compute(self.cache_key(user, days, by_day),
+                                       lambda: self.build_payload(user, days, by_day)))
+
+    @staticmethod
+    def cache_key(user, days, by_day):
+        # the version changes on this provider's appointment and availability writes;
+        # upcoming/utilization are relative to now, so entries also roll over every hour
+        hour = timezone.now().strftime('%Y%m%d%H')
+        return versioned_key(f"provider_dashboard_{user.id}_{hour}_{days}_{int(by_day)}",
+                             [provider_scope(user.id)])
+
+    @staticmethod
+    def queries(user, today, days):
+        """
+        The payload's independent queries (name -> callable), run one after another here
+        and concurrently by AsyncProviderDashboardView.
+        """
         qs = Appointment.objects.filter(provider=user)
-        total_bookings = qs.count()
-        upcoming = qs.filter(start_datetime__gte=datetime.now(), status__in=['pending','confirmed']).count()
-        completed = qs.filter(status='completed').count()
-        cancelled = qs.filter(status='cancelled').count()
-        revenue = qs.filter(status='completed').aggregate(revenue=Sum(F('service__price')))['revenue'] or 0
-
-        # provider utilization: fraction of booked minutes vs available minutes (over next 7 days)
-        # compute booked minutes in next 7 days
-        start = datetime.now()
-        end = start + timedelta(days=7)
-        booked = qs.filter(start_datetime__gte=start, start_datetime__lte=end, status__in=['pending','confirmed','completed'])
-        booked_minutes = 0
-        for a in booked:
-            duration = (a.end_datetime - a.start_datetime).total_seconds() / 60.0
-            booked_minutes += duration
-
-        # estimate available minutes by summing provider Availability for next 7 days
-        from appointments.models import Availability
-        avails = Availability.objects.filter(provider=user, date__gte=start.date(), date__lte=end.date(), is_available=True)
-        available_minutes = 0
-        for av in avails:
-            dt_start = datetime.combine(av.date, av.start_time)
-            dt_end = datetime.combine(av.date, av.end_time)
-            available_minutes += (dt_end - dt_start).total_seconds() / 60.0
-
-        utilization = (booked_minutes / available_minutes * 100.0) if available_minutes > 0 else None
-
-        # bookings trend for provider (7 days)
-        trend_qs = (qs.filter(start_datetime__gte=start, start_datetime__lte=end)
+        # utilization and trend cover the next `days` whole days
+        start = day_start(today)
+        end = day_start(today + timedelta(days=days))
+        last_day = today + timedelta(days=days - 1)
+        trend_qs = (qs.filter(start_datetime__gte=start, start_datetime__lt=end)
                     .annotate(day=TruncDay('start_datetime'))
                     .values('day')
                     .annotate(bookings=Count('id'))
                     .order_by('day'))
-        trend = [{'date': t['day'].date(), 'bookings': t['bookings']} for t in trend_qs]
+        return {
+            # totals for provider, from the DailyBookingStats rollup
+            'totals': lambda: DailyBookingStats.objects.filter(provider=user).aggregate(
+                total_bookings=Sum('bookings'),
+                completed=Sum('bookings', filter=Q(status='completed')),
+                cancelled=Sum('bookings', filter=Q(status='cancelled')),
+                revenue=Sum('revenue', filter=Q(status='completed')),
+            ),
+            # upcoming is bounded by start time, so it stays on the indexed appointments table
+            'upcoming': lambda: qs.filter(start_datetime__gte=timezone.now(),
+                                          status__in=['pending','confirmed']).count(),
+            # booked vs available minutes, summed by the database / per day, so the cost
+            # doesn't grow with the number of bookings
+            'booked': lambda: booked_minutes_by_day(user.id, today, last_day),
+            'available': lambda: available_minutes_by_day(user.id, today, last_day),
+            'trend': lambda: list(trend_qs),
+        }
 
-        payload = {
+    @staticmethod
+    def payload(results, today, days, by_day):
+        totals = results['totals']
+        utilization = summarize_utilization(today, days, results['booked'], results['available'], by_day)
+        return {
             'totals': {
-                'total_bookings': total_bookings,
-                'upcoming': upcoming,
-                'completed': completed,
-                'cancelled': cancelled,
-                'revenue': float(revenue),
-                'utilization_percent': utilization
+                'total_bookings': totals['total_bookings'] or 0,
+                'upcoming': results['upcoming'],
+                'completed': totals['completed'] or 0,
+                'cancelled': totals['cancelled'] or 0,
+                'revenue': float(totals['revenue'] or 0),
+                'utilization_percent': utilization['utilization_percent']
             },
-            'trend': trend,
+            'utilization': utilization,
+            'trend': [{'date': t['day'].date(), 'bookings': t['bookings']} for t in results['trend']],
         }
-        cache.set(cache_key, payload, CACHE_TTL)
-        return Response(payload)
+
+    def build_payload(self, user, days=7, by_day=False):
+        today = timezone.localdate()
+        return self.payload(run_queries(self.queries(user, today, days)), today, days, by_day)
+
+
+class AsyncDashboardView(View):
+    """
+    Async variant of a dashboard APIView (DRF views are sync only): the same payload and
+    cache entries, with the payload's independent queries running concurrently.
+    Authenticates like the API (JWT) and renders with DRF's JSON encoder.
+    """
+    roles = ()
+
+    async def get(self, request):
+        try:
+            authenticated = await sync_to_async(ClaimsJWTAuthentication().authenticate)(request)
+        except AuthenticationFailed as e:
+            return JsonResponse({'detail': e.detail}, status=401, encoder=JSONEncoder)
+        if authenticated is None:
+            return JsonResponse({'detail': 'Authentication credentials were not provided.'}, status=401)
+        user = authenticated[0]
+        if user.role not in self.roles:
+            return JsonResponse({'detail': 'Forbidden'}, status=403)
+        return await self.respond(request, user)
+
+
+class AsyncAdminDashboardView(AsyncDashboardView):
+    roles = ('admin',)
+
+    async def respond(self, request, user):
+        view = AdminDashboardAPIView
+        today = timezone.localdate()
+
+        async def build_payload():
+            return view.payload(await gather_queries(view.queries(today)))
+        key = await sync_to_async(view.cache_key)()
+        return JsonResponse(await aget_or_compute(key, build_payload), encoder=JSONEncoder)
+
+
+class AsyncProviderDashboardView(AsyncDashboardView):
+    roles = ('provider', 'admin')
+
+    async def respond(self, request, user):
+        try:
+            days, by_day = parse_provider_dashboard_params(request.GET)
+        except ValueError as e:
+            return JsonResponse({'detail': str(e)}, status=400)
+        view = ProviderDashboardAPIView
+        today = timezone.localdate()
+
+        async def build_payload():
+            return view.payload(await gather_queries(view.queries(user, today, days)), today, days, by_day)
+        key = await sync_to_async(view.cache_key)(user, days, by_day)
+        return JsonResponse(await aget_or_compute(key, build_payload), encoder=JSONEncoder)
 
 
 class CustomerDashboardAPIView(APIView):
@@ -159,12 +264,142 @@ class CustomerDashboardAPIView(APIView):
         return Response(payload)
 
 
+class HeatmapAPIView(APIView):
+    """
+    Hour-of-week occupancy: 7 x 24 (resolution=60) or 7 x 96 (resolution=15) matrices of
+    booked and available minutes for a provider, or one of its services, over a date range.
+    """
+    permission_classes = [IsAuthenticated]
+
+    def get(self, request):
+        user = request.user
+        if user.role not in ['provider', 'admin']:
+            return Response({'detail': 'Forbidden'}, status=403)
+
+        params = request.query_params
+        try:
+            resolution = int(params.get('resolution', 60))
+            provider_id = int(params.get('provider', user.id))
+            service_id = int(params['service']) if params.get('service') else None
+            date_to = datetime.strptime(params['to'], '%Y-%m-%d').date() if params.get('to') else timezone.localdate()
+            date_from = (datetime.strptime(params['from'], '%Y-%m-%d').date() if params.get('from')
+                         else date_to - timedelta(weeks=12) + timedelta(days=1))
+        except ValueError:
+            return Response({'detail': 'Invalid parameters; dates are YYYY-MM-DD, ids and resolution integers'}, status=400)
+        if resolution not in HEATMAP_RESOLUTIONS:
+            return Response({'detail': 'resolution must be 60 or 15'}, status=400)
+        if date_from > date_to or (date_to - date_from).days >= HEATMAP_MAX_DAYS:
+            return Response({'detail': f'from must not be after to, and the range at most {HEATMAP_MAX_DAYS} days'}, status=400)
+
+        if service_id is not None:
+            service = Service.objects.filter(pk=service_id).only('provider_id').first()
+            if service is None:
+                return Response({'detail': 'Service not found'}, status=404)
+            provider_id = service.provider_id
+        if user.role != 'admin' and provider_id != user.id:
+            return Response({'detail': 'Forbidden'}, status=403)
+
+        # same per-provider version as the provider dashboard: any booking or availability
+        # change for this provider invalidates its heatmaps
+        cache_key = versioned_key(f"heatmap_{provider_id}_{service_id}_{date_from}_{date_to}_{resolution}",
+                                  [provider_scope(provider_id)])
+        matrices = get_or_compute(cache_key, lambda: occupancy_heatmap(
+            provider_id, date_from, date_to, bin_minutes=resolution, service_id=service_id))
+        return Response({
+            'provider': provider_id,
+            'service': service_id,
+            'from': date_from,
+            'to': date_to,
+            'resolution': resolution,
+            **matrices,
+        })
+
+
 # CSV Export
+BOOKING_EXPORT_COLUMNS = [
+    ('id', 'id'),
+    ('service', 'service__name'),
+    ('provider', 'provider__username'),
+    ('customer', 'customer__username'),
+    ('start_datetime', 'start_datetime'),
+    ('end_datetime', 'end_datetime'),
+    ('status', 'status'),
+    ('price', 'price'),
+    ('created_at', 'created_at'),
+]
+
+
+COLUMNAR_CONTENT_TYPES = {
+    'parquet': 'application/vnd.apache.parquet',
+    'arrow': 'application/vnd.apache.arrow.stream',
+}
+
+
+def pyarrow_available():
+    try:
+        import pyarrow  # noqa: F401
+    except ImportError:
+        return False
+    return True
+
+
+def booking_arrow_columns():
+    """
+    Arrow types for BOOKING_EXPORT_COLUMNS: real timestamps and decimals, no text parsing downstream.
+    """
+    import pyarrow as pa
+    price = Appointment._meta.get_field('price')
+    timestamp = pa.timestamp('us', tz='UTC')
+    types = {
+        'id': pa.int64(),
+        'start_datetime': timestamp,
+        'end_datetime': timestamp,
+        'created_at': timestamp,
+        'price': pa.decimal128(price.max_digits, price.decimal_places),
+    }
+    return [(name, types.get(name, pa.string())) for name, _ in BOOKING_EXPORT_COLUMNS]
+
+
+def booking_export_queryset(user, date_from, date_to):
+    """
+    Export rows (values_list in BOOKING_EXPORT_COLUMNS order) of the appointments booked between
+    date_from and date_to: all of them for an admin, their own for a provider or customer.
+    None for any other role.
+    """
+    qs = Appointment.objects.filter(created_at__gte=date_from, created_at__lte=date_to)
+    if user.role == 'provider':
+        qs = qs.filter(provider=user)
+    elif user.role == 'customer':
+        qs = qs.filter(customer=user)
+    elif user.role != 'admin':
+        return None
+    return qs.values_list(*[lookup for _, lookup in BOOKING_EXPORT_COLUMNS])
+
+
+def format_export_row(row):
+    return [value.isoformat() if isinstance(value, datetime) else value for value in row]
+
+
+class ExportContentNegotiation(DefaultContentNegotiation):
+    """
+    On the export endpoint `?format=` chooses the file type (csv/parquet/arrow),
+    so it must not be read as DRF's renderer override.
+    """
+    settings = APISettings(user_settings={'URL_FORMAT_OVERRIDE': None})
+
+
 class DashboardExportAPIView(APIView):
     permission_classes = [IsAuthenticated]
+    content_negotiation_class = ExportContentNegotiation
 
     def get(self, request):
         export_type = request.query_params.get('type', 'bookings')
+        export_format = request.query_params.get('format', 'csv')
+        if export_format not in ('csv', 'parquet', 'arrow'):
+            return Response({'detail': 'Unknown format; use csv, parquet or arrow'}, status=400)
+        if export_format != 'csv' and not pyarrow_available():
+            # an install that predates pyarrow in requirements.txt can't produce this representation
+            return Response({'detail': f'format={export_format} requires the pyarrow package'}, status=406)
         date_from = request.query_params.get('from')
         date_to = request.query_params.get('to')
 
@@ -182,27 +417,31 @@ class DashboardExportAPIView(APIView):
             return Response({'detail': 'Invalid date format; use ISO format YYYY-MM-DD or full ISO'}, status=400)
 
         if export_type == 'bookings':
-            qs = Appointment.objects.filter(created_at__gte=date_from_dt, created_at__lte=date_to_dt)
             # permission: only admin can export all; provider can export their own; customer can export their own
-            user = request.user
-            if user.role == 'provider':
-                qs = qs.filter(provider=user)
-            elif user.role == 'customer':
-                qs = qs.filter(customer=user)
-            elif user.role != 'admin':
+            qs = booking_export_queryset(request.user, date_from_dt, date_to_dt)
+            if qs is None:
                 return Response({'detail': 'Forbidden'}, status=403)
 
-            # build CSV
-            response = HttpResponse(content_type='text/csv')
-            response['Content-Disposition'] = f'attachment; filename="bookings_{date_from_dt.date()}_{date_to_dt.date()}.csv"'
-            writer = csv.writer(response)
-            writer.writerow(['id','service','provider','customer','start_datetime','end_datetime','status','price','created_at'])
-            for a in qs.select_related('service','provider','customer'):
-                writer.writerow([
-                    a.id, a.service.name, a.provider.username, a.customer.username,
-                    a.start_datetime.isoformat(), a.end_datetime.isoformat(), a.status,
-                    getattr(a.service, 'price', ''), a.created_at.isoformat()
-                ])
+            # stream rows from a chunked values_list cursor, so memory stays flat
+            rows = qs.iterator(chunk_size=EXPORT_CHUNK_SIZE)
+            filename = f"bookings_{date_from_dt.date()}_{date_to_dt.date()}"
+
+            if export_format in ('parquet', 'arrow'):
+                # typed columns written in record batches straight from the cursor
+                response = StreamingHttpResponse(
+                    stream_columnar(booking_arrow_columns(), rows, export_format),
+                    content_type=COLUMNAR_CONTENT_TYPES[export_format])
+                response['Content-Disposition'] = f'attachment; filename="{filename}.{export_format}"'
+                return response
+
+            chunks = stream_csv([name for name, _ in BOOKING_EXPORT_COLUMNS], (format_export_row(r) for r in rows))
+            filename += '.csv'
+            if request.query_params.get('compress') == 'gzip':
+                response = StreamingHttpResponse(gzip_stream(chunks), content_type='application/gzip')
+                filename += '.gz'
+            else:
+                response = StreamingHttpResponse(chunks, content_type='text/csv')
+            response['Content-Disposition'] = f'attachment; filename="{filename}"'
             return response
 
         return Response({'detail': 'Unknown export type'}, status=400)
@@ -6,7 +6,9 @@ import sys
 
 def main():
     """Run administrative tasks."""
-    os.environ.setdefault('DJANGO_SETTINGS_MODULE', 'appointmentsys.settings')
+    # tests get a second database to route replica reads to (appointmentsys.test_settings)
+    settings_module = 'appointmentsys.test_settings' if sys.argv[1:2] == ['test'] else 'appointmentsys.settings'
+    os.environ.setdefault('DJANGO_SETTINGS_MODULE', settings_module)
     try:
         from django.core.management import execute_from_command_line
     except ImportError as exc:
@@ -0,0 +1,89 @@
+from itertools import groupby
+from celery import group, shared_task
+from django.db import transaction
+from appointments.models import NotificationOutbox
+from notifications.tasks import send_booking_notification, send_bulk_booking_notification
+
+OUTBOX_BATCH_SIZE = 500
+
+def record_event(appointment_id, event_type, digest=False, details=None):
+   """
+   Queue a notification. Call from inside the transaction that changes the appointment.
+   `details` (notifications.tasks.booking_details) lets the mail go out once the appointment is deleted.
+   """
+   NotificationOutbox.objects.create(appointment_id=appointment_id, event_type=event_type, digest=digest,
+                                     details=details)
+
+def record_events(appointment_ids, event_type, digest=False):
+   NotificationOutbox.objects.bulk_create([
+     NotificationOutbox(appointment_id=appointment_id, event_type=event_type, digest=digest)
+     for appointment_id in appointment_ids
+   ])
+
+def coalesce(events):
+   """
+   Reduce one appointment's queued events (oldest first) to the one worth sending:
+   the latest, except that an 'updated' never hides a pending 'booked'.
+   """
+   result = None
+   for event in events:
+     if not (result == 'booked' and event == 'updated'):
+       result = event
+   return result
+
+def dispatch_outbox(batch_size=OUTBOX_BATCH_SIZE, direct=False):
+   """
+   Send one batch of queued notifications and delete their rows. Returns the number of rows drained.
+
+   Every queued event of the batch's appointments is taken together and coalesced,
+   so a burst of saves produces one notification. Rows are only deleted once the events
+   were handed over (to Celery, or to the notifier itself with direct=True): a crash
+   in between re-sends the batch rather than losing it.
+   """
+   with transaction.atomic():
+     # skip_locked: several dispatchers can drain the table side by side (PostgreSQL)
+     head = list(NotificationOutbox.objects.select_for_update(skip_locked=True)
+                 .values_list('appointment_id', flat=True)[:batch_size])
+     if not head:
+       return 0
+     rows = list(NotificationOutbox.objects.select_for_update(skip_locked=True)
+                 .filter(appointment_id__in=set(head))
+                 .order_by('appointment_id', 'id')
+                 .values_list('id', 'appointment_id', 'event_type', 'digest', 'details'))
+
+     single, digests = [], {}
+     for appointment_id, events in groupby(rows, key=lambda row: row[1]):
+       events = list(events)
+       event = coalesce(row[2] for row in events)
+       # a deleted appointment is mailed from the details its 'deleted' row kept
+       details = next((row[4] for row in reversed(events) if row[4] is not None), None)
+       if event != 'deleted' and all(row[3] for row in events):
+         digests.setdefault(event, []).append(appointment_id)
+       else:
+         single.append((appointment_id, event, details))
+
+     if direct:
+       for appointment_id, event, details in single:
+         send_booking_notification(appointment_id, event, details)
+       for event, ids in digests.items():
+         send_bulk_booking_notification(ids, event)
+     else:
+       group([send_booking_notification.s(appointment_id, event, details)
+              for appointment_id, event, details in single]
+             + [send_bulk_booking_notification.s(ids, event) for event, ids in digests.items()]).apply_async()
+
+     NotificationOutbox.objects.filter(id__in=[row[0] for row in rows]).delete()
+   return len(rows)
+
+def drain_outbox(batch_size=OUTBOX_BATCH_SIZE, direct=False):
+   """
+   Dispatch batches until the outbox is empty. Returns the number of rows drained.
+   """
+   drained = 0
+   while count := dispatch_outbox(batch_size, direct=direct):
+     drained += count
+   return drained
+
+@shared_task
+def dispatch_notification_outbox():
+   return drain_outbox()
@@ -1,41 +1,202 @@
-from celery import shared_task
-from django.core.mail import send_mail
+from datetime import datetime
+from itertools import islice
+from celery import shared_task, group
+from django.core.mail import EmailMessage, get_connection
+from django.db.models import F
 from django.utils import timezone
 from appointments.models import Appointment
 from django.contrib.auth import get_user_model
 
 User = get_user_model()
 
+# messages handed to the SMTP connection per send_messages() call
+MAIL_CHUNK_SIZE = 500
+# appointments per daily_reminder subtask
+REMINDER_CHUNK_SIZE = 500
+
+def deliver(messages):
+   """
+   Send an iterable of EmailMessages over a single SMTP connection, MAIL_CHUNK_SIZE
+   at a time, instead of one connection (and TLS handshake) per message.
+   `messages` may be a generator; it is rendered one chunk at a time. Returns the number sent.
+   """
+   messages = iter(messages)
+   sent = 0
+   chunk = list(islice(messages, MAIL_CHUNK_SIZE))
+   if not chunk:
+     # nothing to send: don't open a connection
+     return sent
+   with get_connection() as connection:
+     while chunk:
+       sent += connection.send_messages(chunk) or 0
+       chunk = list(islice(messages, MAIL_CHUNK_SIZE))
+   return sent
+
+def booking_details(appt):
+   """
+   What a booking notification needs to know about `appt`, JSON serializable: recorded
+   with 'deleted' outbox events so the mail can still be written once the row is gone.
+   """
+   return {
+     'customer': appt.customer.username,
+     'customer_email': appt.customer.email,
+     'provider_email': appt.provider.email,
+     'service': appt.service.name,
+     'start': appt.start_datetime.isoformat(),
+   }
+
 @shared_task
-def send_booking_notification(appointment_id, event_type):
+def send_booking_notification(appointment_id, event_type, details=None):
    try:
      appt = Appointment.objects.select_related('customer', 'provider', 'service').get(id=appointment_id)
+     details = booking_details(appt)
    except Appointment.DoesNotExist:
-     return
+     # deleted: only what the outbox row kept is left
+     if details is None:
+       return
+   start = datetime.fromisoformat(details['start'])
 
    subject = f"Appointment {event_type.capitalize()}"
    message = (
-     f"Hello {appt.customer.username},\n\n"
-     f"Your appointment for {appt.service.name} on {appt.start_datetime:%Y-%m-%d %H:%M} has been {event_type}."
+     f"Hello {details['customer']},\n\n"
+     f"Your appointment for {details['service']} on {start:%Y-%m-%d %H:%M} has been {event_type}."
    )
-   send_mail(subject, message, None, [appt.customer.email])
+   messages = [EmailMessage(subject, message, None, [details['customer_email']])]
 
    # Notify provider too
-   if appt.provider.email:
-     send_mail(subject, f"Customer {appt.customer.username} has {event_type} an appointment.",
-         None, [appt.provider.email])
+   if details['provider_email']:
+     messages.append(EmailMessage(subject, f"Customer {details['customer']} has {event_type} an appointment.",
+         None, [details['provider_email']]))
+   deliver(messages)
 
 @shared_task
-def daily_reminder():
-   tomorrow = timezone.now() + timezone.timedelta(days=1)
-   appointments = Appointment.objects.filter(
-     start_datetime__date=tomorrow.date(),
-     status__in=['confirmed','pending']
+def send_bulk_booking_notification(appointment_ids, event_type):
+   appts = list(Appointment.objects.select_related('customer', 'provider', 'service')
+                .filter(id__in=appointment_ids).order_by('start_datetime'))
+   if not appts:
+     return
+
+   subject = f"Appointments {event_type.capitalize()}"
+   # one summary mail per customer and per provider instead of one per appointment
+   by_customer, by_provider = {}, {}
+   for appt in appts:
+     by_customer.setdefault(appt.customer, []).append(appt)
+     by_provider.setdefault(appt.provider, []).append(appt)
+
+   messages = []
+   for customer, items in by_customer.items():
+     lines = "\n".join(f"- {a.service.name} on {a.start_datetime:%Y-%m-%d %H:%M}" for a in items)
+     messages.append(EmailMessage(subject,
+         f"Hello {customer.username},\n\nThe following appointments have been {event_type}:\n{lines}",
+         None, [customer.email]))
+
+   for provider, items in by_provider.items():
+     if provider.email:
+       lines = "\n".join(f"- {a.customer.username}: {a.service.name} on {a.start_datetime:%Y-%m-%d %H:%M}" for a in items)
+       messages.append(EmailMessage(subject, f"{len(items)} appointments have been {event_type}:\n{lines}",
+           None, [provider.email]))
+   deliver(messages)
+
+def reminder_queryset(day):
+   """
+   Active appointments starting on `day` (current timezone). Filters on a start_datetime
+   range rather than start_datetime__date so the appt_start_status_idx index applies.
+   """
+   day_start = timezone.make_aware(timezone.datetime.combine(day, timezone.datetime.min.time()))
+   return Appointment.objects.filter(
+     start_datetime__gte=day_start,
+     start_datetime__lt=day_start + timezone.timedelta(days=1),
+     status__in=['pending','confirmed']
    )
+
+def provider_digest(provider, lines):
+   return EmailMessage('Your appointments tomorrow',
+       f"Hello {provider.username},\n\nYou have {len(lines)} appointments tomorrow:\n" + "\n".join(lines),
+       None, [provider.email])
+
+def reminder_messages(appointments):
+   """
+   Render a reminder per customer plus one digest per provider, lazily.
+   `appointments` must be ordered by provider so each digest is emitted as soon
+   as its provider's rows are done, without holding the whole day in memory.
+   """
+   provider, lines = None, []
    for appt in appointments:
-     send_mail(
-       'Appointment Reminder',
-       f'Reminder: You have {appt.service.name} tomorrow at {appt.start_datetime:%H:%M}',
-       None,
-       [appt.customer.email],
-     )
+     if appt.customer.email:
+       yield EmailMessage('Appointment Reminder',
+           f'Reminder: You have {appt.service.name} tomorrow at {appt.start_datetime:%H:%M}',
+           None, [appt.customer.email])
+     if provider is not None and appt.provider_id != provider.id:
+       if provider.email:
+         yield provider_digest(provider, lines)
+       lines = []
+     provider = appt.provider
+     lines.append(f"- {appt.start_datetime:%H:%M} {appt.service.name} with {appt.customer.username}")
+   if provider is not None and provider.email:
+     yield provider_digest(provider, lines)
+
+def pending_reminders(queryset):
+   # rows whose reminder was already sent for their current start time are skipped
+   return queryset.exclude(reminder_sent_for=F('start_datetime'))
+
+def reminder_chunks(rows, size):
+   """
+   Split (id, provider_id) rows ordered by provider into lists of ids of about `size`.
+   A provider's rows stay in one chunk where possible, so it gets a single digest;
+   only a provider with more than `size` rows is split.
+   """
+   chunk, provider = [], None
+   for appointment_id, provider_id in rows:
+     if len(chunk) >= size and provider_id != provider:
+       yield chunk
+       chunk = []
+     if len(chunk) >= 2 * size:
+       yield chunk
+       chunk = []
+     chunk.append(appointment_id)
+     provider = provider_id
+   if chunk:
+     yield chunk
+
+@shared_task(autoretry_for=(OSError,), retry_backoff=True, max_retries=3)
+def send_reminders(appointment_ids):
+   """
+   Send the reminders (and provider digests) for one chunk over one SMTP connection,
+   then mark the rows as reminded. A rerun or retry skips rows that are already marked,
+   so at most this chunk is sent twice if the worker dies between sending and marking.
+   """
+   # one query for the whole chunk; select_related avoids a query per customer/service.
+   # The rows are streamed into the messages; only their ids are kept, for the marking.
+   appointments = (pending_reminders(Appointment.objects.filter(id__in=appointment_ids,
+                                                                status__in=['pending','confirmed']))
+                   .select_related('customer', 'provider', 'service')
+                   .order_by('provider_id', 'start_datetime'))
+   reminded = []
+
+   def rows():
+     for appt in appointments.iterator():
+       reminded.append(appt.id)
+       yield appt
+
+   sent = deliver(reminder_messages(rows()))
+   if reminded:
+     Appointment.objects.filter(id__in=reminded).update(reminder_sent_for=F('start_datetime'))
+   return sent
+
+def due_reminder_chunks(day):
+   """Ids of the un-reminded appointments on `day`, in send_reminders chunks."""
+   rows = (pending_reminders(reminder_queryset(day))
+           .order_by('provider_id', 'start_datetime')
+           .values_list('id', 'provider_id'))
+   return list(reminder_chunks(rows.iterator(), REMINDER_CHUNK_SIZE))
+
+@shared_task
+def daily_reminder():
+   """
+   Fan tomorrow's un-reminded appointments out to a group of send_reminders subtasks,
+   so the run time follows the number of workers rather than the number of appointments.
+   """
+   chunks = due_reminder_chunks(timezone.localdate() + timezone.timedelta(days=1))
+   if chunks:
+     group(send_reminders.s(ids) for ids in chunks).apply_async()
+   return len(chunks)
@@ -1,5 +1,11 @@
 from django.contrib import admin
 from .models import Service, Category
 
-admin.site.register(Service)
+
+@admin.register(Service)
+class ServiceAdmin(admin.ModelAdmin):
+    # Service.__str__ reads provider.username
+    list_select_related = ('provider',)
+
+
 admin.site.register(Category)
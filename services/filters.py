@@ -0,0 +1,38 @@
+from django.db.models import Case, IntegerField, When
+from rest_framework.filters import BaseFilterBackend
+from .search import SEARCH_MAX_RESULTS, search_services
+
+
+class ServiceSearchFilter(BaseFilterBackend):
+    """
+    ?search= over service, category and provider names through services.search,
+    best match first (an explicit ?ordering= still wins). Returns at most
+    SEARCH_MAX_RESULTS services.
+    """
+    search_param = 'search'
+
+    def filter_queryset(self, request, queryset, view):
+        query = request.query_params.get(self.search_param, '').strip()
+        if not query:
+            return queryset
+        # providers only see their own services (ServiceViewSet.get_queryset),
+        # so rank within those rather than cutting the global top results
+        user = request.user
+        provider_id = user.id if getattr(user, 'role', None) == 'provider' else None
+        # the conditional GET validator and the page filter the same request: search once
+        searched = getattr(request, '_service_search', None)
+        if searched is None or searched[0] != (query, provider_id):
+            ids = search_services(query, SEARCH_MAX_RESULTS, provider_id)
+            searched = request._service_search = ((query, provider_id), ids)
+        ids = searched[1]
+        rank = Case(*[When(id=pk, then=position) for position, pk in enumerate(ids)], output_field=IntegerField())
+        return queryset.filter(id__in=ids).order_by(rank) if ids else queryset.none()
+
+    def get_schema_operation_parameters(self, view):
+        return [{
+            'name': self.search_param,
+            'required': False,
+            'in': 'query',
+            'description': 'Words to match against service, category and provider names (prefixes match)',
+            'schema': {'type': 'string'},
+        }]
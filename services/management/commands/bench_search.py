@@ -0,0 +1,81 @@
+import random
+import statistics
+import time
+from django.contrib.auth import get_user_model
+from django.core.management.base import BaseCommand
+from django.db import transaction
+from services.models import Category, Service
+from services.search import autocomplete_services, index, refresh_documents, search_services
+
+User = get_user_model()
+
+ADJECTIVES = ['classic', 'deluxe', 'express', 'deep', 'gentle', 'signature', 'luxury', 'quick',
+              'organic', 'hot', 'cold', 'full', 'mini', 'premium', 'relaxing', 'sports', 'couples', 'junior']
+NOUNS = ['haircut', 'colour', 'massage', 'facial', 'manicure', 'pedicure', 'waxing', 'shave', 'stone',
+         'tissue', 'consultation', 'therapy', 'cleaning', 'checkup', 'training', 'lesson', 'yoga', 'pilates',
+         'tattoo', 'piercing', 'styling', 'blowdry', 'treatment', 'session', 'repair', 'tuning']
+CATEGORIES = ['Hair', 'Beauty', 'Spa', 'Wellness', 'Fitness', 'Dental', 'Medical', 'Music',
+              'Tutoring', 'Auto', 'Pets', 'Photography', 'Cleaning', 'Repairs', 'Nails', 'Body Art']
+
+
+class Rollback(Exception):
+    pass
+
+
+class Command(BaseCommand):
+    help = "Benchmark ranked service search and autocomplete on a large synthetic catalogue."
+
+    def add_arguments(self, parser):
+        parser.add_argument('--services', type=int, default=100000)
+        parser.add_argument('--providers', type=int, default=2000)
+        parser.add_argument('--queries', type=int, default=500)
+        parser.add_argument('--seed', type=int, default=1)
+
+    def handle(self, *args, **options):
+        self.random = random.Random(options['seed'])
+        # everything is created inside a transaction that is rolled back at the end
+        try:
+            with transaction.atomic():
+                self.run(options['services'], options['providers'], options['queries'])
+                raise Rollback
+        except Rollback:
+            pass
+        finally:
+            index.version = None
+
+    def run(self, count, provider_count, query_count):
+        rnd = self.random
+        providers = User.objects.bulk_create([
+            User(username=f'bench_{rnd.choice(NOUNS)}_{i}', role='provider') for i in range(provider_count)])
+        categories = Category.objects.bulk_create([Category(name=f'Bench {name}') for name in CATEGORIES])
+        Service.objects.bulk_create([
+            Service(provider=rnd.choice(providers), category=rnd.choice(categories), price=20, duration=30,
+                    name=f'{rnd.choice(ADJECTIVES).title()} {rnd.choice(NOUNS).title()} {rnd.randrange(1000)}')
+            for _ in range(count)
+        ], batch_size=5000)
+
+        t0 = time.perf_counter()
+        refresh_documents()
+        self.stdout.write(f"documents:    {count} built in {time.perf_counter() - t0:.1f}s")
+        index.version = None
+        t0 = time.perf_counter()
+        search_services('warm')
+        self.stdout.write(f"index load:   {(time.perf_counter() - t0) * 1000:.0f} ms")
+
+        words = ADJECTIVES + NOUNS + [name.lower() for name in CATEGORIES]
+        queries = [' '.join(rnd.sample(words, rnd.choice([1, 1, 2, 2, 3]))) for _ in range(query_count)]
+        # what a user types on the way to a query: 'd', 'de', 'dee', 'deep', 'deep m', ...
+        prefixes = [query[:rnd.randint(1, len(query))] for query in queries]
+        self.report('search', queries, search_services)
+        self.report('autocomplete', prefixes, autocomplete_services)
+
+    def report(self, label, queries, run):
+        timings = []
+        for query in queries:
+            t0 = time.perf_counter()
+            run(query)
+            timings.append((time.perf_counter() - t0) * 1000.0)
+        timings.sort()
+        p95 = timings[int(len(timings) * 0.95) - 1]
+        self.stdout.write(f"{label + ':':14}{len(timings)} queries, p50 {statistics.median(timings):.2f} ms, "
+                          f"p95 {p95:.2f} ms, max {timings[-1]:.2f} ms")
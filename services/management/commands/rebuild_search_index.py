@@ -0,0 +1,13 @@
+from django.core.management.base import BaseCommand
+from django.db import transaction
+from services.search import refresh_documents
+
+
+class Command(BaseCommand):
+    help = ("Rebuild every service search document, e.g. after services were imported "
+            "with bulk_create or raw SQL, which bypass the signals that keep them current.")
+
+    def handle(self, *args, **options):
+        with transaction.atomic():
+            written = refresh_documents()
+        self.stdout.write(f"Rebuilt {written} search documents")
@@ -0,0 +1,91 @@
+# Generated by Django 5.2.18 on 2026-10-18 06:09
+
+import re
+import unicodedata
+import django.db.models.deletion
+from django.db import migrations, models
+
+# PostgreSQL searches the documents in the database: a weighted tsvector (name A,
+# category B, provider C) for ranked prefix matching and a trigram index for typos.
+# Other databases use the in-process index in services.search and need nothing extra.
+
+POSTGRES_FORWARD = [
+    "CREATE EXTENSION IF NOT EXISTS pg_trgm",
+    """
+    ALTER TABLE services_servicesearchdocument
+    ADD COLUMN search_vector tsvector GENERATED ALWAYS AS (
+        setweight(to_tsvector('simple', name_terms), 'A') ||
+        setweight(to_tsvector('simple', category_terms), 'B') ||
+        setweight(to_tsvector('simple', provider_terms), 'C')
+    ) STORED
+    """,
+    "CREATE INDEX service_search_vector_idx ON services_servicesearchdocument USING gin (search_vector)",
+    "CREATE INDEX service_search_trgm_idx ON services_servicesearchdocument USING gin (document gin_trgm_ops)",
+]
+POSTGRES_BACKWARD = [
+    "DROP INDEX IF EXISTS service_search_trgm_idx",
+    "DROP INDEX IF EXISTS service_search_vector_idx",
+    "ALTER TABLE services_servicesearchdocument DROP COLUMN IF EXISTS search_vector",
+]
+
+
+TOKEN = re.compile(r'[^\W_]+')
+
+
+def normalize(text):
+    # frozen copy of services.search.normalize as of this migration
+    decomposed = unicodedata.normalize('NFKD', text or '')
+    stripped = ''.join(c for c in decomposed if not unicodedata.combining(c))
+    return TOKEN.findall(stripped.casefold())
+
+
+def run(statements):
+    def apply(apps, schema_editor):
+        for sql in statements.get(schema_editor.connection.vendor, []):
+            schema_editor.execute(sql)
+    return apply
+
+
+def populate(apps, schema_editor):
+    Service = apps.get_model('services', 'Service')
+    ServiceSearchDocument = apps.get_model('services', 'ServiceSearchDocument')
+    documents = []
+    for service in Service.objects.select_related('provider', 'category').iterator():
+        category_name = service.category.name if service.category_id else ''
+        terms = [normalize(service.name), normalize(category_name), normalize(service.provider.username)]
+        documents.append(ServiceSearchDocument(
+            service_id=service.id, name=service.name, category_name=category_name,
+            provider_name=service.provider.username,
+            name_terms=' '.join(terms[0]), category_terms=' '.join(terms[1]), provider_terms=' '.join(terms[2]),
+            document=' '.join(terms[0] + terms[1] + terms[2]),
+        ))
+    ServiceSearchDocument.objects.bulk_create(documents, batch_size=1000)
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('services', '0001_initial'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='ServiceSearchDocument',
+            fields=[
+                ('service', models.OneToOneField(on_delete=django.db.models.deletion.CASCADE, primary_key=True, related_name='search_document', serialize=False, to='services.service')),
+                ('name', models.CharField(max_length=150)),
+                ('category_name', models.CharField(blank=True, max_length=100)),
+                ('provider_name', models.CharField(max_length=150)),
+                ('name_terms', models.TextField()),
+                ('category_terms', models.TextField(blank=True)),
+                ('provider_terms', models.TextField()),
+                ('document', models.TextField()),
+                ('updated_at', models.DateTimeField(auto_now=True)),
+            ],
+        ),
+        migrations.RunPython(
+            run({'postgresql': POSTGRES_FORWARD}),
+            run({'postgresql': POSTGRES_BACKWARD}),
+        ),
+        migrations.RunPython(populate, migrations.RunPython.noop),
+    ]
@@ -28,3 +28,37 @@ class Service(models.Model):
 
     def __str__(self):
         return f"{self.name} - {self.provider.username}"
+
+
+class ServiceSearchDocument(models.Model):
+    """
+    Precomputed search text for one Service: display values plus normalized terms
+    (lowercase, accents stripped) per field. Kept in sync by services.signals and
+    queried through services.search; on PostgreSQL it also carries a weighted tsvector
+    and a trigram index (see migration 0002).
+    """
+    service = models.OneToOneField(Service, on_delete=models.CASCADE, primary_key=True, related_name='search_document')
+    name = models.CharField(max_length=150)
+    category_name = models.CharField(max_length=100, blank=True)
+    provider_name = models.CharField(max_length=150)
+    name_terms = models.TextField()
+    category_terms = models.TextField(blank=True)
+    provider_terms = models.TextField()
+    # all terms, for trigram matching
+    document = models.TextField()
+    updated_at = models.DateTimeField(auto_now=True)
+
+    def __str__(self):
+        return f"search document for service {self.service_id}"
+
+
+class SearchIndexVersion(models.Model):
+    """
+    Single-row counter bumped in the same transaction as every search document change.
+    A process whose in-memory index (services.search) was built at another version
+    rebuilds it before answering; being a row, it is shared by every process.
+    """
+    version = models.BigIntegerField(default=0)
+
+    def __str__(self):
+        return f"search index version {self.version}"
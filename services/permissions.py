@@ -13,4 +13,4 @@ class IsAdminOrProvider(BasePermission):
     def has_object_permission(self, request, view, obj):
         if request.method in SAFE_METHODS:
             return True
-        return obj.provider == request.user or request.user.role == 'admin'
+        return obj.provider_id == request.user.id or request.user.role == 'admin'
@@ -0,0 +1,335 @@
+import re
+import threading
+import unicodedata
+from bisect import bisect_left, insort
+from collections import OrderedDict
+import numpy as np
+from django.contrib.postgres.lookups import TrigramWordSimilar
+from django.contrib.postgres.search import SearchQuery, SearchRank, SearchVectorField, TrigramWordSimilarity
+from django.db import connection, transaction
+from django.db.models import F
+from django.db.models.expressions import RawSQL
+from .models import SearchIndexVersion, Service, ServiceSearchDocument
+
+SEARCH_MAX_RESULTS = 200
+AUTOCOMPLETE_LIMIT_DEFAULT = 10
+AUTOCOMPLETE_LIMIT_MAX = 50
+REFRESH_BATCH_SIZE = 1000
+# Field weights for ranking, highest first; a whole-word match counts double a prefix match.
+FIELD_WEIGHTS = {'name': 3, 'category': 2, 'provider': 1}
+EXACT_MATCH_FACTOR = 2
+# pk of the SearchIndexVersion row
+INDEX_VERSION_ID = 1
+
+TOKEN = re.compile(r'[^\W_]+')
+
+
+def normalize(text):
+    """
+    Search terms of `text`: case-folded, accents stripped, split on anything that is
+    not a letter or digit. 'Crème Brûlée-Tasting' -> ['creme', 'brulee', 'tasting'].
+    """
+    decomposed = unicodedata.normalize('NFKD', text or '')
+    stripped = ''.join(c for c in decomposed if not unicodedata.combining(c))
+    return TOKEN.findall(stripped.casefold())
+
+
+def document_for(service):
+    category_name = service.category.name if service.category_id else ''
+    name_terms, category_terms, provider_terms = (
+        normalize(service.name), normalize(category_name), normalize(service.provider.username))
+    return ServiceSearchDocument(
+        service=service,
+        name=service.name,
+        category_name=category_name,
+        provider_name=service.provider.username,
+        name_terms=' '.join(name_terms),
+        category_terms=' '.join(category_terms),
+        provider_terms=' '.join(provider_terms),
+        document=' '.join(name_terms + category_terms + provider_terms),
+    )
+
+
+def refresh_documents(service_ids=None):
+    """
+    Rebuild the search documents of the given services (all services when None) and
+    publish the change to the search index once the transaction commits.
+    Returns the number of documents written.
+    """
+    services = Service.objects.select_related('provider', 'category').order_by('id')
+    if service_ids is not None:
+        services = services.filter(id__in=list(service_ids))
+    written = 0
+    last_id = 0
+    while True:
+        batch = [document_for(service) for service in services.filter(id__gt=last_id)[:REFRESH_BATCH_SIZE]]
+        if not batch:
+            break
+        ServiceSearchDocument.objects.bulk_create(
+            batch, update_conflicts=True, unique_fields=['service'],
+            update_fields=['name', 'category_name', 'provider_name', 'name_terms',
+                           'category_terms', 'provider_terms', 'document', 'updated_at'])
+        written += len(batch)
+        last_id = batch[-1].service_id
+        if service_ids is not None:
+            publish(updated=batch)
+    if service_ids is None:
+        publish(rebuild=True)
+    return written
+
+
+def index_version():
+    version = SearchIndexVersion.objects.filter(pk=INDEX_VERSION_ID).values_list('version', flat=True).first()
+    return version or 0
+
+
+def bump_index_version():
+    """Increment the shared index version within the current transaction and return it."""
+    versions = SearchIndexVersion.objects.filter(pk=INDEX_VERSION_ID)
+    if not versions.update(version=F('version') + 1):
+        SearchIndexVersion.objects.bulk_create([SearchIndexVersion(pk=INDEX_VERSION_ID)], ignore_conflicts=True)
+        versions.update(version=F('version') + 1)
+    return index_version()
+
+
+def publish(updated=(), removed=(), rebuild=False):
+    """
+    Bump the shared index version with the change (other processes rebuild once it
+    commits) and, after commit, apply the change to this process's index, so the
+    writer's own next search sees it without a full rebuild.
+    """
+    if backend() is not index:
+        return
+    updated, removed = list(updated), list(removed)
+    version = bump_index_version()
+    transaction.on_commit(lambda: index.apply(updated, removed, None if rebuild else version))
+
+
+class InProcessSearchIndex:
+    """
+    Inverted index over the search documents, held in process memory for databases
+    without full-text search (SQLite).
+
+    Every document gets a slot. Postings are stored in vocabulary order in two flat
+    arrays (slot, weight) with per-term offsets, so all terms starting with a prefix are
+    one contiguous slice found by bisection. A query expands each token to a dense
+    per-slot weight array, ANDs and sums them, and picks the top slots with argpartition.
+    Committed changes go to a small delta (the old slot is retired, the new version gets
+    a fresh one) that is folded back in when it grows. Display values are kept alongside,
+    so autocomplete runs without touching the database.
+    """
+    expansion_cache_size = 64
+    max_delta = 1000
+
+    def __init__(self):
+        self.lock = threading.RLock()
+        self.version = None
+        self.build([])
+
+    def ensure_current(self):
+        version = index_version()
+        if version != self.version:
+            self.build(ServiceSearchDocument.objects.values_list(
+                'service_id', 'service__provider_id', 'name', 'category_name', 'provider_name',
+                'name_terms', 'category_terms', 'provider_terms').iterator(chunk_size=5000))
+            self.version = version
+
+    @staticmethod
+    def row_of(document):
+        return (document.service_id, document.service.provider_id, document.name, document.category_name,
+                document.provider_name, document.name_terms, document.category_terms, document.provider_terms)
+
+    @staticmethod
+    def weights_of(row):
+        """{term: weight} of a document row: the best field each term occurs in."""
+        weights = {}
+        for field, terms in zip(FIELD_WEIGHTS, row[5:]):
+            for term in terms.split():
+                weights[term] = max(weights.get(term, 0), FIELD_WEIGHTS[field])
+        return weights
+
+    def build(self, rows):
+        self.rows, self.slot_of, postings = [], {}, {}
+        for row in rows:
+            slot = len(self.rows)
+            self.rows.append(row)
+            self.slot_of[row[0]] = slot
+            for term, weight in self.weights_of(row).items():
+                postings.setdefault(term, ([], []))
+                postings[term][0].append(slot)
+                postings[term][1].append(weight)
+        self.vocabulary = sorted(postings)
+        lengths = [len(postings[term][0]) for term in self.vocabulary]
+        self.offsets = np.zeros(len(self.vocabulary) + 1, dtype=np.int64)
+        np.cumsum(lengths, out=self.offsets[1:])
+        self.slots = np.fromiter((slot for term in self.vocabulary for slot in postings[term][0]),
+                                 dtype=np.int32, count=int(self.offsets[-1]))
+        self.weights = np.fromiter((weight for term in self.vocabulary for weight in postings[term][1]),
+                                   dtype=np.int8, count=int(self.offsets[-1]))
+        self.service_ids = np.array([row[0] for row in self.rows], dtype=np.int64)
+        self.provider_ids = np.array([row[1] or 0 for row in self.rows], dtype=np.int64)
+        self.alive = np.ones(len(self.rows), dtype=bool)
+        self.delta_vocabulary, self.delta_postings = [], {}
+        self.expansions = OrderedDict()
+
+    def retire(self, service_id):
+        slot = self.slot_of.pop(service_id, None)
+        if slot is not None:
+            self.alive[slot] = False
+
+    def append(self, row):
+        slot = len(self.rows)
+        self.rows.append(row)
+        self.slot_of[row[0]] = slot
+        self.service_ids = np.append(self.service_ids, row[0])
+        self.provider_ids = np.append(self.provider_ids, row[1] or 0)
+        self.alive = np.append(self.alive, True)
+        for term, weight in self.weights_of(row).items():
+            if term not in self.delta_postings:
+                self.delta_postings[term] = {}
+                insort(self.delta_vocabulary, term)
+            self.delta_postings[term][slot] = weight
+
+    def apply(self, updated, removed, version):
+        """
+        Apply committed document changes. `version` is the shared version they produced:
+        if it is not the direct successor of ours, another writer got in between and the
+        next query rebuilds instead.
+        """
+        with self.lock:
+            if self.version is None:
+                return
+            if version is None or version != self.version + 1:
+                self.version = None
+                return
+            for service_id in removed:
+                self.retire(service_id)
+            for document in updated:
+                self.retire(document.service_id)
+                self.append(self.row_of(document))
+            if len(self.rows) - len(self.slot_of) > self.max_delta:
+                self.build([self.rows[slot] for slot in sorted(self.slot_of.values())])
+            self.expansions.clear()
+            self.version = version
+
+    @staticmethod
+    def term_range(vocabulary, token):
+        # every term starting with token sorts before token with its last character bumped
+        return (bisect_left(vocabulary, token),
+                bisect_left(vocabulary, token[:-1] + chr(ord(token[-1]) + 1)))
+
+    def expand(self, token):
+        """Per-slot best weight over every term starting with `token` (0: no match)."""
+        matches = self.expansions.get(token)
+        if matches is not None:
+            self.expansions.move_to_end(token)
+            return matches
+        matches = np.zeros(len(self.rows), dtype=np.int8)
+        first, last = self.term_range(self.vocabulary, token)
+        start, end = self.offsets[first], self.offsets[last]
+        weights = self.weights[start:end]
+        if first < last and self.vocabulary[first] == token:
+            weights = weights.copy()
+            weights[:self.offsets[first + 1] - start] *= EXACT_MATCH_FACTOR
+        np.maximum.at(matches, self.slots[start:end], weights)
+        first, last = self.term_range(self.delta_vocabulary, token)
+        for term in self.delta_vocabulary[first:last]:
+            factor = EXACT_MATCH_FACTOR if term == token else 1
+            for slot, weight in self.delta_postings[term].items():
+                matches[slot] = max(matches[slot], weight * factor)
+        self.expansions[token] = matches
+        if len(self.expansions) > self.expansion_cache_size:
+            self.expansions.popitem(last=False)
+        return matches
+
+    def ranked(self, tokens, limit, provider_id=None):
+        with self.lock:
+            self.ensure_current()
+            matched = self.alive.copy()
+            scores = np.zeros(len(self.rows), dtype=np.int64)
+            for token in dict.fromkeys(tokens):
+                matches = self.expand(token)
+                matched &= matches > 0
+                scores += matches
+            if provider_id is not None:
+                matched &= self.provider_ids == provider_id
+            candidates = np.flatnonzero(matched)
+            # best score first, newest service first among equals
+            keys = scores[candidates] * (1 << 40) + self.service_ids[candidates]
+            if len(candidates) > limit:
+                top = np.argpartition(keys, -limit)[-limit:]
+                candidates, keys = candidates[top], keys[top]
+            return [self.rows[slot] for slot in candidates[np.argsort(-keys)]]
+
+    def search(self, tokens, limit, provider_id=None):
+        return [row[0] for row in self.ranked(tokens, limit, provider_id)]
+
+    def autocomplete(self, tokens, limit, provider_id=None):
+        return [
+            {'id': row[0], 'name': row[2], 'category_name': row[3], 'provider_name': row[4]}
+            for row in self.ranked(tokens, limit, provider_id)
+        ]
+
+
+# the generated tsvector column migration 0002 adds on PostgreSQL; not a model field
+SEARCH_VECTOR = RawSQL('services_servicesearchdocument.search_vector', [], output_field=SearchVectorField())
+
+
+class PostgresSearchBackend:
+    """
+    Full-text search on the search_vector column (weighted A/B/C by name/category/provider,
+    GIN indexed), every token matched as a prefix. When nothing matches, typo tolerance
+    comes from trigram word similarity on the whole document (GIN trigram index).
+    """
+
+    def documents(self, tokens, limit, provider_id=None):
+        documents = ServiceSearchDocument.objects.all()
+        if provider_id is not None:
+            documents = documents.filter(service__provider_id=provider_id)
+        fields = ('service_id', 'name', 'category_name', 'provider_name')
+        query = SearchQuery(' & '.join(f'{token}:*' for token in tokens), config='simple', search_type='raw')
+        rows = list(documents
+                    .alias(search_vector=SEARCH_VECTOR)
+                    .filter(search_vector=query)
+                    .annotate(rank=SearchRank(F('search_vector'), query))
+                    .order_by('-rank', '-service_id').values_list(*fields)[:limit])
+        if rows:
+            return rows
+        text = ' '.join(tokens)
+        # `document %> text`: the word_similarity threshold test the trigram index serves
+        return list(documents
+                    .filter(TrigramWordSimilar(F('document'), text))
+                    .annotate(rank=TrigramWordSimilarity(text, 'document'))
+                    .order_by('-rank', '-service_id').values_list(*fields)[:limit])
+
+    def search(self, tokens, limit, provider_id=None):
+        return [row[0] for row in self.documents(tokens, limit, provider_id)]
+
+    def autocomplete(self, tokens, limit, provider_id=None):
+        return [
+            {'id': service_id, 'name': name, 'category_name': category_name, 'provider_name': provider_name}
+            for service_id, name, category_name, provider_name in self.documents(tokens, limit, provider_id)
+        ]
+
+
+index = InProcessSearchIndex()
+
+
+def backend():
+    return PostgresSearchBackend() if connection.vendor == 'postgresql' else index
+
+
+def search_services(query, limit=SEARCH_MAX_RESULTS, provider_id=None):
+    """Ids of the services matching every word of `query` (as prefixes), best match first."""
+    tokens = normalize(query)
+    if not tokens:
+        return []
+    return backend().search(tokens, limit, provider_id)
+
+
+def autocomplete_services(query, limit=AUTOCOMPLETE_LIMIT_DEFAULT, provider_id=None):
+    """Suggestions for a partly typed query: id and display names of the best matches."""
+    tokens = normalize(query)
+    if not tokens:
+        return []
+    return backend().autocomplete(tokens, limit, provider_id)
@@ -0,0 +1,48 @@
+from django.contrib.auth import get_user_model
+from django.db.models.signals import pre_delete, post_delete, post_save
+from django.dispatch import receiver
+from appointmentsys.conditional import invalidate_validators
+from .models import Category, Service
+from .search import publish, refresh_documents
+
+
+@receiver(post_save, sender=Service)
+def refresh_service_document(sender, instance, **kwargs):
+    refresh_documents([instance.id])
+    invalidate_validators(['services'])
+
+
+@receiver(post_delete, sender=Service)
+def remove_service_document(sender, instance, **kwargs):
+    # the row itself goes with the service (CASCADE); only the index needs telling
+    publish(removed=[instance.id])
+    invalidate_validators(['services'])
+
+
+@receiver(post_save, sender=Category)
+def refresh_category_documents(sender, instance, created, **kwargs):
+    if not created:
+        refresh_documents(instance.service_set.values_list('id', flat=True))
+        # service payloads show the category name
+        invalidate_validators(['services'], related=True)
+
+
+@receiver(pre_delete, sender=Category)
+def remember_category_services(sender, instance, **kwargs):
+    # the services are detached (SET_NULL) by a bulk UPDATE that sends no signals
+    instance._search_service_ids = list(instance.service_set.values_list('id', flat=True))
+
+
+@receiver(post_delete, sender=Category)
+def refresh_detached_documents(sender, instance, **kwargs):
+    refresh_documents(getattr(instance, '_search_service_ids', []))
+    invalidate_validators(['services'], related=True)
+
+
+@receiver(post_save, sender=get_user_model())
+def refresh_provider_documents(sender, instance, created, update_fields=None, **kwargs):
+    # most user saves (e.g. last_login on every sign-in) leave the username alone
+    if created or (update_fields is not None and 'username' not in update_fields):
+        return
+    refresh_documents(instance.services.values_list('id', flat=True))
+    invalidate_validators(['services'], related=True)
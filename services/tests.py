@@ -1,3 +1,242 @@
+import time
+from datetime import datetime, time as dtime, timedelta
+from django.contrib.auth import get_user_model
+from django.db import connection
 from django.test import TestCase
+from django.test.utils import CaptureQueriesContext
+from django.utils import timezone
+from django.utils.http import http_date
+from appointments.models import Appointment, AvailabilityRule
+from appointmentsys.testing import QueryBudgetTestCase
+from services.models import Category, Service, ServiceSearchDocument
+from services.search import (autocomplete_services, bump_index_version, index, normalize, refresh_documents,
+                             search_services)
+from services.views import parse_slot_window
 
-# Create your tests here.
+User = get_user_model()
+
+
+class ServiceEndpointQueryBudgetTests(QueryBudgetTestCase):
+    """
+    Service and category endpoints run a fixed number of queries, whatever the number of rows.
+    Service GETs add the conditional GET validator aggregate to the page query.
+    """
+
+    @classmethod
+    def setUpTestData(cls):
+        cls.providers = [User.objects.create(username=f'budget_provider{i}', role='provider') for i in range(3)]
+        categories = [Category.objects.create(name=f'Budget {i}') for i in range(3)]
+        Service.objects.bulk_create([
+            Service(provider=cls.providers[i % 3], category=categories[i % 3], name=f'Service {i}', price=10, duration=30)
+            for i in range(30)
+        ])
+        cls.service = Service.objects.first()
+        # bulk_create sends no signals
+        with cls.captureOnCommitCallbacks(execute=True):
+            refresh_documents()
+
+    def test_service_list(self):
+        for user in (None, self.providers[0]):
+            self.assertQueryBudget(user, '/api/services/', 2)
+        search_services('Budget')  # load the in-process index
+        # plus the search index version check
+        self.assertQueryBudget(None, '/api/services/?search=Budget', 3)
+
+    def test_service_detail(self):
+        self.assertQueryBudget(None, f'/api/services/{self.service.id}/', 2)
+
+    def test_category_list(self):
+        self.assertQueryBudget(None, '/api/categories/', 1)
+
+
+    def test_earliest_rejects_malformed_ids(self):
+        for params in ({'category': 'abc'}, {'services': '1,x'}):
+            response = self.client.get('/api/services/earliest/', params)
+            self.assertEqual(response.status_code, 400, params)
+
+class ServiceSearchTests(TestCase):
+
+    @classmethod
+    def setUpTestData(cls):
+        with cls.captureOnCommitCallbacks(execute=True):
+            cls.provider = User.objects.create(username='Zoë_Barber', role='provider')
+            cls.other = User.objects.create(username='hairdresser_sam', role='provider')
+            cls.hair = Category.objects.create(name='Hair')
+            cls.massage = Category.objects.create(name='Massage')
+            cls.cut = Service.objects.create(provider=cls.provider, category=cls.hair, name='Crème Haircut',
+                                             price=20, duration=30)
+            cls.stone = Service.objects.create(provider=cls.other, category=cls.massage, name='Hot Stone',
+                                               price=50, duration=60)
+            cls.colour = Service.objects.create(provider=cls.other, category=cls.hair, name='Colour',
+                                                price=40, duration=60)
+            refresh_documents()
+
+    def setUp(self):
+        # the previous test's writes were rolled back without telling the index
+        index.version = None
+
+    def test_normalize(self):
+        self.assertEqual(normalize('Crème Brûlée-Tasting'), ['creme', 'brulee', 'tasting'])
+        self.assertEqual(normalize('Zoë_Barber'), ['zoe', 'barber'])
+
+    def test_ranked_prefix_search(self):
+        # name beats category beats provider name
+        self.assertEqual(search_services('ha'), [self.cut.id, self.colour.id, self.stone.id])
+        self.assertEqual(search_services('HAIR col'), [self.colour.id])
+        self.assertEqual(search_services('creme'), [self.cut.id])
+        self.assertEqual(search_services('massage zoe'), [])
+        self.assertEqual(search_services('hair', provider_id=self.provider.id), [self.cut.id])
+
+    def test_documents_follow_changes(self):
+        search_services('warm')
+        with self.captureOnCommitCallbacks(execute=True):
+            self.massage.name = 'Spa'
+            self.massage.save()
+            self.provider.username = 'anna'
+            self.provider.save()
+            self.colour.delete()
+        # the writer's own index took the changes in place: no reload, only the version check
+        with CaptureQueriesContext(connection) as queries:
+            self.assertEqual(search_services('spa'), [self.stone.id])
+        self.assertEqual(len(queries), 1)
+        self.assertEqual(search_services('massage'), [])
+        self.assertEqual(search_services('ann'), [self.cut.id])
+        self.assertEqual(search_services('colour'), [])
+
+    def test_change_in_another_process_rebuilds(self):
+        search_services('warm')
+        # what another process's commit leaves behind: new documents and a bumped version,
+        # with this process's index not told
+        ServiceSearchDocument.objects.filter(service=self.stone).update(name_terms='granite', document='granite')
+        bump_index_version()
+        self.assertEqual(search_services('granite'), [self.stone.id])
+
+    def test_autocomplete_reads_only_the_version(self):
+        search_services('warm')
+        with CaptureQueriesContext(connection) as queries:
+            suggestions = autocomplete_services('hot st')
+        self.assertEqual(len(queries), 1)
+        self.assertEqual(suggestions, [{'id': self.stone.id, 'name': 'Hot Stone', 'category_name': 'Massage',
+                                        'provider_name': 'hairdresser_sam'}])
+
+    def test_list_search(self):
+        response = self.client.get('/api/services/', {'search': 'ha'})
+        self.assertEqual([row['id'] for row in response.data], [self.cut.id, self.colour.id, self.stone.id])
+        response = self.client.get('/api/services/autocomplete/', {'q': 'ho'})
+        self.assertEqual([row['id'] for row in response.data], [self.stone.id])
+
+
+class ConditionalGetTests(QueryBudgetTestCase):
+
+    @classmethod
+    def setUpTestData(cls):
+        cls.provider = User.objects.create(username='etag_provider', role='provider')
+        cls.category = Category.objects.create(name='Etag')
+        cls.service = Service.objects.create(provider=cls.provider, category=cls.category, name='Cut',
+                                             price=20, duration=30)
+
+    def test_not_modified_costs_no_query(self):
+        first = self.client.get('/api/services/')
+        self.assertEqual(first.status_code, 200)
+        with CaptureQueriesContext(connection) as queries:
+            response = self.client.get('/api/services/', HTTP_IF_NONE_MATCH=first['ETag'])
+        self.assertEqual(response.status_code, 304)
+        self.assertEqual(response['ETag'], first['ETag'])
+        self.assertEqual(len(queries), 0)
+        detail = self.client.get(f'/api/services/{self.service.id}/')
+        response = self.client.get(f'/api/services/{self.service.id}/', HTTP_IF_MODIFIED_SINCE=detail['Last-Modified'])
+        self.assertEqual(response.status_code, 304)
+
+    def test_list_delete_is_not_hidden_by_if_modified_since(self):
+        Service.objects.create(provider=self.provider, name='Shave', price=10, duration=15)
+        first = self.client.get('/api/services/')
+        # the latest updated_at survives a delete; only the ETag (row count) notices it
+        self.assertNotIn('Last-Modified', first)
+        with self.captureOnCommitCallbacks(execute=True):
+            self.service.delete()
+        response = self.client.get('/api/services/', HTTP_IF_MODIFIED_SINCE=http_date(time.time()))
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(len(response.data), 1)
+        self.assertEqual(self.client.get('/api/services/', HTTP_IF_NONE_MATCH=first['ETag']).status_code, 200)
+
+    def test_writes_change_the_validator(self):
+        etag = self.client.get('/api/services/')['ETag']
+        with self.captureOnCommitCallbacks(execute=True):
+            self.category.name = 'Renamed'
+            self.category.save()
+        response = self.client.get('/api/services/', HTTP_IF_NONE_MATCH=etag)
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(response.data[0]['category_name'], 'Renamed')
+
+        etag = response['ETag']
+        with self.captureOnCommitCallbacks(execute=True):
+            Service.objects.create(provider=self.provider, name='Shave', price=10, duration=15)
+        self.assertEqual(self.client.get('/api/services/', HTTP_IF_NONE_MATCH=etag).status_code, 200)
+        # another URL is another representation
+        self.assertNotEqual(self.client.get('/api/services/?ordering=price')['ETag'], etag)
+
+
+class SlotEndpointTests(TestCase):
+    """/services/{id}/slots/ and /services/earliest/ (appointments.scheduling sweeps)."""
+
+    @classmethod
+    def setUpTestData(cls):
+        cls.day = timezone.localdate() + timedelta(days=2)
+        cls.customer = User.objects.create(username='slot_customer', role='customer')
+        cls.category = Category.objects.create(name='Slots')
+        cls.first = User.objects.create(username='slot_provider_a', role='provider')
+        cls.second = User.objects.create(username='slot_provider_b', role='provider')
+        # the first provider works two windows that day, the second one in between
+        for provider, start, end in ((cls.first, dtime(9), dtime(10)), (cls.first, dtime(11), dtime(12)),
+                                     (cls.second, dtime(9, 30), dtime(10, 30))):
+            AvailabilityRule.objects.create(provider=provider, weekday=cls.day.weekday(), start_time=start, end_time=end)
+        cls.buffered = Service.objects.create(provider=cls.first, category=cls.category, name='Buffered',
+                                              price=20, duration=30, buffer_time=15)
+        cls.other = Service.objects.create(provider=cls.second, category=cls.category, name='Other',
+                                           price=20, duration=30)
+
+    def at(self, hour, minute=0):
+        return timezone.make_aware(datetime.combine(self.day, dtime(hour, minute)))
+
+    def slots(self, service, **params):
+        params = {'from': self.at(0).isoformat(), 'to': self.at(23).isoformat(), 'step': 30, **params}
+        response = self.client.get(f'/api/services/{service.id}/slots/', params)
+        self.assertEqual(response.status_code, 200, response.content)
+        return [datetime.fromisoformat(slot) for slot in response.json()['slots']]
+
+    def test_slots_respect_buffers_and_bookings(self):
+        self.assertEqual(self.slots(self.buffered), [self.at(9), self.at(9, 30), self.at(11), self.at(11, 30)])
+        booking = Appointment.objects.create(service=self.buffered, provider=self.first, customer=self.customer,
+                                             start_datetime=self.at(11), end_datetime=self.at(11, 30))
+        # 11:30 starts within the 15 minutes of buffer after the booking
+        self.assertEqual(self.slots(self.buffered), [self.at(9), self.at(9, 30)])
+        booking.status = 'cancelled'
+        booking.save()
+        self.assertEqual(self.slots(self.buffered), [self.at(9), self.at(9, 30), self.at(11), self.at(11, 30)])
+
+    def test_earliest_merges_providers_in_order(self):
+        response = self.client.get('/api/services/earliest/', {
+            'category': self.category.id, 'from': self.at(0).isoformat(), 'to': self.at(23).isoformat(),
+            'step': 30, 'limit': 5})
+        self.assertEqual(response.status_code, 200, response.content)
+        self.assertEqual([(datetime.fromisoformat(row['start_datetime']), row['service']) for row in response.json()], [
+            (self.at(9), self.buffered.id),
+            (self.at(9, 30), self.buffered.id),
+            (self.at(9, 30), self.other.id),
+            (self.at(10), self.other.id),
+            (self.at(11), self.buffered.id),
+        ])
+        response = self.client.get('/api/services/earliest/', {
+            'services': f'{self.other.id}', 'from': self.at(0).isoformat(), 'step': 30, 'limit': 1})
+        self.assertEqual([datetime.fromisoformat(row['start_datetime']) for row in response.json()], [self.at(9, 30)])
+
+    def test_bad_windows_are_rejected(self):
+        start = self.at(9)
+        for params in ({'from': start.isoformat(), 'to': start.isoformat()},
+                       {'from': start.isoformat(), 'to': (start - timedelta(hours=1)).isoformat()},
+                       {'from': start.isoformat(), 'to': (start + timedelta(days=32)).isoformat()},
+                       {'step': '0'}, {'step': 'x'}, {'from': 'tomorrow'}):
+            with self.assertRaises(ValueError):
+                parse_slot_window(params)
+            response = self.client.get(f'/api/services/{self.buffered.id}/slots/', params)
+            self.assertEqual(response.status_code, 400, params)
@@ -1,7 +1,55 @@
 from rest_framework import viewsets, permissions, filters
+from rest_framework.decorators import action
+from rest_framework.response import Response
+from django.utils import timezone
+from datetime import datetime, timedelta
 from .models import Service, Category
 from .serializers import ServiceSerializer, CategorySerializer
 from .permissions import IsAdminOrProvider
+from .filters import ServiceSearchFilter
+from .search import AUTOCOMPLETE_LIMIT_DEFAULT, AUTOCOMPLETE_LIMIT_MAX, autocomplete_services
+from appointments.scheduling import bookable_slots, earliest_slots
+from appointmentsys.conditional import ConditionalGetMixin
+
+SLOT_SEARCH_MAX_DAYS = 31  # widest window a single slot search may cover
+SLOT_STEP_DEFAULT = 15  # minutes between candidate start times
+EARLIEST_LIMIT_DEFAULT = 10
+EARLIEST_LIMIT_MAX = 100
+
+
+def parse_slot_window(params):
+    """
+    Read from/to/step query params shared by the slot endpoints.
+    Returns (range_start, range_end, step) or raises ValueError with a client-facing message.
+    """
+    try:
+        range_start = parse_datetime_param(params.get('from'), timezone.now())
+        range_end = parse_datetime_param(params.get('to'), range_start + timedelta(days=7))
+        step = int(params.get('step', SLOT_STEP_DEFAULT))
+    except ValueError:
+        raise ValueError('Invalid parameters; use ISO dates for from/to and minutes for step')
+
+    if step <= 0:
+        raise ValueError('step must be a positive number of minutes')
+    if range_end <= range_start:
+        raise ValueError('`to` must be after `from`')
+    if range_end - range_start > timedelta(days=SLOT_SEARCH_MAX_DAYS):
+        raise ValueError(f'Search window cannot exceed {SLOT_SEARCH_MAX_DAYS} days')
+    return range_start, range_end, step
+
+
+def parse_datetime_param(value, default):
+    """
+    Parse an ISO date/datetime query param; naive values are taken in the current timezone.
+    Raises ValueError on bad input.
+    """
+    if not value:
+        return default
+    parsed = datetime.fromisoformat(value)
+    if timezone.is_naive(parsed):
+        parsed = timezone.make_aware(parsed)
+    return parsed
+
 
 class CategoryViewSet(viewsets.ModelViewSet):
     queryset = Category.objects.all()
@@ -10,17 +58,97 @@ class CategoryViewSet(viewsets.ModelViewSet):
     filter_backends = [filters.SearchFilter]
     search_fields = ['name']
 
-class ServiceViewSet(viewsets.ModelViewSet):
+class ServiceViewSet(ConditionalGetMixin, viewsets.ModelViewSet):
+    conditional_scope = 'services'
     serializer_class = ServiceSerializer
     permission_classes = [IsAdminOrProvider]
-    filter_backends = [filters.SearchFilter, filters.OrderingFilter]
-    search_fields = ['name', 'category__name', 'provider__username']
+    filter_backends = [ServiceSearchFilter, filters.OrderingFilter]
     ordering_fields = ['price', 'duration']
 
     def get_queryset(self):
         user = self.request.user
+        # ServiceSerializer reads provider.username and category.name
+        qs = Service.objects.select_related('provider', 'category')
         if user.is_anonymous:
-            return Service.objects.all()
+            return qs
         if user.role == 'provider':
-            return Service.objects.filter(provider=user)
-        return Service.objects.all()
+            return qs.filter(provider=user)
+        return qs
+
+    @action(detail=True, methods=['get'], url_path='slots')
+    def slots(self, request, pk=None):
+        """
+        Bookable start times for this service.
+        Query params: from, to (ISO date/datetime, default now .. now+7 days), step (minutes).
+        """
+        service = self.get_object()
+        try:
+            range_start, range_end, step = parse_slot_window(request.query_params)
+        except ValueError as e:
+            return Response({'detail': str(e)}, status=400)
+
+        slots = bookable_slots(service, range_start, range_end, step)
+        return Response({
+            'service': service.id,
+            'provider': service.provider_id,
+            'duration': service.duration,
+            'step': step,
+            'slots': slots,
+        })
+
+    @action(detail=False, methods=['get'], url_path='autocomplete')
+    def autocomplete(self, request):
+        """
+        Suggestions while typing: services whose names match every word of `q`, the last
+        one usually partial. Query params: q, limit.
+        """
+        try:
+            limit = min(int(request.query_params.get('limit', AUTOCOMPLETE_LIMIT_DEFAULT)), AUTOCOMPLETE_LIMIT_MAX)
+        except ValueError:
+            return Response({'detail': 'limit must be a number'}, status=400)
+        if limit <= 0:
+            return Response({'detail': 'limit must be positive'}, status=400)
+        user = request.user
+        provider_id = user.id if getattr(user, 'role', None) == 'provider' else None
+        return Response(autocomplete_services(request.query_params.get('q', ''), limit, provider_id))
+
+    @action(detail=False, methods=['get'], url_path='earliest')
+    def earliest(self, request):
+        """
+        Earliest bookable slots across every provider of a category or a list of services.
+        Query params: category or services (comma separated ids), from, to, step, limit.
+        """
+        category = request.query_params.get('category')
+        service_ids = request.query_params.get('services')
+        try:
+            range_start, range_end, step = parse_slot_window(request.query_params)
+            limit = min(int(request.query_params.get('limit', EARLIEST_LIMIT_DEFAULT)), EARLIEST_LIMIT_MAX)
+            if category:
+                category = int(category)
+            if service_ids:
+                service_ids = [int(i) for i in service_ids.split(',') if i]
+        except ValueError as e:
+            return Response({'detail': str(e)}, status=400)
+        if not category and not service_ids:
+            return Response({'detail': 'Provide category or services'}, status=400)
+        if limit <= 0:
+            return Response({'detail': 'limit must be positive'}, status=400)
+
+        qs = self.get_queryset().select_related('provider')
+        if category:
+            qs = qs.filter(category_id=category)
+        if service_ids:
+            qs = qs.filter(id__in=service_ids)
+
+        results = earliest_slots(qs, range_start, range_end, step, limit)
+        return Response([
+            {
+                'start_datetime': slot,
+                'service': service.id,
+                'service_name': service.name,
+                'provider': service.provider_id,
+                'provider_name': service.provider.username,
+                'duration': service.duration,
+            }
+            for slot, service in results
+        ])